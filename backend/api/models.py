@@ -106,16 +106,6 @@ class Transactions(models.Model):
     date_purchased = models.DateField(blank=True, null=True)
     category = models.CharField(max_length=100, blank=True, null=True)
     created_at = models.DateTimeField(blank=True, null=True)
-    order_value = models.FloatField(blank=True, null=True)
-
-    # Add computed property for order_value
-    def save(self, *args, **kwargs):
-        # Auto-calculate order_value when saving
-        if self.unit_price and self.quantity:
-            self.order_value = self.unit_price * self.quantity
-        else:
-            self.order_value = 0
-        super().save(*args, **kwargs)
 
     class Meta:
         managed = False
@@ -24,8 +24,8 @@ class SimulationInputSerializer(serializers.Serializer):
 
 
 class TransactionSerializer(serializers.ModelSerializer):
-    # if your model class is named FctTransactions, import and use that instead
-    order_value = serializers.SerializerMethodField()
+    # order_value is annotated in SQL (unit_price * quantity) by TransactionListView
+    order_value = serializers.FloatField(read_only=True)
 
     class Meta:
         model = Transactions
@@ -39,10 +39,6 @@ class TransactionSerializer(serializers.ModelSerializer):
             "order_value",
         )
 
-    def get_order_value(self, obj):
-        # compute on-the-fly instead of storing in the DB
-        return obj.unit_price * obj.quantity
-
 
 class ProductSerializer(serializers.ModelSerializer):
     class Meta:
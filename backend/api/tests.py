@@ -1,3 +1,141 @@
-from django.test import TestCase
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+from django.db import connection
+from django.test import SimpleTestCase
+from django.utils import timezone
+from rest_framework.test import APIRequestFactory, APITestCase
+
+from .models import CustomersLookup, Products, Transactions
+from .views import SimulationPreviewView
+
+
+class SimulationPreviewViewTests(SimpleTestCase):
+    """Query parameters of /api/simulate/preview/ (the metrics files are mocked)"""
+
+    def setUp(self):
+        self.factory = APIRequestFactory()
+        self.view = SimulationPreviewView.as_view()
+        patcher = mock.patch("api.views.get_latest_csv_metrics", return_value=None)
+        self.get_metrics = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def get(self, query=""):
+        return self.view(self.factory.get(f"/api/simulate/preview/{query}"))
+
+    def test_invalid_max_points_is_400(self):
+        for value in ["abc", "-5", "1.5"]:
+            with self.subTest(max_points=value):
+                response = self.get(f"?max_points={value}")
+                self.assertEqual(response.status_code, 400)
+                self.assertIn("max_points", response.data)
+        self.get_metrics.assert_not_called()
+
+    def test_unknown_downsample_method_is_400(self):
+        response = self.get("?max_points=100&downsample=mean")
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("downsample", response.data)
+
+    def test_parameters_are_passed_through(self):
+        for query, expected in [
+            ("", (None, "lttb")),
+            ("?max_points=0", (None, "lttb")),
+            ("?max_points=200", (200, "lttb")),
+            ("?max_points=200&downsample=minmax", (200, "minmax")),
+        ]:
+            with self.subTest(query=query):
+                self.assertEqual(self.get(query).status_code, 200)
+                max_points, method = expected
+                self.get_metrics.assert_called_with(
+                    max_points=max_points, method=method
+                )
+
+
+class TransactionListViewTests(APITestCase):
+    """
+    Keyset pagination of /api/transactions/
+    The warehouse tables are unmanaged: the ones the view reads are created in the test
+    database (walmart schema, as in settings.DATABASES search_path)
+    """
+
+    url = "/api/transactions/"
+
+    @classmethod
+    def setUpTestData(cls):
+        with connection.cursor() as cur:
+            cur.execute("CREATE SCHEMA IF NOT EXISTS walmart;")
+        with connection.schema_editor() as editor:
+            for model in (Products, CustomersLookup, Transactions):
+                editor.create_model(model)
+
+        today = timezone.now().date()
+        cls.newest, cls.older = today - timedelta(days=1), today - timedelta(days=2)
+        rows = [(i, cls.newest) for i in range(1, 6)]  # 5 rows share a date
+        rows += [(i, cls.older) for i in range(6, 9)]
+        Transactions.objects.bulk_create(
+            Transactions(
+                transaction_id=i,
+                date_purchased=day,
+                category="cat",
+                unit_price=2.0,
+                quantity=3,
+            )
+            for i, day in rows
+        )
+        # Expected order: date DESC, transaction_id DESC
+        cls.expected = [5, 4, 3, 2, 1, 8, 7, 6]
+
+    def get(self, **params):
+        return self.client.get(self.url, params)
+
+    def test_pages_follow_the_cursor_across_equal_dates(self):
+        seen, cursor, pages = [], None, 0
+        while True:
+            params = {"limit": 2, **({"cursor": cursor} if cursor else {})}
+            response = self.get(**params)
+            self.assertEqual(response.status_code, 200)
+            seen += [row["transaction_id"] for row in response.json()]
+            pages += 1
+            cursor = response.headers.get("X-Next-Cursor")
+            if not cursor:
+                break
+        self.assertEqual(seen, self.expected)  # no row skipped or repeated
+        self.assertEqual(pages, 5)  # 4 full pages + the empty one ending the scan
+
+    def test_cursor_inside_a_date_uses_the_transaction_id(self):
+        response = self.get(limit=3, cursor=f"{self.newest:%Y-%m-%d}_3")
+        self.assertEqual([r["transaction_id"] for r in response.json()], [2, 1, 8])
+        self.assertEqual(response.headers["X-Next-Cursor"], f"{self.older:%Y-%m-%d}_8")
+
+    def test_order_value_is_computed(self):
+        row = self.get(limit=1).json()[0]
+        self.assertEqual(row["order_value"], 6.0)
+
+    def test_invalid_cursor_is_400(self):
+        for cursor in ["garbage", "2025-13-01_5", "2025-01-01_x"]:
+            with self.subTest(cursor=cursor):
+                response = self.get(cursor=cursor)
+                self.assertEqual(response.status_code, 400)
+                self.assertIn("cursor", response.json())
+
+    def test_invalid_limit_is_400(self):
+        for limit in ["-1", "abc", "2.5"]:
+            with self.subTest(limit=limit):
+                response = self.get(limit=limit)
+                self.assertEqual(response.status_code, 400)
+                self.assertIn("limit", response.json())
+
+    def test_limit_is_clamped(self):
+        response = self.get(limit=0)
+        self.assertEqual(len(response.json()), 1)
+        response = self.get(limit=10**6)
+        self.assertEqual(len(response.json()), len(self.expected))
+
+    def test_no_cursor_on_the_last_page(self):
+        response = self.get(limit=5, cursor=f"{self.newest:%Y-%m-%d}_1")
+        self.assertEqual([r["transaction_id"] for r in response.json()], [8, 7, 6])
+        self.assertNotIn("X-Next-Cursor", response.headers)
+
+        response = self.get(limit=5, cursor=f"{self.older:%Y-%m-%d}_6")
+        self.assertEqual(response.json(), [])
+        self.assertNotIn("X-Next-Cursor", response.headers)
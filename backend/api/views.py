@@ -1,4 +1,5 @@
 #  type: ignore
+import csv
 import gc
 import io
 import os
@@ -9,20 +10,29 @@ import traceback
 import uuid
 import zipfile
 from dataclasses import dataclass, field
-from datetime import timedelta
+from datetime import datetime, timedelta
 from pathlib import Path
 from threading import Lock
 from typing import Any, Dict, List
 
 import psutil
+from django.conf import settings
+from django.db.models import F, Q
 from django.http import FileResponse, HttpResponse, JsonResponse
 from django.utils import timezone
+from django.utils.decorators import method_decorator
+from django.views.decorators.cache import cache_page
+from helper.metrics_summary import (DOWNSAMPLE_METHODS,  # pyright: ignore
+                                    downsample, load_metrics_summary,
+                                    summary_path_for, write_metrics_summary)
 from helper.save_load import (load_agents_from_newest,  # pyright: ignore
                               save_agents)
+from helper.workspace import Workspace  # pyright: ignore
 from rest_framework import generics, status
+from rest_framework.exceptions import ValidationError
 from rest_framework.permissions import AllowAny
+from rest_framework.response import Response
 from rest_framework.views import APIView
-from walmart_model import WalmartModel  # pyright: ignore
 
 from .models import Cust1, Cust2, Products, Transactions
 from .serialization import (Cust1Serializer, Cust2Serializer,
@@ -31,6 +41,8 @@ from .serialization import (Cust1Serializer, Cust2Serializer,
 
 # Define ROOT - path to project root (parent of backend directory)
 ROOT = Path(__file__).resolve().parent.parent.parent
+# Absolute simulation paths (outputs, checkpoints, id seeds): no chdir around the model
+WORKSPACE = Workspace(ROOT / "data_pipeline")
 
 
 # --- Memory Tracking Utilities ---
@@ -71,7 +83,7 @@ def check_agm_output_exists():
     This determines if continuation is possible.
     """
     try:
-        data_source_path = ROOT / "data_pipeline" / "data_source" / "agm_output"
+        data_source_path = WORKSPACE.output_dir("prod")
 
         if not data_source_path.exists():
             return False
@@ -87,19 +99,19 @@ def check_agm_output_exists():
         return False
 
 
-def get_latest_csv_metrics():  # pyright: ignore
+def get_latest_csv_metrics(
+    max_points: int | None = None, method: str = "lttb"
+):  # pyright: ignore
     """
-    Read the latest metrics CSV file from agm_output folder.
+    Serve the precomputed metrics summary of the latest run from agm_output folder.
     Uses the same structure as WalmartModel.get_current_step_metrics_for_graphs()
+    - Summary (id=*_metrics_summary.json) is written by write_results_csv when a run finishes
+    - Older runs without a summary are parsed once from the CSV and the summary is backfilled
+    - max_points -> optional downsampling for very long histories (method: lttb | minmax)
     Returns formatted data for frontend charts.
     """
     try:
-        data_source_path = (
-            Path(__file__).resolve().parent.parent.parent
-            / "data_pipeline"
-            / "data_source"
-            / "agm_output"
-        )
+        data_source_path = WORKSPACE.output_dir("prod")
 
         if not data_source_path.exists():
             return None
@@ -121,43 +133,29 @@ def get_latest_csv_metrics():  # pyright: ignore
             return None
 
         metrics_file = metrics_files[0]
+        summary_file = summary_path_for(metrics_file)
 
-        # Read CSV file using pandas for better data handling
-        import pandas as pd
-
-        df = pd.read_csv(metrics_file)
-
-        metrics = []
-        latest_simulated_date = None
-
-        for idx, row in df.iterrows():
-            # Use the same structure as get_current_step_metrics_for_graphs()
-            step_metrics = {
-                "step": idx + 1,
-                "current_date": str(row.get("Current Date", "")),
-                "cust1_avg_purchase": float(row.get("Avg_Purchases_Cust1", 0)),
-                "cust2_avg_purchase": float(row.get("Avg_Purchases_Cust2", 0)),
-                "total_daily_purchases": int(row.get("Total_Daily_Purchase", 0)),
-                "total_cust1": int(row.get("Total_cust1", 0)),
-                "total_cust2": int(row.get("Total_cust2", 0)),
-                "total_products": int(row.get("Total_products", 0)),
-                "stockout_rate": float(row.get("Stockout", 0)),
-            }
-            metrics.append(step_metrics)
+        if not summary_file.exists():
+            # Backfill for runs saved before summaries existed
+            with open(metrics_file, "r", newline="", encoding="utf-8") as f:
+                rows = list(csv.DictReader(f))
+            columns = {k: [r[k] for r in rows] for k in (rows[0] if rows else {})}
+            summary_file = write_metrics_summary(columns, metrics_file)
 
-            # Track the latest simulated date from the Current Date column
-            if step_metrics["current_date"]:
-                latest_simulated_date = step_metrics["current_date"]
+        summary = load_metrics_summary(summary_file)
+        metrics = summary["metrics"]
+        if max_points:
+            metrics = downsample(metrics, max_points, method)
 
         return {
             "metrics": metrics,
             "run_dir": latest_run_dir.name,
             "metrics_file": metrics_file.name,
-            "total_steps": len(metrics),
-            "latest_simulated_date": latest_simulated_date,
+            "total_steps": summary["total_steps"],
+            "latest_simulated_date": summary["latest_simulated_date"],
         }
     except Exception as e:
-        print(f"Error reading CSV: {e}")
+        print(f"Error reading metrics summary: {e}")
         return None
 
 
@@ -182,6 +180,10 @@ def run_in_background(run_id: str, inputs: Dict[str, str | int]):
     Build + run the Mesa model and push step metrics into RUNS[run_id].steps.
     Uses your existing WalmartModel logic - it already handles continuation automatically.
     """
+    # Imported on first run: the model pulls in mesa / pandas, which worker boot,
+    # health checks and management commands do not need
+    from walmart_model import WalmartModel  # pyright: ignore
+
     try:
         log_memory("SIMULATION_START")
 
@@ -189,27 +191,18 @@ def run_in_background(run_id: str, inputs: Dict[str, str | int]):
         if days <= 0:
             raise ValueError("max_steps must be > 0")
 
-        # Change to data_pipeline directory for WalmartModel (where data_source/ exists)
-        original_cwd = os.getcwd()
-        data_pipeline_path = os.path.join(ROOT, "data_pipeline")
-        if os.path.exists(data_pipeline_path):
-            os.chdir(data_pipeline_path)
-
-        try:
-            # Initialize WalmartModel with your existing parameters
-            log_memory("BEFORE_MODEL_INIT")
-            model = WalmartModel(
-                start_date=inputs.get("start_date"),
-                max_steps=days,
-                n_customers1=inputs.get("n_customers1", 100),
-                n_customers2=inputs.get("n_customers2", 100),
-                n_products_per_category=inputs.get("n_products_per_category", 5),
-                mode="prod",
-            )
-            log_memory("AFTER_MODEL_INIT")
-        finally:
-            # Always restore original working directory
-            os.chdir(original_cwd)
+        # Initialize WalmartModel with your existing parameters
+        log_memory("BEFORE_MODEL_INIT")
+        model = WalmartModel(
+            start_date=inputs.get("start_date"),
+            max_steps=days,
+            n_customers1=inputs.get("n_customers1", 100),
+            n_customers2=inputs.get("n_customers2", 100),
+            n_products_per_category=inputs.get("n_products_per_category", 5),
+            mode="prod",
+            workspace=WORKSPACE,
+        )
+        log_memory("AFTER_MODEL_INIT")
 
         # Use your existing agent loading logic
         log_memory("BEFORE_AGENT_LOAD")
@@ -419,30 +412,26 @@ class ResetSimulationView(APIView):
                 RUNS.clear()
 
             # Clear agm_output directories
-            data_source_path = ROOT / "data_pipeline" / "data_source"
-
             # Clear production output
-            agm_output_path = data_source_path / "agm_output"
+            agm_output_path = WORKSPACE.output_dir("prod")
             if agm_output_path.exists():
                 shutil.rmtree(agm_output_path)
                 agm_output_path.mkdir(exist_ok=True)
 
             # Clear test output
-            agm_output_test_path = data_source_path / "agm_output_test"
+            agm_output_test_path = WORKSPACE.output_dir("test")
             if agm_output_test_path.exists():
                 shutil.rmtree(agm_output_test_path)
                 agm_output_test_path.mkdir(exist_ok=True)
 
             # Clear saved agent states
-            saved_agents_path = data_source_path / "agm_agent_save"
+            saved_agents_path = WORKSPACE.checkpoint_dir("prod")
             if saved_agents_path.exists():
                 shutil.rmtree(saved_agents_path)
                 saved_agents_path.mkdir(exist_ok=True)
 
             # Clear the id tracking
-            id_tracker_path = (
-                ROOT / "data_pipeline" / "method" / "helper" / "id_seeds.json"
-            )
+            id_tracker_path = WORKSPACE.id_seed_file("prod")
             if id_tracker_path.exists():
                 os.remove(id_tracker_path)
 
@@ -483,14 +472,40 @@ class ContinuityCheckView(APIView):
 
 class SimulationPreviewView(APIView):
     """
-    GET /api/simulate/preview/ -> Load CSV metrics from agm_output folder
+    GET /api/simulate/preview/?max_points=<int>&downsample=<lttb|minmax>
+    -> Load precomputed metrics from agm_output folder
+    max_points is optional and downsamples long histories for charting (default: lttb)
     """
 
     permission_classes = [AllowAny]
 
+    def get_max_points(self):
+        """None when missing or 0, 400 when not a non-negative integer"""
+        max_points = self.request.query_params.get("max_points")
+        if not max_points:
+            return None
+        try:
+            value = int(max_points)
+        except ValueError:
+            raise ValidationError({"max_points": f"Invalid max_points: {max_points}"})
+        if value < 0:
+            raise ValidationError({"max_points": f"Invalid max_points: {max_points}"})
+        return value or None
+
+    def get_downsample_method(self):
+        method = self.request.query_params.get("downsample", "lttb")
+        if method not in DOWNSAMPLE_METHODS:
+            raise ValidationError(
+                {"downsample": f"Expected one of {sorted(DOWNSAMPLE_METHODS)}"}
+            )
+        return method
+
     def get(self, request):
+        # Validated before the try: bad parameters are a 400, not a failed load
+        max_points = self.get_max_points()
+        method = self.get_downsample_method()
         try:
-            csv_info = get_latest_csv_metrics()
+            csv_info = get_latest_csv_metrics(max_points=max_points, method=method)
 
             if not csv_info:
                 return JsonResponse(
@@ -529,26 +544,86 @@ class SimulationPreviewView(APIView):
 # --- Getting the table views for Dashboard ---
 class TransactionListView(generics.ListAPIView):
     """
-    GET /api/transactions/?since=<ISO>&limit=<int>
+    GET /api/transactions/?since=<ISO>&limit=<int>&cursor=<YYYY-MM-DD>_<transaction_id>
     Returns the most-recent transactions, filtered by date and capped by limit.
+    - Keyset pagination on (date_purchased, transaction_id) DESC: pass the X-Next-Cursor
+      response header back as ?cursor= to get the next page (no OFFSET, constant cost per page)
+    - Only the serialized columns are selected, order_value is computed in SQL
     """
 
     serializer_class = TransactionSerializer
+    max_limit = 1000
+
+    def get_limit(self):
+        """?limit= clamped to [1, max_limit], 400 when not a non-negative integer"""
+        limit = self.request.query_params.get("limit", "50")
+        try:
+            value = int(limit)
+        except ValueError:
+            raise ValidationError({"limit": f"Invalid limit: {limit}"})
+        if value < 0:
+            raise ValidationError({"limit": f"Invalid limit: {limit}"})
+        return min(max(1, value), self.max_limit)
+
+    def get_cursor(self):
+        """'2025-01-31_123456' -> ('2025-01-31', 123456), None if missing"""
+        cursor = self.request.query_params.get("cursor")
+        if not cursor:
+            return None
+        try:
+            date_str, txn_id = cursor.rsplit("_", 1)
+            return datetime.strptime(date_str, "%Y-%m-%d").date(), int(txn_id)
+        except ValueError:
+            raise ValidationError({"cursor": f"Invalid cursor: {cursor}"})
 
     def get_queryset(self):
-        qs = Transactions.objects.all().order_by("-date_purchased")
+        qs = Transactions.objects.filter(date_purchased__isnull=False)
         since = self.request.query_params.get("since")
-        limit = int(self.request.query_params.get("limit", 50))
         if since:
             qs = qs.filter(date_purchased__gte=since)
         else:
             qs = qs.filter(date_purchased__gte=timezone.now() - timedelta(days=365))
-        return qs[:limit]
 
+        cursor = self.get_cursor()
+        if cursor:
+            # (date_purchased, transaction_id) < (cursor_date, cursor_id)
+            cursor_date, cursor_id = cursor
+            qs = qs.filter(
+                Q(date_purchased__lt=cursor_date)
+                | Q(date_purchased=cursor_date, transaction_id__lt=cursor_id)
+            )
+
+        return (
+            qs.order_by("-date_purchased", "-transaction_id")
+            .annotate(order_value=F("unit_price") * F("quantity"))
+            .values(
+                "transaction_id",
+                "date_purchased",
+                "category",
+                "unit_price",
+                "quantity",
+                "order_value",
+            )[: self.get_limit()]
+        )
 
+    def list(self, request, *args, **kwargs):
+        rows = list(self.get_queryset())
+        serializer = self.get_serializer(rows, many=True)
+        headers = {}
+        if rows and len(rows) == self.get_limit():
+            last = rows[-1]
+            headers["X-Next-Cursor"] = (
+                f"{last['date_purchased']:%Y-%m-%d}_{last['transaction_id']}"
+            )
+        return Response(serializer.data, headers=headers)
+
+
+@method_decorator(cache_page(settings.RANKING_CACHE_TTL), name="get")
 class BaseSpendingListView(generics.ListAPIView):
     """
     Base view for listing entities with total spending/sales data
+    - Totals come from the *_spend_rank tables (refreshed by load_to_postgres), no aggregation per request
+    - Responses are cached for RANKING_CACHE_TTL seconds (per limit query param)
     """
 
     def get_limit(self):
@@ -567,14 +642,10 @@ class Cust1ListView(BaseSpendingListView):
         limit = self.get_limit()
 
         raw_query = """
-        SELECT c1.unique_id, 
-               COALESCE(SUM(t.unit_price * t.quantity), 0) as total_sum
-        FROM cust1 c1
-        LEFT JOIN customers_lookup cl ON c1.unique_id = cl.external_id 
-                                     AND cl.cust_type = 'cust1'
-        LEFT JOIN transactions t ON cl.customer_id = t.unique_id
-        GROUP BY c1.unique_id
-        ORDER BY total_sum DESC
+        SELECT c1.*, r.total_sum
+        FROM cust1_spend_rank r
+        JOIN cust1 c1 ON c1.unique_id = r.unique_id
+        ORDER BY r.total_sum DESC
         LIMIT %s
         """
 
@@ -588,14 +659,10 @@ class Cust2ListView(BaseSpendingListView):
         limit = self.get_limit()
 
         raw_query = """
-        SELECT c2.unique_id, 
-               COALESCE(SUM(t.unit_price * t.quantity), 0) as total_sum
-        FROM cust2 c2
-        LEFT JOIN customers_lookup cl ON c2.unique_id = cl.external_id 
-                                     AND cl.cust_type = 'cust2'
-        LEFT JOIN transactions t ON cl.customer_id = t.unique_id
-        GROUP BY c2.unique_id
-        ORDER BY total_sum DESC
+        SELECT c2.*, r.total_sum
+        FROM cust2_spend_rank r
+        JOIN cust2 c2 ON c2.unique_id = r.unique_id
+        ORDER BY r.total_sum DESC
         LIMIT %s
         """
 
@@ -609,12 +676,10 @@ class ProductListView(BaseSpendingListView):
         limit = self.get_limit()
 
         raw_query = """
-        SELECT p.product_id, 
-               COALESCE(SUM(t.unit_price * t.quantity), 0) as total_sum
-        FROM products p
-        LEFT JOIN transactions t ON p.product_id = t.product_id
-        GROUP BY p.product_id
-        ORDER BY total_sum DESC
+        SELECT p.*, r.total_sum
+        FROM product_sales_rank r
+        JOIN products p ON p.product_id = r.product_id
+        ORDER BY r.total_sum DESC
         LIMIT %s
         """
 
@@ -627,12 +692,7 @@ def get_agm_output_files():
     Scan agm_output folder and return structured file information
     """
     try:
-        data_source_path = (
-            Path(__file__).resolve().parent.parent.parent
-            / "data_pipeline"
-            / "data_source"
-            / "agm_output"
-        )
+        data_source_path = WORKSPACE.output_dir("prod")
 
         if not data_source_path.exists():
             return []
@@ -731,12 +791,7 @@ class FileDownloadView(APIView):
 
     def get(self, request, file_path: str):
         try:
-            data_source_path = (
-                Path(__file__).resolve().parent.parent.parent
-                / "data_pipeline"
-                / "data_source"
-                / "agm_output"
-            )
+            data_source_path = WORKSPACE.output_dir("prod")
 
             # Construct full file path
             full_file_path = data_source_path / file_path
@@ -778,12 +833,7 @@ class BulkDownloadView(APIView):
 
     def get(self, request, run_id: str):
         try:
-            data_source_path = (
-                Path(__file__).resolve().parent.parent.parent
-                / "data_pipeline"
-                / "data_source"
-                / "agm_output"
-            )
+            data_source_path = WORKSPACE.output_dir("prod")
 
             # Find the run folder that contains files with this run_id
             run_folder = None
@@ -0,0 +1,187 @@
+import argparse
+import re
+import time
+from pathlib import Path
+
+import numpy as np
+from load_to_postgres import (connect_to_db, create_connection_pool,
+                              ensure_transaction_partitions, load_transactions,
+                              plan_file_chunks, run_parallel, stage_copy_file)
+
+"""
+Benchmark for load_to_postgres.load_transactions (10M rows by default)
+- Builds a scratch schema (walmart_bench) from schema.sql, never touches walmart
+- Generates synthetic cust1/cust2/lookup rows + a transactions csv
+- Times each strategy on an empty transactions table:
+    - two_pass: previous implementation (one INSERT per lookup key + setval(MAX()), a
+      no-op kept as it was: transaction_id is a plain INTEGER without a sequence)
+    - single_pass: current load_transactions
+    - single_pass_parallel: same, chunked over the connection pool
+
+Usage (from ./backend):
+    python database/benchmark_load.py --rows 10000000 --workers 4
+"""
+
+BENCH_SCHEMA = "walmart_bench"
+ROOT = Path(__file__).resolve().parent.parent
+
+
+def create_bench_schema(conn):
+    """schema.sql with walmart replaced by the bench schema (dropped first)"""
+    schema_sql = (ROOT / "database" / "schema.sql").read_text()
+    schema_sql = re.sub(r"\bwalmart\b", BENCH_SCHEMA, schema_sql, flags=re.IGNORECASE)
+    with conn.cursor() as cur:
+        cur.execute(f"DROP SCHEMA IF EXISTS {BENCH_SCHEMA} CASCADE;")
+        cur.execute(schema_sql)
+    conn.commit()
+
+
+def seed_dimensions(conn, n_cust, n_products):
+    """cust1 ids [0, n_cust), cust2 ids [n_cust, 2*n_cust), products after that"""
+    with conn.cursor() as cur:
+        cur.execute(
+            f"""
+            INSERT INTO {BENCH_SCHEMA}.cust1 (unique_id, segment_id)
+            SELECT i, i %% 5 FROM generate_series(0, %s - 1) i;
+            INSERT INTO {BENCH_SCHEMA}.cust2 (unique_id, segment_id)
+            SELECT i, i %% 5 FROM generate_series(%s, 2 * %s - 1) i;
+            INSERT INTO {BENCH_SCHEMA}.customers_lookup (cust1_id, segment_id)
+            SELECT unique_id, segment_id FROM {BENCH_SCHEMA}.cust1;
+            INSERT INTO {BENCH_SCHEMA}.customers_lookup (cust2_id, segment_id)
+            SELECT unique_id, segment_id FROM {BENCH_SCHEMA}.cust2;
+            INSERT INTO {BENCH_SCHEMA}.products (product_id, category, unit_price)
+            SELECT 2 * %s + i, 'cat_' || (i %% 20), 10 + i %% 90
+            FROM generate_series(0, %s - 1) i;
+        """,
+            (n_cust, n_cust, n_cust, n_cust, n_products),
+        )
+        ensure_transaction_partitions(cur, BENCH_SCHEMA, "20250101", "20250131")
+    conn.commit()
+
+
+def write_transactions_csv(
+    path, n_rows, n_cust, n_products, seed=42, batch=1_000_000
+):
+    """Same columns as WalmartModel.save_results_as_df() transactions"""
+    rng = np.random.default_rng(seed)
+    with open(path, "w") as f:
+        f.write(
+            "transaction_id,unique_id,product_id,unit_price,quantity,"
+            "date_purchased,category,cust_type,run_id\n"
+        )
+        for start in range(0, n_rows, batch):
+            n = min(batch, n_rows - start)
+            unique_id = rng.integers(0, 2 * n_cust, n)
+            product = rng.integers(0, n_products, n)
+            quantity = rng.integers(1, 5, n)
+            day = rng.integers(1, 28, n)
+            lines = [
+                f"{start + i},{u},{2 * n_cust + p},{10 + p % 90},{q},"
+                f"202501{d:02d},cat_{p % 20},{'Cust1' if u < n_cust else 'Cust2'},bench"
+                for i, (u, p, q, d) in enumerate(
+                    zip(unique_id, product, quantity, day)
+                )
+            ]
+            f.write("\n".join(lines) + "\n")
+
+
+def load_two_pass(cur, schema, path):
+    """Previous load_transactions: one INSERT per lookup key, then setval(MAX())"""
+    table = "transactions"
+    staging, cols = stage_copy_file(cur, schema, table, path, include_pk=True)
+    select_expr = ", ".join(
+        "l.customer_id" if c == "unique_id" else f"s.{c}" for c in cols
+    )
+    for lookup_col in ("cust1_id", "cust2_id"):
+        cur.execute(
+            f"""
+            INSERT INTO {schema}.{table} ({", ".join(cols)})
+            SELECT {select_expr}
+            FROM {staging} s
+            JOIN {schema}.customers_lookup l
+            ON l.{lookup_col} = s.unique_id
+            ON CONFLICT (transaction_id, date_purchased) DO NOTHING;
+        """
+        )
+    cur.execute(
+        f"""
+        SELECT setval(
+            pg_get_serial_sequence('{schema}.{table}', 'transaction_id'),
+            COALESCE((SELECT MAX(transaction_id) FROM {schema}.{table}), 0)
+        );
+    """
+    )
+
+
+def truncate_transactions(conn):
+    with conn.cursor() as cur:
+        cur.execute(f"TRUNCATE {BENCH_SCHEMA}.transactions;")
+    conn.commit()
+
+
+def time_strategy(conn, name, fn):
+    truncate_transactions(conn)
+    start = time.perf_counter()
+    fn()
+    elapsed = time.perf_counter() - start
+    with conn.cursor() as cur:
+        cur.execute(f"SELECT COUNT(*) FROM {BENCH_SCHEMA}.transactions;")
+        loaded = cur.fetchone()[0]
+    print(
+        f"{name:<22} {elapsed:>9.2f}s {loaded:>12} rows {loaded / elapsed:>12.0f} rows/s"
+    )
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark transaction loading")
+    parser.add_argument("--rows", type=int, default=10_000_000)
+    parser.add_argument("--customers", type=int, default=100_000)
+    parser.add_argument("--products", type=int, default=1_000)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--csv", default="/tmp/bench_transactions.csv")
+    parser.add_argument("--keep", action="store_true", help="Keep the bench schema")
+    args = parser.parse_args()
+
+    conn = connect_to_db()
+    print(f"Creating schema {BENCH_SCHEMA}...")
+    create_bench_schema(conn)
+    seed_dimensions(conn, args.customers, args.products)
+
+    csv_path = Path(args.csv)
+    print(f"Writing {args.rows} transactions to {csv_path}...")
+    write_transactions_csv(csv_path, args.rows, args.customers, args.products)
+
+    def run_single_connection(load_fn):
+        with conn.cursor() as cur:
+            load_fn(cur, BENCH_SCHEMA, str(csv_path))
+        conn.commit()
+
+    def run_pool():
+        pool = create_connection_pool(args.workers)
+        try:
+            chunks = plan_file_chunks(csv_path)
+            run_parallel(
+                pool,
+                [(load_transactions, BENCH_SCHEMA, c) for c in chunks],
+                max_workers=args.workers,
+            )
+        finally:
+            pool.closeall()
+
+    print(f"\n{'strategy':<22} {'time':>10} {'loaded':>17} {'throughput':>19}")
+    print("-" * 72)
+    time_strategy(conn, "two_pass", lambda: run_single_connection(load_two_pass))
+    time_strategy(conn, "single_pass", lambda: run_single_connection(load_transactions))
+    time_strategy(conn, "single_pass_parallel", run_pool)
+
+    if not args.keep:
+        with conn.cursor() as cur:
+            cur.execute(f"DROP SCHEMA IF EXISTS {BENCH_SCHEMA} CASCADE;")
+        conn.commit()
+        csv_path.unlink(missing_ok=True)
+    conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,21 +1,40 @@
+import argparse
+import csv
+import hashlib
 import io
 import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from dataclasses import dataclass, field
 from pathlib import Path
 
-import pandas as pd
 import psycopg2
 from dotenv import load_dotenv
 from psycopg2 import sql
+from psycopg2.pool import ThreadedConnectionPool
 
 """
 Loading csv files generated by AGM into Postgres
 Methods:
 - Connect to the database using variables in .envs
 - Create the database schema using schema.sql
-- Load the csv files into the database
-    - use mogrify() for efficient batch insert
+- Load the csv/parquet files into the database
+    - file bytes are streamed straight into COPY (no pandas round-trip)
+    - dimension tables (cust1, cust2, products) are loaded concurrently
+    - large transaction files are split into line-aligned byte ranges (parquet: row groups)
+      and loaded in parallel over a small connection pool, one transaction per chunk
+    - every chunk goes through a TEMP staging table + idempotent upsert, so a failed
+      run can simply be re-run
+- Incremental: load_ledger records every ingested file (path + checksum)
+    - watermark = newest run_time folder in the ledger
+    - only folders >= watermark are scanned, only files with a new checksum are loaded
+    - schema.sql is idempotent; pass --rebuild to drop and recreate the warehouse
+- Stage timings / rows / bytes go through helper.instrumentation (data_pipeline/method)
+    - load.dimension, load.customer_lookup, load.partitions, load.transactions_chunk, load.batch
+    - null backend unless METRICS_BACKEND=statsd
 
-Root directory: ./backend
+Paths are absolute (built from the backend directory), any working directory works
 
 Past Errors:
 - Duplicate keys when inserting => duplicated keys when generating new runs => 
@@ -23,9 +42,8 @@ Past Errors:
 """
 
 
-# Always execute at data_pipeline directory
+# Backend directory: every path below is built from it (no chdir)
 ROOT = Path(__file__).resolve().parent.parent
-os.chdir(ROOT)
 # Load environment variables
 load_dotenv(ROOT / ".env")
 
@@ -37,35 +55,107 @@ tables = [
     "transactions",
 ]
 
+# Dimension table -> primary key used for the upsert
+dimension_keys = {
+    "cust1": "unique_id",
+    "cust2": "unique_id",
+    "products": "product_id",
+}
+
+# Parallel load settings
+LOAD_WORKERS = int(os.getenv("LOAD_WORKERS", 4))
+LOAD_CHUNK_BYTES = int(os.getenv("LOAD_CHUNK_MB", 64)) * 1024 * 1024
+PARQUET_BATCH_ROWS = 100_000
+
 if "airflow" in str(ROOT):
     result_file_path = ROOT / Path("../data_source/agm_output")
+    method_path = ROOT / Path("../method")
 else:
     result_file_path = ROOT / Path("../data_pipeline/data_source/agm_output")
+    method_path = ROOT / Path("../data_pipeline/method")
+
+# Shared instrumentation helper lives with the simulation code
+if str(method_path) not in sys.path:
+    sys.path.append(str(method_path))
+from helper.instrumentation import get_metrics, timed, timed_function  # noqa: E402
+
+
+def get_db_params():
+    return dict(
+        host=str(os.getenv("DB_HOST")),
+        dbname=str(os.getenv("DB_NAME")),
+        user=str(os.getenv("DB_USER")),
+        password=str(os.getenv("DB_PASSWORD")),
+        port=int(os.getenv("DB_PORT", 5432)),
+    )
 
 
 def connect_to_db():
     """Establish connection to PostgreSQL database."""
     try:
-        conn = psycopg2.connect(
-            host=str(os.getenv("DB_HOST")),
-            dbname=str(os.getenv("DB_NAME")),
-            user=str(os.getenv("DB_USER")),
-            password=str(os.getenv("DB_PASSWORD")),
-            port=int(os.getenv("DB_PORT", 5432)),
-        )
+        conn = psycopg2.connect(**get_db_params())
         return conn
     except Exception as e:
         print(f"Error connecting to database: {e}")
         raise
 
 
-def setup_database():
-    """Create database schema from SQL file."""
+def create_connection_pool(max_conn=LOAD_WORKERS):
+    """Small thread-safe pool shared by the parallel load workers."""
+    try:
+        return ThreadedConnectionPool(1, max_conn, **get_db_params())
+    except Exception as e:
+        print(f"Error creating connection pool: {e}")
+        raise
+
+
+@contextmanager
+def pooled_cursor(pool):
+    """
+    Borrow a connection from the pool and run everything inside one transaction.
+    Commit on success, rollback on error, always give the connection back.
+    """
+    conn = pool.getconn()
+    try:
+        with conn.cursor() as cur:
+            yield cur
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        pool.putconn(conn)
+
+
+def run_in_transaction(pool, fn, *args):
+    with pooled_cursor(pool) as cur:
+        return fn(cur, *args)
+
+
+def run_parallel(pool, jobs, max_workers=LOAD_WORKERS):
+    """
+    Input: jobs -> [(fn, *args), ...], each fn(cur, *args) runs in its own connection/transaction
+    Output: results in job order (the first failure is re-raised)
+    """
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = [executor.submit(run_in_transaction, pool, *job) for job in jobs]
+        return [f.result() for f in futures]
+
+
+def setup_database(rebuild=False):
+    """
+    Create database schema from SQL file (idempotent, existing data is kept).
+    rebuild=True drops the whole schema first (full reload on the next run).
+    """
 
     conn = connect_to_db()
     cur = conn.cursor()
 
-    with open("./database/schema.sql", "r") as f:
+    if rebuild:
+        print("Dropping schema 'walmart' (rebuild)...")
+        cur.execute("DROP SCHEMA IF EXISTS walmart CASCADE;")
+
+    with open(ROOT / "database" / "schema.sql", "r") as f:
         schema_sql = f.read()
         cur.execute(schema_sql)
         conn.commit()
@@ -113,25 +203,121 @@ def verify_tables(tables, schema, conn):
     cur.close()
 
 
-def get_latest_result_folder(output_folder=result_file_path):
+def get_result_folders(output_folder=result_file_path):
+    """run_time=<time> folders sorted oldest -> newest"""
     data_folder = Path(output_folder)
-    subfolder = [f for f in data_folder.iterdir()]
-    latest_folder = max(subfolder, key=lambda x: str(x).split("=")[-1])
-    return str(latest_folder)
+    subfolder = [f for f in data_folder.iterdir() if f.is_dir()]
+    return sorted(subfolder, key=lambda x: str(x).split("=")[-1])
 
 
-def get_latest_file_paths(tables=tables):
+def get_latest_result_folder(output_folder=result_file_path):
+    return str(get_result_folders(output_folder)[-1])
+
+
+def get_folder_file_paths(folder, tables=tables):
     """
-    Output: {"cust1":"../data_pipeline/data_source/agm_output/run_time=<time>/id=<id>_cust1.csv",...}
+    Output: {"cust1":"<folder>/id=<id>_cust1.csv",...} (tables without a file are left out)
+    Parquet files (id=<id>_cust1.parquet) are picked up when there is no csv.
     """
-    latest_result_folder = get_latest_result_folder()
     csv_path_dict = {}
     for t in tables:
-        file_path = [str(x) for x in Path(latest_result_folder).glob(f"*{t}.csv")][0]
-        csv_path_dict[t] = file_path
+        file_path = [str(x) for x in Path(folder).glob(f"*{t}.csv")]
+        file_path += [str(x) for x in Path(folder).glob(f"*{t}.parquet")]
+        if file_path:
+            csv_path_dict[t] = file_path[0]
     return csv_path_dict
 
 
+def get_latest_file_paths(tables=tables):
+    """
+    Output: {"cust1":"../data_pipeline/data_source/agm_output/run_time=<time>/id=<id>_cust1.csv",...}
+    """
+    return get_folder_file_paths(get_latest_result_folder(), tables)
+
+
+@dataclass
+class LoadBatch:
+    """New/changed files of one run_time folder, loaded together."""
+
+    folder: str
+    file_paths: dict[str, str] = field(default_factory=dict)
+    checksums: dict[str, str] = field(default_factory=dict)
+
+
+def file_checksum(path):
+    with open(path, "rb") as f:
+        return hashlib.file_digest(f, "sha256").hexdigest()
+
+
+def ledger_key(path):
+    """'run_time=<time>/id=<id>_cust1.csv' -> same key for the airflow and local data paths"""
+    path = Path(path)
+    return f"{path.parent.name}/{path.name}"
+
+
+def get_watermark(cur, schema):
+    """Newest run_time folder already in the ledger (None on an empty warehouse)"""
+    cur.execute(f"SELECT MAX(run_folder) FROM {schema}.load_ledger;")
+    return cur.fetchone()[0]
+
+
+def get_pending_batches(conn, schema, output_folder=result_file_path):
+    """
+    Files that still have to be loaded, grouped by folder (oldest first).
+    - Folders older than the watermark are skipped without reading them
+    - The watermark folder itself is re-checked (runs of the same day append to its files)
+    - A file is pending when its (path, checksum) is not in the ledger
+    Output: [LoadBatch,...]
+    """
+    with conn.cursor() as cur:
+        watermark = get_watermark(cur, schema)
+        folders = [
+            f
+            for f in get_result_folders(output_folder)
+            if watermark is None or f.name >= watermark
+        ]
+
+        batches = []
+        for folder in folders:
+            batch = LoadBatch(folder=folder.name)
+            for table, path in get_folder_file_paths(folder).items():
+                checksum = file_checksum(path)
+                cur.execute(
+                    f"""
+                    SELECT 1 FROM {schema}.load_ledger
+                    WHERE file_path = %s AND checksum = %s;
+                """,
+                    (ledger_key(path), checksum),
+                )
+                if cur.fetchone() is None:
+                    batch.file_paths[table] = path
+                    batch.checksums[table] = checksum
+            if batch.file_paths:
+                batches.append(batch)
+    return batches
+
+
+def record_loaded_files(cur, schema, batch):
+    """Add the batch files to the ledger (after all their data is committed)."""
+    get_metrics().incr("load.files", len(batch.file_paths))
+    for table, path in batch.file_paths.items():
+        cur.execute(
+            f"""
+            INSERT INTO {schema}.load_ledger
+                (file_path, checksum, table_name, run_folder, file_size)
+            VALUES (%s, %s, %s, %s, %s)
+            ON CONFLICT (file_path, checksum) DO NOTHING;
+        """,
+            (
+                ledger_key(path),
+                batch.checksums[table],
+                table,
+                batch.folder,
+                os.path.getsize(path),
+            ),
+        )
+
+
 def get_target_schema_columns(cur, schema, table):
     """
     Select the columns from csv files that is needed to load into sql schema.
@@ -149,45 +335,244 @@ def get_target_schema_columns(cur, schema, table):
     return [r[0] for r in cur.fetchall()]
 
 
-def stage_copy_dataframe(cur, schema, table, df, include_pk=False):
+@dataclass
+class FileChunk:
+    """
+    Part of an input file loaded by one worker.
+    - csv: byte_range=(start, end) of whole lines, header=first line of the file (re-sent to COPY)
+    - parquet: row_groups=[...] to read
+    - both None: the whole file
+    """
+
+    path: Path
+    byte_range: tuple[int, int] | None = None
+    header: bytes = b""
+    row_groups: list[int] | None = None
+
+
+class ByteRangeReader:
+    """
+    Minimal file-like object for cursor.copy_expert():
+    yields the header line first, then the bytes in [start, end) of the file.
+    """
+
+    def __init__(self, path, start, end, header=b""):
+        self._f = open(path, "rb")
+        self._f.seek(start)
+        self._remaining = end - start
+        self._header = header
+
+    def read(self, size=-1):
+        if self._header:
+            data, self._header = self._header, b""
+            return data
+        if self._remaining <= 0:
+            return b""
+        if size is None or size < 0 or size > self._remaining:
+            size = self._remaining
+        data = self._f.read(size)
+        self._remaining -= len(data)
+        return data
+
+    def close(self):
+        self._f.close()
+
+
+def chunk_to_dict(chunk):
+    """JSON-friendly FileChunk (Airflow XCom); the header is re-read from the file"""
+    return {
+        "path": str(chunk.path),
+        "byte_range": list(chunk.byte_range) if chunk.byte_range else None,
+        "row_groups": chunk.row_groups,
+    }
+
+
+def chunk_from_dict(data):
+    header = b""
+    if data.get("byte_range"):
+        with open(data["path"], "rb") as f:
+            header = f.readline()
+    return FileChunk(
+        Path(data["path"]),
+        byte_range=tuple(data["byte_range"]) if data.get("byte_range") else None,
+        header=header,
+        row_groups=data.get("row_groups"),
+    )
+
+
+def is_parquet(path):
+    return Path(path).suffix == ".parquet"
+
+
+def read_file_columns(path):
+    """Lowercased column names from the csv header / parquet schema (Postgres conventions)."""
+    if is_parquet(path):
+        import pyarrow.parquet as pq  # optional dependency, only needed for parquet inputs
+
+        return [c.lower() for c in pq.ParquetFile(path).schema_arrow.names]
+
+    with open(path, "r", newline="") as f:
+        return [c.strip().lower() for c in next(csv.reader(f))]
+
+
+def plan_file_chunks(path, chunk_bytes=LOAD_CHUNK_BYTES):
+    """
+    Split a file into chunks of ~chunk_bytes for parallel loading.
+    - csv: boundaries are moved to the next newline (AGM csv files have no quoted newlines)
+    - parquet: consecutive row groups are grouped up to ~chunk_bytes (uncompressed size)
+    Output: [FileChunk,...]
+    """
+    path = Path(path)
+
+    if is_parquet(path):
+        import pyarrow.parquet as pq
+
+        metadata = pq.ParquetFile(path).metadata
+        chunks, current, current_size = [], [], 0
+        for i in range(metadata.num_row_groups):
+            current.append(i)
+            current_size += metadata.row_group(i).total_byte_size
+            if current_size >= chunk_bytes:
+                chunks.append(FileChunk(path, row_groups=current))
+                current, current_size = [], 0
+        if current or not chunks:
+            chunks.append(FileChunk(path, row_groups=current))
+        return chunks
+
+    size = path.stat().st_size
+    with open(path, "rb") as f:
+        header = f.readline()
+        bounds = [f.tell()]
+        while bounds[-1] + chunk_bytes < size:
+            f.seek(bounds[-1] + chunk_bytes)
+            f.readline()  # move to the end of the current line
+            if f.tell() >= size:
+                break
+            bounds.append(f.tell())
+    bounds.append(size)
+
+    return [
+        FileChunk(path, byte_range=(start, end), header=header)
+        for start, end in zip(bounds[:-1], bounds[1:])
+    ]
+
+
+def create_staging_table(cur, schema, table, file_cols, including="ALL"):
+    """
+    TEMP staging table shaped like the target (dropped at commit).
+    Columns in the file but not in the target are added as TEXT so COPY can take the raw file.
+    including="DEFAULTS" skips the target's constraints/indexes (faster COPY, index afterwards).
+    """
+    staging = f"stg_{table}"
+    cur.execute(
+        sql.SQL(
+            "CREATE TEMP TABLE {} (LIKE {}.{} INCLUDING {}) ON COMMIT DROP;"
+        ).format(
+            sql.Identifier(staging),
+            sql.Identifier(schema),
+            sql.Identifier(table),
+            sql.SQL({"ALL": "ALL", "DEFAULTS": "DEFAULTS"}[including]),
+        )
+    )
+
+    target_cols = get_target_schema_columns(cur, schema, table)
+    for c in file_cols:
+        if c not in target_cols:
+            cur.execute(
+                sql.SQL("ALTER TABLE {} ADD COLUMN {} TEXT;").format(
+                    sql.Identifier(staging), sql.Identifier(c)
+                )
+            )
+    return staging, target_cols
+
+
+def copy_chunk_into(cur, staging, file_cols, chunk):
+    """Stream the file (or a chunk of it) into the staging table with COPY."""
+    copy_sql = sql.SQL("COPY {} ({}) FROM STDIN WITH (FORMAT csv, HEADER true)").format(
+        sql.Identifier(staging), sql.SQL(", ").join(map(sql.Identifier, file_cols))
+    )
+    copy_sql = copy_sql.as_string(cur)
+
+    if is_parquet(chunk.path):
+        import pyarrow.csv as pacsv
+        import pyarrow.parquet as pq
+
+        parquet_file = pq.ParquetFile(chunk.path)
+        for batch in parquet_file.iter_batches(
+            batch_size=PARQUET_BATCH_ROWS, row_groups=chunk.row_groups
+        ):
+            buf = io.BytesIO()
+            pacsv.write_csv(batch, buf)
+            buf.seek(0)
+            cur.copy_expert(copy_sql, buf)
+    elif chunk.byte_range:
+        reader = ByteRangeReader(chunk.path, *chunk.byte_range, header=chunk.header)
+        try:
+            cur.copy_expert(copy_sql, reader)
+        finally:
+            reader.close()
+    else:
+        with open(chunk.path, "rb") as f:
+            cur.copy_expert(copy_sql, f)
+
+
+def stage_copy_file(
+    cur, schema, table, source, include_pk=False, including="ALL", file_cols=None
+):
     """
-    Create a TEMP staging table shaped like the target and COPY the dataframe into it.
+    Create a TEMP staging table shaped like the target and COPY the file into it.
     Input:
         - schema: sql schema (walmart)
         - table: table name (cust1, cust2,...)
-        - df: dataframe from the csv
+        - source: path to the csv/parquet file or a FileChunk of it
+        - file_cols: header of the file if already read
     Returns: (staging_table_name, load_cols)
     """
-    # Normalize column names to lowercase to match Postgres conventions
-    df.columns = [c.lower() for c in df.columns]
+    chunk = source if isinstance(source, FileChunk) else FileChunk(Path(source))
+    file_cols = file_cols or read_file_columns(chunk.path)
+
     exclude = {"created_at", "updated_at"}
     if not include_pk:
         exclude |= {"transaction_id"}
 
-    target_cols = get_target_schema_columns(cur, schema, table)
+    staging, target_cols = create_staging_table(
+        cur, schema, table, file_cols, including
+    )
     load_cols = [
-        c for c in target_cols if c in df.columns and c not in exclude
+        c for c in target_cols if c in file_cols and c not in exclude
     ]  # keep only existing columns
 
-    staging = f"stg_{table}"
-    cur.execute(
-        sql.SQL("CREATE TEMP TABLE {} (LIKE {}.{} INCLUDING ALL);").format(
-            sql.Identifier(staging), sql.Identifier(schema), sql.Identifier(table)
-        )
-    )
-
-    # COPY from a CSV buffer
-    buf = io.StringIO()  # A file placeholder
-    df[load_cols].to_csv(buf, index=False)
-    buf.seek(0)
-    copy_sql = sql.SQL("COPY {} ({}) FROM STDIN WITH (FORMAT csv, HEADER true)").format(
-        sql.Identifier(staging), sql.SQL(", ").join(map(sql.Identifier, load_cols))
-    )
-    cur.copy_expert(copy_sql.as_string(cur), buf)  # Run the copy command
+    copy_chunk_into(cur, staging, file_cols, chunk)
 
     return staging, load_cols
 
 
+def upsert_dimension(cur, schema, table, path, key):
+    """
+    Upsert one dimension table (cust1, cust2, products) on its primary key;
+    keep latest attributes and run_id.
+    Rows are only rewritten when an attribute changed, and updated_at is bumped for them
+    (watermark of the incremental dbt dimensions).
+    """
+    with timed("load.dimension", tags={"table": table}) as stats:
+        staging, cols = stage_copy_file(cur, schema, table, path)
+        update_cols = [c for c in cols if c != key]
+        set_expr = ", ".join([f"{c}=EXCLUDED.{c}" for c in update_cols])
+
+        cur.execute(
+            f"""
+            INSERT INTO {schema}.{table} AS t ({", ".join(cols)})
+            SELECT {", ".join([f"s.{c}" for c in cols])}
+            FROM {staging} s
+            ON CONFLICT ({key}) DO UPDATE
+            SET {set_expr}, updated_at = CURRENT_TIMESTAMP
+            WHERE ({", ".join([f"t.{c}" for c in update_cols])})
+            IS DISTINCT FROM ({", ".join([f"EXCLUDED.{c}" for c in update_cols])});
+        """
+        )
+        stats["rows"] = cur.rowcount
+
+
 def upsert_cust(cur, schema, cust_csv_paths):
     """
     Load and upsert customer dimension tables for both cust1 and cust2.
@@ -196,29 +581,13 @@ def upsert_cust(cur, schema, cust_csv_paths):
     For each:
       PK = unique_id
       Upsert on unique_id; keep latest attributes; update run_id.
-      Maintains customers_lookup table (idempotent).
     """
     for table in ("cust1", "cust2"):
         csv_path = cust_csv_paths.get(table)
         if not csv_path or not os.path.exists(csv_path):
             print(f"⚠ Skipping {table} — no CSV found.")
             continue
-
-        df = pd.read_csv(csv_path)
-        staging, cols = stage_copy_dataframe(
-            cur, schema, table, df
-        )  # Creating temporary staging tables
-        key = "unique_id"
-        set_expr = ", ".join([f"{c}=EXCLUDED.{c}" for c in cols if c != key])
-
-        cur.execute(
-            f"""
-            INSERT INTO {schema}.{table} ({", ".join(cols)})
-            SELECT {", ".join([f"s.{c}" for c in cols])}
-            FROM {staging} s
-            ON CONFLICT ({key}) DO UPDATE SET {set_expr};
-        """
-        )
+        upsert_dimension(cur, schema, table, csv_path, dimension_keys[table])
 
 
 def upsert_products(cur, schema, csv_paths):
@@ -228,22 +597,10 @@ def upsert_products(cur, schema, csv_paths):
       Upsert on product_id; update attributes + run_id.
     """
     table = "products"
-    product_paths = csv_paths.get(table)
-    product_df = pd.read_csv(product_paths)
-
-    staging, cols = stage_copy_dataframe(cur, schema, table, product_df)
-    key = "product_id"
-    set_expr = ", ".join([f"{c}=EXCLUDED.{c}" for c in cols if c != key])
-    cur.execute(
-        f"""
-        INSERT INTO {schema}.{table} ({", ".join(cols)})
-        SELECT {", ".join([f"s.{c}" for c in cols])}
-        FROM {staging} s
-        ON CONFLICT ({key}) DO UPDATE SET {set_expr};
-    """
-    )
+    upsert_dimension(cur, schema, table, csv_paths.get(table), dimension_keys[table])
 
 
+@timed_function("load.customer_lookup")
 def load_customer_lookup(cur, schema):
     cur.execute(
         f"""
@@ -251,7 +608,10 @@ def load_customer_lookup(cur, schema):
     SELECT c.unique_id, c.segment_id, c.run_id
     FROM {schema}.cust1 AS c
     ON CONFLICT (cust1_id) DO UPDATE 
-    SET segment_id = EXCLUDED.segment_id, run_id = EXCLUDED.run_id;
+    SET segment_id = EXCLUDED.segment_id, run_id = EXCLUDED.run_id,
+        updated_at = CURRENT_TIMESTAMP
+    WHERE (customers_lookup.segment_id, customers_lookup.run_id)
+    IS DISTINCT FROM (EXCLUDED.segment_id, EXCLUDED.run_id);
     """
     )
 
@@ -261,99 +621,465 @@ def load_customer_lookup(cur, schema):
     SELECT c.unique_id, c.segment_id, c.run_id
     FROM {schema}.cust2 AS c
     ON CONFLICT (cust2_id) DO UPDATE 
-    SET segment_id = EXCLUDED.segment_id, run_id = EXCLUDED.run_id;
+    SET segment_id = EXCLUDED.segment_id, run_id = EXCLUDED.run_id,
+        updated_at = CURRENT_TIMESTAMP
+    WHERE (customers_lookup.segment_id, customers_lookup.run_id)
+    IS DISTINCT FROM (EXCLUDED.segment_id, EXCLUDED.run_id);
     """
     )
 
 
-def load_transactions(cur, schema, csv_paths):
+def load_transactions(cur, schema, source):
     """
     Transactions are immutable events so only append no update based on primary key -> on conflict do nothing
     Also, PK might not be needed but we added here for simplicity and consistency with other tables.
+    Rows that were actually inserted are captured in the temp table new_transactions (via RETURNING)
+    so the spend rankings can be refreshed from this batch only.
+    Input: source -> transactions csv/parquet path or a FileChunk of it
+
+    The target partitions must exist (ensure_transaction_partitions) before the chunks run,
+    so the parallel workers never take DDL locks on the parent table.
+
+    Single pass over the staging table:
+    - cust_type ('Cust1'/'Cust2', written by the simulation) picks which lookup key to join
+    - files without cust_type fall back to whichever lookup key matches
+    - staging is created without indexes (fast COPY), then indexed + analyzed for the join
     """
     table = "transactions"
-    trans_path = csv_paths.get(table)
-    trans_df = pd.read_csv(trans_path)
+    chunk = source if isinstance(source, FileChunk) else FileChunk(Path(source))
+    file_cols = read_file_columns(chunk.path)
+    staging, cols = stage_copy_file(
+        cur,
+        schema,
+        table,
+        chunk,
+        include_pk=True,
+        including="DEFAULTS",
+        file_cols=file_cols,
+    )
+
+    cur.execute(f"CREATE INDEX ON {staging} (unique_id);")
+    cur.execute(f"ANALYZE {staging};")  # temp tables are never auto-analyzed
+
+    cur.execute(
+        f"""
+        CREATE TEMP TABLE new_{table} (
+            transaction_id INTEGER,
+            unique_id INTEGER,
+            product_id INTEGER,
+            unit_price FLOAT,
+            quantity INTEGER
+        ) ON COMMIT DROP;
+    """
+    )
+
+    if "cust_type" in file_cols:
+        cust1_match = "AND s.cust_type = 'Cust1'"
+        cust2_match = "AND s.cust_type = 'Cust2'"
+    else:
+        cust1_match = cust2_match = ""
 
-    staging, cols = stage_copy_dataframe(cur, schema, table, trans_df, include_pk=True)
+    # unique_id in the warehouse is the lookup customer_id
+    select_expr = ", ".join(
+        "COALESCE(l1.customer_id, l2.customer_id)" if c == "unique_id" else f"s.{c}"
+        for c in cols
+    )
 
-    # Simple idempotent insert:
     cur.execute(
         f"""
-        INSERT INTO {schema}.{table} ({", ".join(cols)})
-        SELECT 
-        s.transaction_id,
-        l.customer_id,
-        s.product_id,
-        s.unit_price,
-        s.quantity,
-        s.date_purchased,
-        s.category,
-        s.run_id
-        FROM {staging} s
-        JOIN {schema}.customers_lookup l
-        ON l.cust1_id = s.unique_id
-        ON CONFLICT (transaction_id) DO NOTHING;
+        WITH inserted AS (
+            INSERT INTO {schema}.{table} ({", ".join(cols)})
+            SELECT {select_expr}
+            FROM {staging} s
+            LEFT JOIN {schema}.customers_lookup l1
+            ON l1.cust1_id = s.unique_id {cust1_match}
+            LEFT JOIN {schema}.customers_lookup l2
+            ON l2.cust2_id = s.unique_id {cust2_match}
+            WHERE COALESCE(l1.customer_id, l2.customer_id) IS NOT NULL
+            ON CONFLICT (transaction_id, date_purchased) DO NOTHING
+            RETURNING transaction_id, unique_id, product_id, unit_price, quantity
+        )
+        INSERT INTO new_{table} SELECT * FROM inserted;
+    """
+    )
+
+
+def normalize_date(value):
+    """'2025-01-31', '2025-01-31 00:00:00', '20250131' -> '20250131' (sortable)"""
+    return str(value)[:10].replace("-", "")
+
+
+def get_file_date_range(path, column="date_purchased"):
+    """
+    (min, max) of the date column as 'YYYYMMDD' strings, (None, None) if the file has no rows.
+    - parquet: only the date column is read
+    - csv: one streaming pass over the lines (no csv parsing unless the line has quotes)
+    """
+    if is_parquet(path):
+        import pyarrow.compute as pc
+        import pyarrow.parquet as pq
+
+        names = pq.ParquetFile(path).schema_arrow.names
+        source_col = next(c for c in names if c.lower() == column)
+        values = pq.read_table(path, columns=[source_col]).column(0)
+        values = pc.cast(values, "string")
+        values = pc.utf8_slice_codeunits(pc.replace_substring(values, "-", ""), 0, 8)
+        min_max = pc.min_max(values)
+        return min_max["min"].as_py(), min_max["max"].as_py()
+
+    idx = read_file_columns(path).index(column)
+    low = high = None
+    with open(path, "r", newline="") as f:
+        next(f)  # header
+        for line in f:
+            if '"' in line:
+                value = next(csv.reader([line]))[idx]
+            else:
+                value = line.split(",", idx + 1)[idx]
+            if not value.strip():
+                continue
+            value = normalize_date(value)
+            if low is None or value < low:
+                low = value
+            if high is None or value > high:
+                high = value
+    return low, high
+
+
+@timed_function("load.partitions")
+def ensure_transaction_partitions(cur, schema, start_date, end_date):
     """
+    Create the missing monthly partitions (TRANSACTIONS_PYYYYMM) covering [start_date, end_date].
+    Runs in its own short transaction before the parallel chunk loads; the advisory lock
+    serializes concurrent loaders creating the same month.
+    """
+    if start_date is None:
+        return []
+    cur.execute(
+        "SELECT pg_advisory_xact_lock(hashtext(%s));", (f"{schema}.transactions",)
+    )
+    cur.execute(
+        """
+        SELECT to_char(m, 'YYYYMM'), m::date, (m + INTERVAL '1 month')::date
+        FROM generate_series(
+            date_trunc('month', %s::date), date_trunc('month', %s::date), INTERVAL '1 month'
+        ) AS m;
+    """,
+        (start_date, end_date),
+    )
+    created = []
+    for month, lower, upper in cur.fetchall():
+        partition = f"transactions_p{month}"
+        cur.execute("SELECT to_regclass(%s);", (f"{schema}.{partition}",))
+        if cur.fetchone()[0] is not None:
+            continue
+        cur.execute(
+            sql.SQL(
+                "CREATE TABLE {}.{} PARTITION OF {}.transactions FOR VALUES FROM (%s) TO (%s);"
+            ).format(
+                sql.Identifier(schema),
+                sql.Identifier(partition),
+                sql.Identifier(schema),
+            ),
+            (lower, upper),
+        )
+        created.append(partition)
+    if created:
+        print(f"Created partitions: {created}")
+        get_metrics().incr("load.partitions_created", len(created))
+    return created
+
+
+def get_transaction_partitions(cur, schema):
+    """Monthly partitions of transactions, oldest first"""
+    cur.execute(
+        """
+        SELECT c.relname
+        FROM pg_inherits i
+        JOIN pg_class c ON c.oid = i.inhrelid
+        JOIN pg_class p ON p.oid = i.inhparent
+        JOIN pg_namespace n ON n.oid = p.relnamespace
+        WHERE n.nspname = %s AND p.relname = 'transactions'
+        ORDER BY c.relname;
+    """,
+        (schema,),
     )
+    return [r[0] for r in cur.fetchall()]
 
+
+def drop_old_transaction_partitions(cur, schema, retain_months):
+    """
+    Retention: keep the newest retain_months partitions, drop the older ones.
+    Counted from the newest partition (simulated dates are not wall-clock dates).
+    Dropped rows stay counted in the spend rankings (lifetime totals).
+    """
+    partitions = get_transaction_partitions(cur, schema)
+    to_drop = partitions[:-retain_months] if retain_months > 0 else []
+    for partition in to_drop:
+        cur.execute(
+            sql.SQL("DROP TABLE {}.{};").format(
+                sql.Identifier(schema), sql.Identifier(partition)
+            )
+        )
+    if to_drop:
+        print(f"Dropped partitions: {to_drop}")
+    return to_drop
+
+
+def migrate_legacy_transactions(cur, schema):
+    """
+    One-off: move rows of the pre-partitioning table (renamed to transactions_legacy
+    by schema.sql) into the partitioned table, then drop it.
+    The migrated rows bypass new_transactions: the spend rankings are recomputed from the
+    partitioned table in the same transaction.
+    """
+    cur.execute("SELECT to_regclass(%s);", (f"{schema}.transactions_legacy",))
+    if cur.fetchone()[0] is None:
+        return
+    print("Migrating transactions_legacy into monthly partitions...")
+    cur.execute(
+        f"SELECT MIN(date_purchased), MAX(date_purchased) FROM {schema}.transactions_legacy;"
+    )
+    ensure_transaction_partitions(cur, schema, *cur.fetchone())
     cur.execute(
         f"""
-        INSERT INTO {schema}.{table} ({", ".join(cols)})
-        SELECT 
-        s.transaction_id,
-        l.customer_id,
-        s.product_id,
-        s.unit_price,
-        s.quantity,
-        s.date_purchased,
-        s.category,
-        s.run_id
-        FROM {staging} s
-        JOIN {schema}.customers_lookup l
-        ON l.cust2_id = s.unique_id
-        ON CONFLICT (transaction_id) DO NOTHING;
+        INSERT INTO {schema}.transactions (
+            transaction_id, unique_id, product_id, unit_price, quantity,
+            date_purchased, category, run_id, created_at
+        )
+        SELECT transaction_id, unique_id, product_id, unit_price, quantity,
+            date_purchased, category, run_id, created_at
+        FROM {schema}.transactions_legacy
+        WHERE date_purchased IS NOT NULL
+        ON CONFLICT (transaction_id, date_purchased) DO NOTHING;
     """
     )
-    # Keep the SERIAL's sequence in sync with your explicit IDs
+    print(f"Migrated {cur.rowcount} transactions")
+    cur.execute(f"DROP TABLE {schema}.transactions_legacy;")
+    recompute_spend_rankings(cur, schema)
+
+
+# (dimension table, rank table, key) of the ranking tables read by the list APIs
+SPEND_RANK_TABLES = (
+    ("cust1", "cust1_spend_rank", "unique_id"),
+    ("cust2", "cust2_spend_rank", "unique_id"),
+    ("products", "product_sales_rank", "product_id"),
+)
+
+
+def refresh_spend_rankings(cur, schema):
+    """
+    Incrementally maintain the ranking tables read by the cust1/cust2/products list APIs.
+    - New customers/products get a 0 row (they still show up in the ranking)
+    - Only the transactions inserted by this load (new_transactions) are added to the totals
+    Cost scales with the batch size + number of entities, not with the transactions history.
+    """
+    seed_spend_rankings(cur, schema)
+    increment_spend_rankings(cur, schema)
+
+
+def seed_spend_rankings(cur, schema):
+    """0 rows for new customers/products (after the dimensions are loaded)"""
+    for table, rank_table, key in SPEND_RANK_TABLES:
+        cur.execute(
+            f"""
+            INSERT INTO {schema}.{rank_table} ({key})
+            SELECT {key} FROM {schema}.{table}
+            ON CONFLICT ({key}) DO NOTHING;
+        """
+        )
+
+
+def upsert_spend_totals(cur, schema, source, replace=False):
+    """
+    Sum unit_price * quantity of the source transactions per customer / product.
+    Input:
+        - source -> new_transactions (this load) or {schema}.transactions (full history)
+        - replace -> totals are set to the sums instead of added to them
+    Rows are upserted in key order so parallel chunks lock rank rows in the same order (no deadlocks).
+    """
+    total = "EXCLUDED.total_sum" if replace else "r.total_sum + EXCLUDED.total_sum"
+    for rank_table, lookup_col in (
+        ("cust1_spend_rank", "cust1_id"),
+        ("cust2_spend_rank", "cust2_id"),
+    ):
+        cur.execute(
+            f"""
+            INSERT INTO {schema}.{rank_table} AS r (unique_id, total_sum)
+            SELECT l.{lookup_col}, COALESCE(SUM(n.unit_price * n.quantity), 0)
+            FROM {source} n
+            JOIN {schema}.customers_lookup l ON l.customer_id = n.unique_id
+            WHERE l.{lookup_col} IS NOT NULL
+            GROUP BY l.{lookup_col}
+            ORDER BY l.{lookup_col}
+            ON CONFLICT (unique_id) DO UPDATE
+            SET total_sum = {total},
+                updated_at = CURRENT_TIMESTAMP;
+        """
+        )
+
     cur.execute(
         f"""
-        SELECT setval(
-            pg_get_serial_sequence('{schema}.{table}', 'transaction_id'),
-            COALESCE((SELECT MAX(transaction_id) FROM {schema}.transactions), 0)
-        );
+        INSERT INTO {schema}.product_sales_rank AS r (product_id, total_sum)
+        SELECT n.product_id, COALESCE(SUM(n.unit_price * n.quantity), 0)
+        FROM {source} n
+        WHERE n.product_id IS NOT NULL
+        GROUP BY n.product_id
+        ORDER BY n.product_id
+        ON CONFLICT (product_id) DO UPDATE
+        SET total_sum = {total},
+            updated_at = CURRENT_TIMESTAMP;
     """
     )
 
 
-def main():
+def increment_spend_rankings(cur, schema):
+    """Add new_transactions (rows inserted in the current transaction) to the totals."""
+    upsert_spend_totals(cur, schema, "new_transactions")
+
+
+def recompute_spend_rankings(cur, schema):
+    """
+    Rebuild every total from the whole transactions table (one-off, cost scales with the
+    history). Rows already dropped by --retain-months are not counted anymore.
+    """
+    seed_spend_rankings(cur, schema)
+    for _, rank_table, _ in SPEND_RANK_TABLES:
+        cur.execute(f"UPDATE {schema}.{rank_table} SET total_sum = 0;")
+    upsert_spend_totals(cur, schema, f"{schema}.transactions", replace=True)
+    print("Spend rankings recomputed from the transactions table")
+
+
+def spend_rankings_stale(cur, schema):
+    """
+    True when the incremental totals cannot be trusted on a warehouse with transactions:
+    - empty ledger: every folder is about to be reloaded, but the rows already in
+      transactions hit ON CONFLICT DO NOTHING and never reach new_transactions
+      (warehouse loaded before the ledger existed)
+    - a rank table is empty while its dimension table is not (rank tables added later)
+    """
+    cur.execute(f"SELECT EXISTS (SELECT 1 FROM {schema}.transactions);")
+    if not cur.fetchone()[0]:
+        return False
+    if get_watermark(cur, schema) is None:
+        return True
+    for table, rank_table, _ in SPEND_RANK_TABLES:
+        cur.execute(
+            f"""
+            SELECT EXISTS (SELECT 1 FROM {schema}.{table})
+                AND NOT EXISTS (SELECT 1 FROM {schema}.{rank_table});
+        """
+        )
+        if cur.fetchone()[0]:
+            return True
+    return False
+
+
+def backfill_spend_rankings(cur, schema):
+    """Recompute the rankings once when they are stale (run before loading the batches)"""
+    if spend_rankings_stale(cur, schema):
+        recompute_spend_rankings(cur, schema)
+
+
+def load_transaction_chunk(cur, schema, chunk):
+    """
+    One worker job: COPY + insert one chunk and add its new rows to the spend rankings.
+    Output: inserted rows
+    """
+    with timed("load.transactions_chunk") as stats:
+        load_transactions(cur, schema, chunk)
+        increment_spend_rankings(cur, schema)
+        cur.execute("SELECT COUNT(*) FROM new_transactions;")
+        inserted = cur.fetchone()[0]
+        stats["rows"] = inserted
+        stats["bytes"] = (
+            chunk.byte_range[1] - chunk.byte_range[0]
+            if chunk.byte_range
+            else os.path.getsize(chunk.path)
+        )
+    return inserted
+
+
+def load_batch(pool, schema, file_paths):
+    """
+    Load one folder worth of files: dimensions (parallel) -> lookup -> transactions (parallel chunks)
+    Input: file_paths -> {"cust1": path, ...}, only the tables that need loading
+    """
+    dimension_jobs = [
+        (upsert_dimension, schema, table, file_paths[table], key)
+        for table, key in dimension_keys.items()
+        if table in file_paths
+    ]
+    if dimension_jobs:
+        print("Loading customers and products...")
+        run_parallel(pool, dimension_jobs)
+
+        print("loading cust lookup table")
+        run_in_transaction(pool, load_customer_lookup, schema)
+        run_in_transaction(pool, seed_spend_rankings, schema)
+
+    if "transactions" in file_paths:
+        date_range = get_file_date_range(file_paths["transactions"])
+        run_in_transaction(pool, ensure_transaction_partitions, schema, *date_range)
+
+        chunks = plan_file_chunks(file_paths["transactions"])
+        print(f"Loading transactions ({len(chunks)} chunks)...")
+        inserted = run_parallel(
+            pool, [(load_transaction_chunk, schema, c) for c in chunks]
+        )
+        print(f"Inserted {sum(inserted)} new transactions")
+
+
+def main(rebuild=False, retain_months=None):
     # Connect to database
     schema_name = "walmart"
-    print("Connecting to the database...")
-    with connect_to_db() as conn:
-        print("Connected to database")
-        conn = connect_to_db()
-
-        print("Setting up database schema...")
-        conn = setup_database()
-
-        cur = conn.cursor()
-        file_paths = get_latest_file_paths()
-        print("Loading customers...")
-        upsert_cust(cur, schema_name, file_paths)
-        print("Loading products...")
-        upsert_products(cur, schema_name, file_paths)
-        print("loading cust lookup table")
-        load_customer_lookup(cur, schema_name)
-        print("Loading transactions...")
-        load_transactions(cur, schema_name, file_paths)
+    print("Setting up database schema...")
+    conn = setup_database(rebuild=rebuild)
+    with conn.cursor() as cur:
+        migrate_legacy_transactions(cur, schema_name)
+        backfill_spend_rankings(cur, schema_name)
+    conn.commit()
 
-        cur.close()
-        conn.commit()
-        # Add verification
-        verify_tables(tables, schema_name, conn)
+    batches = get_pending_batches(conn, schema_name)
+    if not batches:
+        print("No new files since the last load")
+
+    print(f"Connecting to the database (pool of {LOAD_WORKERS})...")
+    pool = create_connection_pool()
+    try:
+        for batch in batches:
+            print(f"Loading {batch.folder}: {sorted(batch.file_paths)}")
+            with timed("load.batch") as stats:
+                load_batch(pool, schema_name, batch.file_paths)
+                run_in_transaction(pool, record_loaded_files, schema_name, batch)
+                stats["bytes"] = sum(
+                    os.path.getsize(p) for p in batch.file_paths.values()
+                )
+
+        if retain_months:
+            run_in_transaction(
+                pool, drop_old_transaction_partitions, schema_name, retain_months
+            )
+    finally:
+        pool.closeall()
+
+    # Add verification
+    verify_tables(tables, schema_name, conn)
     conn.close()
 
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="Load AGM output files into Postgres")
+    parser.add_argument(
+        "--rebuild",
+        action="store_true",
+        help="Drop the walmart schema and reload every output folder",
+    )
+    parser.add_argument(
+        "--retain-months",
+        type=int,
+        default=None,
+        help="Keep only the newest N monthly transaction partitions",
+    )
+    args = parser.parse_args()
+    main(rebuild=args.rebuild, retain_months=args.retain_months)
@@ -1,7 +1,22 @@
 -- Create schema for Walmart simulation data
-DROP SCHEMA IF EXISTS WALMART CASCADE;
+-- Idempotent: safe to run before every load (use load_to_postgres.py --rebuild to start over)
 CREATE SCHEMA IF NOT EXISTS WALMART;
 
+-- Files already ingested by load_to_postgres.py (incremental loading)
+-- RUN_FOLDER is the run_time=<time> folder, MAX(RUN_FOLDER) is the load watermark
+CREATE TABLE IF NOT EXISTS WALMART.LOAD_LEDGER (
+    FILE_PATH TEXT NOT NULL,
+    CHECKSUM VARCHAR(64) NOT NULL,
+    TABLE_NAME VARCHAR(50) NOT NULL,
+    RUN_FOLDER VARCHAR(100) NOT NULL,
+    FILE_SIZE BIGINT,
+    LOADED_AT TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (FILE_PATH, CHECKSUM)
+);
+CREATE INDEX IF NOT EXISTS IDX_LOAD_LEDGER_FOLDER ON WALMART.LOAD_LEDGER (
+    RUN_FOLDER
+);
+
 -- Customer Type 1 (Walmart Customer) demographics
 CREATE TABLE IF NOT EXISTS WALMART.CUST1 (
     UNIQUE_ID INTEGER PRIMARY KEY NOT NULL,
@@ -67,21 +82,50 @@ CREATE TABLE IF NOT EXISTS WALMART.CUSTOMERS_LOOKUP (
     CONSTRAINT custid_exist CHECK ((cust1_id IS NULL) <> (cust2_id IS NULL)) -- noqa
 );
 
+-- Watermark for the incremental dbt dim_customers (bumped by load_customer_lookup on change)
+ALTER TABLE WALMART.CUSTOMERS_LOOKUP ADD COLUMN IF NOT EXISTS UPDATED_AT TIMESTAMP DEFAULT CURRENT_TIMESTAMP;
+
+
+-- Warehouses created before partitioning: keep the old heap as TRANSACTIONS_LEGACY
+-- (load_to_postgres.migrate_legacy_transactions() copies it into the partitions and drops it)
+DO $$
+BEGIN
+    IF EXISTS (
+        SELECT 1 FROM pg_class c
+        JOIN pg_namespace n ON n.oid = c.relnamespace
+        WHERE n.nspname = 'walmart' AND c.relname = 'transactions' AND c.relkind = 'r'
+    ) THEN
+        ALTER TABLE WALMART.TRANSACTIONS RENAME TO TRANSACTIONS_LEGACY;
+        ALTER TABLE WALMART.TRANSACTIONS_LEGACY RENAME CONSTRAINT TRANSACTIONS_PKEY TO TRANSACTIONS_LEGACY_PKEY;
+        DROP INDEX IF EXISTS WALMART.IDX_TRANSACTIONS_CATEGORY;
+        DROP INDEX IF EXISTS WALMART.IDX_TRANSACTIONS_PRODUCT;
+        DROP INDEX IF EXISTS WALMART.IDX_TRANSACTIONS_CUSTOMER;
+        DROP INDEX IF EXISTS WALMART.IDX_TRANSACTIONS_DATE;
+        DROP INDEX IF EXISTS WALMART.IDX_TRANSACTIONS_DATE_ID;
+    END IF;
+END $$;
 
 -- Combined transactions table for both customer types
+-- Range partitioned by month of DATE_PURCHASED (partitions: TRANSACTIONS_PYYYYMM)
+-- - partitions are created by load_to_postgres.ensure_transaction_partitions() before each load
+-- - date filters (api/transactions, dbt) only scan the matching months
+-- - retention = DROP the old partitions (load_to_postgres.py --retain-months)
+-- The partition key has to be part of the primary key
 CREATE TABLE IF NOT EXISTS WALMART.TRANSACTIONS (
-    TRANSACTION_ID INTEGER PRIMARY KEY,
+    TRANSACTION_ID INTEGER NOT NULL,
     UNIQUE_ID INTEGER REFERENCES WALMART.CUSTOMERS_LOOKUP (CUSTOMER_ID),
     PRODUCT_ID INTEGER REFERENCES WALMART.PRODUCTS (PRODUCT_ID),
     UNIT_PRICE FLOAT,
     QUANTITY INTEGER,
-    DATE_PURCHASED DATE,
+    DATE_PURCHASED DATE NOT NULL,
     CATEGORY VARCHAR(100),
     RUN_ID VARCHAR(20),
-    CREATED_AT TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-);
+    CREATED_AT TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (TRANSACTION_ID, DATE_PURCHASED)
+) PARTITION BY RANGE (DATE_PURCHASED);
 
--- Create indexes for better query performance
+-- Indexes are declared on the parent and created on every partition (existing and new),
+-- so a load only maintains the indexes of the months it writes to
 CREATE INDEX IF NOT EXISTS IDX_TRANSACTIONS_CATEGORY ON WALMART.TRANSACTIONS (
     CATEGORY
 );
@@ -91,8 +135,47 @@ CREATE INDEX IF NOT EXISTS IDX_TRANSACTIONS_PRODUCT ON WALMART.TRANSACTIONS (
 CREATE INDEX IF NOT EXISTS IDX_TRANSACTIONS_CUSTOMER ON WALMART.TRANSACTIONS (
     UNIQUE_ID
 );
-CREATE INDEX IF NOT EXISTS IDX_TRANSACTIONS_DATE ON WALMART.TRANSACTIONS (
-    DATE_PURCHASED
+-- Keyset pagination for /api/transactions/ (ORDER BY date_purchased DESC, transaction_id DESC)
+-- INCLUDE columns let the list endpoint run as an index-only scan
+CREATE INDEX IF NOT EXISTS IDX_TRANSACTIONS_DATE_ID ON WALMART.TRANSACTIONS (
+    DATE_PURCHASED DESC, TRANSACTION_ID DESC
+) INCLUDE (CATEGORY, UNIT_PRICE, QUANTITY);
+
+-- Pre-aggregated spend rankings for the cust1/cust2/products list APIs
+-- Maintained incrementally by load_to_postgres.refresh_spend_rankings()
+CREATE TABLE IF NOT EXISTS WALMART.CUST1_SPEND_RANK (
+    UNIQUE_ID INTEGER PRIMARY KEY REFERENCES WALMART.CUST1 (
+        UNIQUE_ID
+    ) ON DELETE CASCADE,
+    TOTAL_SUM FLOAT NOT NULL DEFAULT 0,
+    UPDATED_AT TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE TABLE IF NOT EXISTS WALMART.CUST2_SPEND_RANK (
+    UNIQUE_ID INTEGER PRIMARY KEY REFERENCES WALMART.CUST2 (
+        UNIQUE_ID
+    ) ON DELETE CASCADE,
+    TOTAL_SUM FLOAT NOT NULL DEFAULT 0,
+    UPDATED_AT TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE TABLE IF NOT EXISTS WALMART.PRODUCT_SALES_RANK (
+    PRODUCT_ID INTEGER PRIMARY KEY REFERENCES WALMART.PRODUCTS (
+        PRODUCT_ID
+    ) ON DELETE CASCADE,
+    TOTAL_SUM FLOAT NOT NULL DEFAULT 0,
+    UPDATED_AT TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+-- Top-N reads walk these indexes instead of sorting
+CREATE INDEX IF NOT EXISTS IDX_CUST1_SPEND_RANK_TOTAL ON WALMART.CUST1_SPEND_RANK (
+    TOTAL_SUM DESC
+);
+CREATE INDEX IF NOT EXISTS IDX_CUST2_SPEND_RANK_TOTAL ON WALMART.CUST2_SPEND_RANK (
+    TOTAL_SUM DESC
+);
+CREATE INDEX IF NOT EXISTS IDX_PRODUCT_SALES_RANK_TOTAL ON WALMART.PRODUCT_SALES_RANK (
+    TOTAL_SUM DESC
 );
 
 CREATE UNIQUE INDEX IF NOT EXISTS IDX_LOOKUP_CUST1 ON WALMART.CUSTOMERS_LOOKUP (
@@ -120,6 +120,8 @@ CORS_ALLOWED_ORIGINS = os.getenv(
 ).split(",")
 
 CORS_ALLOW_CREDENTIALS = True
+# Keyset pagination cursor for /api/transactions/
+CORS_EXPOSE_HEADERS = ["X-Next-Cursor"]
 CSRF_TRUSTED_ORIGINS = os.getenv(
     "CSRF_TRUSTED_ORIGINS", "http://localhost:3000,http://127.0.0.1:3000"
 ).split(",")
@@ -159,10 +161,21 @@ else:
             "PASSWORD": os.getenv("DB_PASSWORD"),
             "HOST": os.getenv("DB_HOST", "localhost"),
             "PORT": int(os.getenv("DB_PORT", 5432)),
-            "OPTIONS": {"options": "-c search_path=walmart"},
+            # public: fallback for the Django tables while walmart does not exist yet
+            # (fresh databases, e.g. the test database of manage.py test)
+            "OPTIONS": {"options": "-c search_path=walmart,public"},
         }
     }
 
+# Response cache for the ranking list endpoints (per-process, no extra service needed)
+RANKING_CACHE_TTL = int(os.getenv("RANKING_CACHE_TTL", 30))
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "api-response-cache",
+    }
+}
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         "NAME": "django.contrib.auth.password_validation.UserAttributeSimilarityValidator",
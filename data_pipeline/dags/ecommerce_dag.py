@@ -47,7 +47,10 @@ with DAG(
         set +x
         if [ -f /run/secrets/dbt.env ]; then set -a; . /run/secrets/dbt.env; set +a; fi
         dbt deps
-        dbt build --full-refresh --target dev
+        # Per-model timings/status to statsd, also when the build fails
+        trap 'python /opt/airflow/method/helper/instrumentation.py --dbt-run-results target/run_results.json || true' EXIT
+        # Incremental by default; trigger with {"full_refresh": true} to rebuild everything
+        dbt build --target dev {{ '--full-refresh' if dag_run.conf.get('full_refresh') else '' }}
     """
         ),
     )
@@ -0,0 +1,243 @@
+# Airflow being run in docker container
+import os
+from dataclasses import asdict
+from datetime import datetime, timedelta
+from pathlib import Path
+from textwrap import dedent
+
+from airflow import DAG  # type: ignore
+from airflow.decorators import task  # type: ignore
+from airflow.models.param import Param  # type: ignore
+from airflow.operators.bash import BashOperator  # type: ignore
+
+"""
+Partition-aware version of ecommerce_dag
+simulate (optional) -> prepare warehouse -> find new output folders (load_ledger watermark)
+-> dimensions (oldest folder first) -> transaction chunks loaded in parallel (dynamic task mapping)
+-> ledger -> dbt build of the models downstream of the loaded sources only
+
+- Each mapped task loads one chunk (byte range / row groups) of one run_time folder's
+  transactions file in its own transaction, so the Celery workers share the load
+- Loader modules are imported inside the tasks (keeps the DAG file cheap to parse)
+- dbt: source:walmart.<loaded table>+ and, once a manifest was saved, state:modified+
+"""
+
+SCHEMA = "walmart"
+METHOD_DIR = "/opt/airflow/method"
+DBT_DIR = "/opt/airflow/dbt"
+DBT_STATE_DIR = f"{DBT_DIR}/state"
+MAX_PARALLEL_LOADS = int(os.getenv("MAX_PARALLEL_LOADS", 8))
+
+# Default arguments for all tasks
+default_args = {
+    "owner": "airflow",
+    "depends_on_past": False,
+    "email_on_failure": False,
+    "email_on_retry": False,
+    "retries": 2,
+    "retry_delay": timedelta(minutes=5),
+}
+
+with DAG(
+    dag_id="ecommerce_partitioned_dag",
+    default_args=default_args,
+    description="(simulation) → parallel Postgres load per partition → selective dbt",
+    schedule=None,
+    start_date=datetime(2025, 1, 1),
+    catchup=False,
+    dagrun_timeout=timedelta(hours=2),
+    is_paused_upon_creation=False,
+    max_active_runs=1,
+    params={
+        "run_simulation": Param(False, type="boolean"),
+        # YYYYMMDD (default: logical date); later runs continue from the last date
+        "sim_start_date": Param("", type="string"),
+        "sim_days": Param(30, type="integer", minimum=1),
+        "sim_customers": Param(1000, type="integer", minimum=1),
+        "sim_customer_ratio": Param(0.5, type="number", minimum=0, maximum=1),
+        "sim_products": Param(10, type="integer", minimum=1),
+        "full_refresh": Param(False, type="boolean"),
+    },
+) as dag:
+
+    # 1. (Optional) run the simulation
+    # One process: agents, products and the id registry are shared by the whole run
+    simulate = BashOperator(
+        task_id="simulate",
+        cwd=METHOD_DIR,
+        bash_command=dedent(
+            """\
+        {% if params.run_simulation %}
+        python run_simulation.py {{ params.sim_start_date or ds_nodash }} {{ params.sim_days }} \
+            {{ params.sim_customers }} {{ params.sim_customer_ratio }} \
+            {{ params.sim_products }} prod
+        {% else %}
+        echo "Simulation skipped (run_simulation=false)"
+        {% endif %}
+    """
+        ),
+    )
+
+    # 2. Idempotent schema + one-off migrations
+    @task
+    def prepare_warehouse():
+        from database.load_to_postgres import (backfill_spend_rankings,
+                                               migrate_legacy_transactions,
+                                               setup_database)
+
+        conn = setup_database()
+        with conn.cursor() as cur:
+            migrate_legacy_transactions(cur, SCHEMA)
+            backfill_spend_rankings(cur, SCHEMA)
+        conn.commit()
+        conn.close()
+
+    # 3. New/changed files since the last load, grouped by run_time folder
+    @task
+    def find_pending_batches():
+        from database.load_to_postgres import (connect_to_db,
+                                               get_pending_batches)
+
+        conn = connect_to_db()
+        try:
+            batches = get_pending_batches(conn, SCHEMA)
+        finally:
+            conn.close()
+        print(f"Pending folders: {[b.folder for b in batches]}")
+        return [asdict(b) for b in batches]
+
+    # 4. Dimensions are small and "latest attributes win": load them in folder order
+    @task
+    def load_dimensions(batches):
+        from database.load_to_postgres import (connect_to_db, dimension_keys,
+                                               load_customer_lookup,
+                                               seed_spend_rankings,
+                                               upsert_dimension)
+
+        conn = connect_to_db()
+        try:
+            for batch in batches:
+                with conn.cursor() as cur:
+                    for table, key in dimension_keys.items():
+                        if table in batch["file_paths"]:
+                            upsert_dimension(
+                                cur, SCHEMA, table, batch["file_paths"][table], key
+                            )
+                    load_customer_lookup(cur, SCHEMA)
+                    seed_spend_rankings(cur, SCHEMA)
+                conn.commit()
+        finally:
+            conn.close()
+
+    # 5. Create the monthly partitions up front, then split every transactions file
+    @task
+    def plan_transaction_chunks(batches):
+        from database.load_to_postgres import (chunk_to_dict, connect_to_db,
+                                               ensure_transaction_partitions,
+                                               get_file_date_range,
+                                               plan_file_chunks)
+
+        chunks = []
+        conn = connect_to_db()
+        try:
+            for batch in batches:
+                path = batch["file_paths"].get("transactions")
+                if not path:
+                    continue
+                with conn.cursor() as cur:
+                    ensure_transaction_partitions(
+                        cur, SCHEMA, *get_file_date_range(path)
+                    )
+                conn.commit()
+                chunks += [chunk_to_dict(c) for c in plan_file_chunks(path)]
+        finally:
+            conn.close()
+        print(f"{len(chunks)} transaction chunks to load")
+        return chunks
+
+    # 6. One mapped task per chunk (transactions are immutable: order does not matter)
+    @task(max_active_tis_per_dagrun=MAX_PARALLEL_LOADS)
+    def load_transactions_chunk(chunk):
+        from database.load_to_postgres import (chunk_from_dict, connect_to_db,
+                                               load_transaction_chunk)
+
+        conn = connect_to_db()
+        try:
+            with conn.cursor() as cur:
+                inserted = load_transaction_chunk(cur, SCHEMA, chunk_from_dict(chunk))
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+        return {"inserted": inserted}
+
+    # 7. Ledger once every chunk succeeded
+    @task(trigger_rule="none_failed")
+    def finalize_load(batches, results):
+        from database.load_to_postgres import (LoadBatch, connect_to_db,
+                                               record_loaded_files)
+
+        results = [r for r in (results or []) if r]
+
+        conn = connect_to_db()
+        try:
+            with conn.cursor() as cur:
+                for batch in batches:
+                    record_loaded_files(cur, SCHEMA, LoadBatch(**batch))
+            conn.commit()
+        finally:
+            conn.close()
+
+        print(f"Inserted {sum(r['inserted'] for r in results)} new transactions")
+        return sorted({t for b in batches for t in b["file_paths"]})
+
+    # 8. Only rebuild what the new data (or changed models) can affect
+    @task
+    def dbt_selector(loaded_tables):
+        selectors = [f"source:walmart.{t}+" for t in loaded_tables]
+        if {"cust1", "cust2"} & set(loaded_tables):
+            selectors.append("source:walmart.customers_lookup+")
+
+        has_state = Path(DBT_STATE_DIR, "manifest.json").exists()
+        if not has_state:
+            # First run: no manifest to compare with, build everything
+            return {"select": "", "state": ""}
+
+        selectors.append("state:modified+")
+        return {"select": " ".join(selectors), "state": f"--state {DBT_STATE_DIR}"}
+
+    dbt_run = BashOperator(
+        task_id="dbt_run",
+        cwd=DBT_DIR,
+        bash_command=dedent(
+            """\
+        set -euo pipefail
+        export DBT_PROFILES_DIR="${DBT_PROFILES_DIR:-$PWD}"
+        # Load secrets without printing them
+        set +x
+        if [ -f /run/secrets/dbt.env ]; then set -a; . /run/secrets/dbt.env; set +a; fi
+        dbt deps
+        # Per-model timings/status to statsd, also when the build fails
+        trap 'python /opt/airflow/method/helper/instrumentation.py --dbt-run-results target/run_results.json || true' EXIT
+        {% set sel = ti.xcom_pull(task_ids='dbt_selector') %}
+        dbt build --target dev \
+            {% if sel['select'] %}--select {{ sel['select'] }} {{ sel['state'] }}{% endif %} \
+            {{ '--full-refresh' if params.full_refresh else '' }}
+        # Manifest of this build = comparison point for state:modified+ next time
+        mkdir -p state && cp target/manifest.json state/manifest.json
+    """
+        ),
+    )
+
+    # Define the order of execution
+    batches = find_pending_batches()
+    dimensions = load_dimensions(batches)
+    chunks = plan_transaction_chunks(batches)
+    loaded = load_transactions_chunk.expand(chunk=chunks)
+    loaded_tables = finalize_load(batches, loaded)
+
+    simulate >> prepare_warehouse() >> batches
+    dimensions >> chunks
+    dbt_selector(loaded_tables) >> dbt_run
@@ -0,0 +1,59 @@
+{{
+  config(
+    materialized = 'incremental',
+    incremental_strategy = 'delete+insert',
+    unique_key = ['date_key', 'source_system', 'segment_id'],
+    on_schema_change = 'append_new_columns',
+    indexes = [
+      {'columns': ['date_key', 'source_system', 'segment_id'], 'unique': True}
+    ]
+  )
+}}
+
+-- Daily purchases per customer type (cust1/cust2) and segment.
+-- Incremental: days that received new fct_order rows since the last run are recomputed in full.
+
+with
+
+{% if is_incremental() %}
+
+    changed_days as (
+        select distinct date_key
+        from {{ ref('fct_order') }}
+        where loaded_at > (
+            select
+                coalesce(max(last_loaded_at), '1900-01-01'::timestamp)
+                - interval '{{ var("fct_order_lookback_minutes", 60) }} minutes'
+            from {{ this }}
+        )
+    ),
+
+{% endif %}
+
+orders as (
+    select *
+    from {{ ref('fct_order') }}
+    {% if is_incremental() %}
+        where date_key in (select date_key from changed_days)
+    {% endif %}
+)
+
+select
+    d.date_key,
+    d.real_date,
+    c.source_system,
+    -- -1 = unknown segment (keeps the unique key non-null)
+    coalesce(o.segment_id, -1) as segment_id,
+    count(*) as n_orders,
+    count(distinct o.customer_id) as n_customers,
+    sum(o.quantity) as units_sold,
+    sum(o.unit_price * o.quantity) as revenue,
+    sum(o.unit_price * o.quantity) / nullif(count(distinct o.customer_id), 0)
+        as revenue_per_customer,
+    max(o.loaded_at) as last_loaded_at
+from orders as o
+inner join {{ ref('dim_date') }} as d
+    on o.date_key = d.date_key
+inner join {{ ref('dim_customers') }} as c
+    on o.customer_id = c.customer_id
+group by d.date_key, d.real_date, c.source_system, coalesce(o.segment_id, -1)
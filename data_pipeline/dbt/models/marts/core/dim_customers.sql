@@ -1,17 +1,45 @@
+{{
+  config(
+    materialized = 'incremental',
+    incremental_strategy = 'delete+insert',
+    unique_key = 'customer_id',
+    on_schema_change = 'append_new_columns',
+    indexes = [{'columns': ['customer_id'], 'unique': True}]
+  )
+}}
+
 with lkp as (select * from {{ ref('stg_customers_lookup') }}),
 
 c1 as (select * from {{ ref('stg_cust1') }}),
 
-c2 as (select * from {{ ref('stg_cust2') }})
-
-select
-    lkp.customer_id,
-    lkp.segment_id,
-    lkp.run_id,
-    case when c1.unique_id is not null then 'cust1' else 'cust2' end
-        as source_system,
-    coalesce(c1.signup_date, c2.signup_date) as signup_date,
-    current_timestamp as record_loaded_at
-from lkp
-left join c1 on lkp.cust1_id = c1.unique_id
-left join c2 on lkp.cust2_id = c2.unique_id
+c2 as (select * from {{ ref('stg_cust2') }}),
+
+customers as (
+    select
+        lkp.customer_id,
+        lkp.segment_id,
+        lkp.run_id,
+        case when c1.unique_id is not null then 'cust1' else 'cust2' end
+            as source_system,
+        coalesce(c1.signup_date, c2.signup_date) as signup_date,
+        -- latest change of the lookup row or the customer row (incremental watermark)
+        greatest(
+            lkp.updated_at, c1.last_purchase_date, c2.last_purchase_date
+        ) as source_updated_at,
+        current_timestamp as record_loaded_at
+    from lkp
+    left join c1 on lkp.cust1_id = c1.unique_id
+    left join c2 on lkp.cust2_id = c2.unique_id
+)
+
+select * from customers
+
+{% if is_incremental() %}
+
+    -- only customers inserted/changed by load_to_postgres since the last run
+    where source_updated_at > (
+        select coalesce(max(source_updated_at), '1900-01-01'::timestamp)
+        from {{ this }}
+    )
+
+{% endif %}
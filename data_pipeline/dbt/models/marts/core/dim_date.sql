@@ -1,13 +1,62 @@
-{{ config(materialized='table') }}
-
-WITH calendar AS (
-  SELECT * FROM (
-    {{ dbt_utils.date_spine(
-         datepart   = "day",
-         start_date = "cast('01/01/2023' as date)",
-         end_date   = "current_date"
-    ) }}
-  ) AS date_spine
+{{
+  config(
+    materialized = 'incremental',
+    incremental_strategy = 'delete+insert',
+    unique_key = 'date_key',
+    on_schema_change = 'append_new_columns',
+    indexes = [{'columns': ['date_key'], 'unique': True}]
+  )
+}}
+
+-- Calendar covering every simulated purchase date (simulations can run past current_date).
+-- Bounds come from stg_transactions min/max date_purchased (index-backed on the partitioned
+-- transactions table); incremental runs only append the days outside the current range,
+-- plus the existing days whose later columns (quarter ... month_start) are still NULL:
+-- append_new_columns adds the columns to an existing table but does not fill them, the
+-- delete+insert on date_key rewrites those days.
+
+{% if is_incremental() %}
+  {%- set existing_columns = adapter.get_columns_in_relation(this)
+        | map(attribute='name') | map('lower') | list -%}
+{% endif %}
+
+WITH bounds AS (
+  SELECT
+    MIN(date_purchased) AS min_date,
+    MAX(date_purchased) AS max_date
+  FROM {{ ref('stg_transactions') }}
+),
+
+{% if is_incremental() %}
+existing AS (
+  SELECT MIN(real_date) AS min_date, MAX(real_date) AS max_date
+  FROM {{ this }}
+),
+
+-- Built before the new columns exist: every existing day is rewritten once
+incomplete AS (
+  SELECT real_date AS date_day
+  FROM {{ this }}
+  {% if 'quarter' in existing_columns %}
+  WHERE quarter IS NULL
+  {% endif %}
+),
+{% endif %}
+
+calendar AS (
+  SELECT gs::date AS date_day
+  FROM bounds
+  CROSS JOIN LATERAL generate_series(bounds.min_date, bounds.max_date, INTERVAL '1 day') AS gs
+  {% if is_incremental() %}
+  CROSS JOIN existing
+  WHERE existing.min_date IS NULL
+     OR gs::date < existing.min_date
+     OR gs::date > existing.max_date
+
+  UNION
+
+  SELECT date_day FROM incomplete
+  {% endif %}
 )
 
 
@@ -15,8 +64,14 @@ SELECT
   date_day                                   AS real_date,          -- 2025‑05‑04
   TO_CHAR(date_day, 'YYYYMMDD')::int         AS date_key,
   EXTRACT(YEAR  FROM date_day)::int          AS year,
+  EXTRACT(QUARTER FROM date_day)::int        AS quarter,
   EXTRACT(MONTH FROM date_day)::int          AS month,
+  TO_CHAR(date_day, 'FMMonth')               AS month_name,
   EXTRACT(DAY   FROM date_day)::int          AS day,
-  TO_CHAR(date_day, 'Day')                   AS weekday_name   
+  EXTRACT(ISODOW FROM date_day)::int         AS day_of_week,        -- 1 = Monday
+  TO_CHAR(date_day, 'Day')                   AS weekday_name,
+  EXTRACT(WEEK  FROM date_day)::int          AS week_of_year,
+  EXTRACT(ISODOW FROM date_day) IN (6, 7)    AS is_weekend,
+  DATE_TRUNC('month', date_day)::date        AS month_start
 
 FROM calendar
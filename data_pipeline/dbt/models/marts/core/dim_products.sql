@@ -1,7 +1,25 @@
-{{ config(materialized='table') }}
+{{
+  config(
+    materialized = 'incremental',
+    incremental_strategy = 'delete+insert',
+    unique_key = 'product_id',
+    on_schema_change = 'append_new_columns',
+    indexes = [{'columns': ['product_id'], 'unique': True}]
+  )
+}}
 
 SELECT
 product_id, category, unit_price, stock, 
 lead_days, ordering_cost, holding_cost_per_unit,
 EOQ, created_at, updated_at
-FROM {{ ref('stg_products') }} 
\ No newline at end of file
+FROM {{ ref('stg_products') }}
+
+{% if is_incremental() %}
+
+    -- only products inserted/changed by load_to_postgres since the last run
+    WHERE updated_at > (
+        SELECT COALESCE(MAX(updated_at), '1900-01-01'::timestamp)
+        FROM {{ this }}
+    )
+
+{% endif %}
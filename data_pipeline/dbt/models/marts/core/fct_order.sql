@@ -1,7 +1,13 @@
 {{  
   config(
     materialized = 'incremental',
-    unique_key   = ['date_key','customer_id','product_id','transaction_id']
+    incremental_strategy = 'delete+insert',
+    unique_key   = 'transaction_id',
+    on_schema_change = 'append_new_columns',
+    indexes = [
+      {'columns': ['transaction_id'], 'unique': True},
+      {'columns': ['loaded_at']}
+    ]
   )  
 }}
 
@@ -16,28 +22,27 @@ with source_data as (
         t.transaction_id,
         t.quantity,
         t.unit_price,
-        t.category
+        t.category,
+        t.created_at as loaded_at
     from {{ ref('stg_transactions') }} as t
     inner join
         {{ ref('dim_customers') }} as dl
         on t.customer_id = dl.customer_id
 
-)
-
-select * from source_data
-
-{% if is_incremental() %}
+    {% if is_incremental() %}
 
-    -- only bring in rows newer than your last loaded batch
-    where
-        (date_key, customer_id, product_id, transaction_id)
-        not in (
+        -- high-watermark: only rows loaded into Postgres since the last run
+        -- (lookback covers load transactions that committed after the previous dbt run;
+        -- re-selected rows are replaced through the transaction_id unique key)
+        where t.created_at > (
             select
-                date_key,
-                customer_id,
-                product_id,
-                transaction_id
+                coalesce(max(loaded_at), '1900-01-01'::timestamp)
+                - interval '{{ var("fct_order_lookback_minutes", 60) }} minutes'
             from {{ this }}
         )
 
-{% endif %}
+    {% endif %}
+
+)
+
+select * from source_data
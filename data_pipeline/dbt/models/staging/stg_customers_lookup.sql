@@ -5,6 +5,7 @@ SELECT
     cust1_id,
     cust2_id,
     segment_id,
-    run_id
+    run_id,
+    updated_at
 FROM {{ source('walmart', 'customers_lookup') }}
 WHERE cust1_id IS NOT NULL OR cust2_id IS NOT NULL
@@ -1,23 +1,25 @@
+from __future__ import annotations
+
 import datetime as dt
 import logging
 import math
-import os
 import random
 import re
 import warnings
 from datetime import timedelta
-from pathlib import Path
-from typing import Protocol
+from typing import TYPE_CHECKING, Protocol
 
-import data_processor as dp
 import numpy as np
 import pandas as pd
-from fuzzywuzzy import process
 from helper.datetime_conversion import dt_to_str, get_component
+from helper.logging_setup import setup_logging
 from helper.serialization import Serialization
+from helper.workspace import DEFAULT_WORKSPACE
 from mesa import Agent
 from product_price_table import load_distributions_from_file
-from scipy.stats import gaussian_kde
+
+if TYPE_CHECKING:
+    from scipy.stats import gaussian_kde
 
 warnings.filterwarnings("ignore", category=RuntimeWarning)
 
@@ -62,20 +64,13 @@ Concerns:
 Solutions:
 - Including all categories: Splitting the probability of purchases of big categories equally among smaller ones
 
-"""
-
+Import cost:
+- scipy, fuzzywuzzy and data_processor (sklearn) are imported inside the functions using them
+- Logging is configured by the entry points (helper/logging_setup.py), not at import
 
-# Always execute at data_pipeline directory
-ROOT = Path(__file__).resolve().parent.parent
-os.chdir(ROOT)
+"""
 
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
-    handlers=[logging.FileHandler("./logs/ABM_modeling.log"), logging.StreamHandler()],
-)
 logger = logging.getLogger(__name__)  # Use the module's name as the logger name
 logger.setLevel(logging.INFO)  # Ensure the logger lev
 
@@ -211,6 +206,19 @@ class Cust1(Serialization, Agent, CustBehavior):
 
     _kde_attrs = ["purchase"]
     _dict_attrs = ["product_category"]
+    _state_attrs = ["budget", "purchase_history"]
+    _field_types = {
+        "segment_id": "raw",
+        "age": "raw",
+        "gender": "raw",
+        "city_category": "raw",
+        "stay_in_current_city_years": "raw",
+        "marital_status": "raw",
+        "product_category": "raw",
+        "visit_prob": "raw",
+        "budget": "raw",
+        "purchase_history": "tuple_lists",
+    }
 
     def __init__(
         self,
@@ -312,6 +320,8 @@ class Cust1(Serialization, Agent, CustBehavior):
                 for i in self.purchase_history.values()
                 for x in i
             ]
+            from scipy.stats import gaussian_kde
+
             kde = gaussian_kde(past_budget)
             budget = kde.resample(1)
 
@@ -353,6 +363,32 @@ class Cust1(Serialization, Agent, CustBehavior):
 
         return None, None, None
 
+    def visit_probability(self, date: dt.datetime | None = None) -> float:
+        """Daily chance of the step() coin flip: randint(0, 100) <= visit_prob * 100"""
+        return float(np.clip((math.floor(self.visit_prob * 100) + 1) / 101, 0, 1))
+
+    def days_until_visit(self, date: dt.datetime) -> int | None:
+        """Days after date until the next visit (geometric), None if it never visits"""
+        p = self.visit_probability()
+        return int(np.random.geometric(p)) if p > 0 else None
+
+    def shop(self, choice: str, product_list: list, current_date: str):
+        """
+        One visit already decided by the VisitScheduler (no coin flip):
+        same budget, quantity and purchase as a visiting step()
+        """
+        self.budget = self._calculate_budget()
+        quantity = np.random.randint(1, 10)
+        return self.make_purchase(
+            category_choice=choice,
+            cat_product_list=product_list,
+            current_date=current_date,
+            quantity=quantity,
+            unit_price_preference=self.budget / quantity,
+            quit_threshold=0.80,
+            over_price_tolerance=-5,
+        )
+
 
 class Cust2(Serialization, Agent, CustBehavior):
     # Setting the attribute data types
@@ -368,6 +404,20 @@ class Cust2(Serialization, Agent, CustBehavior):
 
     _kde_attrs = ["unit_price"]
     _dict_attrs = ["product_line", "quantity", "date"]
+    _state_attrs = ["budget", "purchase_history"]
+    _field_types = {
+        "segment_id": "raw",
+        "branch": "raw",
+        "city": "raw",
+        "customer_type": "raw",
+        "gender": "raw",
+        "payment_method": "raw",
+        "product_line": "raw",
+        "quantity": "raw",
+        "date": "raw",
+        "budget": "raw",
+        "purchase_history": "tuple_lists",
+    }
 
     def __init__(
         self,
@@ -458,6 +508,8 @@ class Cust2(Serialization, Agent, CustBehavior):
                 for i in self.purchase_history.values()
                 for x in i
             ]
+            from scipy.stats import gaussian_kde
+
             kde = gaussian_kde(past_budget)
             budget = kde.resample(1)
 
@@ -520,8 +572,56 @@ class Cust2(Serialization, Agent, CustBehavior):
 
         return None, None, None
 
+    def visit_probability(self, date: dt.datetime | str) -> float:
+        """step(): 0.8 on the 7 most common days of the month, 0.3 otherwise"""
+        visit_dates = self.get_mostcommon_date(top_date=7)
+        return 0.8 if get_component(date, "day") in visit_dates else 0.3
+
+    def days_until_visit(self, date: dt.datetime) -> int:
+        """Days after date until the next visit (one draw per day, as in step())"""
+        visit_dates = self.get_mostcommon_date(top_date=7)
+        days = 1
+        while True:
+            day = get_component(date + timedelta(days=days), "day")
+            if random.random() < (0.8 if day in visit_dates else 0.3):
+                return days
+            days += 1
+
+    def shop(self, choice: str, product_list: list, current_date: str):
+        """
+        One visit already decided by the VisitScheduler (no coin flip):
+        same budget, quantity and purchase as a visiting step()
+        """
+        self.budget = self._calculate_budget()
+        quantity = self.get_quantity()
+        unit_price_preference = self.unit_price.resample(1)[0][0]
+        return self.make_purchase(
+            category_choice=choice,
+            cat_product_list=product_list,
+            current_date=current_date,
+            quantity=quantity,
+            unit_price_preference=unit_price_preference,
+            quit_threshold=0.8,
+            over_price_tolerance=-5,
+        )
+
 
 class Product(Serialization, Agent):
+    _state_attrs = ["stock", "pending_restock_orders", "daily_sales", "total_sales"]
+    _field_types = {
+        "product_category": "raw",
+        "unit_price": "raw",
+        "annual_demand": "raw",
+        "lead_days": "raw",
+        "ordering_cost": "raw",
+        "holding_cost_per_unit": "raw",
+        "EOQ": "raw",
+        "stock": "raw",
+        "daily_sales": "raw",
+        "total_sales": "raw",
+        "pending_restock_orders": "dated_tuples",
+    }
+
     def __init__(
         self,
         unique_id: int,
@@ -632,6 +732,7 @@ def sample_from_distribution(dist, dist_type, n_samples=1) -> float:
 
 def getting_segments_dist(
     path,
+    price_table_path=DEFAULT_WORKSPACE.price_table,
 ) -> tuple[dict[int, float], dict[int, dict[str, float]], dict[int, dict[str, float]]]:
     """
     Gets customer segment distributions from a dataset and ensures all product categories have probabilities.
@@ -639,7 +740,7 @@ def getting_segments_dist(
     This function:
     1. Loads customer segment data containing probabilities, categorical distributions (like product preferences),
        and numerical distributions (like spending patterns) for each customer segment
-    2. Reads the product price table to get all possible product categories
+    2. Reads the product price table (price_table_path) to get all possible product categories
     3. For each customer segment, adds any missing product categories with a small probability (0.01)
        and renormalizes the probabilities to sum to 1
 
@@ -649,12 +750,16 @@ def getting_segments_dist(
     - segments_num_dist: Dict mapping segment IDs to their numerical distributions (e.g. spending patterns)
     """
 
-    customer_segments_dist = dp.get_dataset_distribution(path)
+    import data_processor as dp
+
+    customer_segments_dist = dp.get_dataset_distribution(str(path))
     segments_dist = {int(k): v[0] for k, v in customer_segments_dist.items()}
     segments_cat_dist = {int(k): v[1] for k, v in customer_segments_dist.items()}
     segments_num_dist = {int(k): v[2] for k, v in customer_segments_dist.items()}
 
-    segments_cat_dist = map_cutomerpref_to_all_categories(segments_cat_dist)
+    segments_cat_dist = map_cutomerpref_to_all_categories(
+        segments_cat_dist, price_table_path
+    )
 
     assert (
         "product_category" in segments_cat_dist[1]
@@ -666,6 +771,7 @@ def getting_segments_dist(
 
 def map_cutomerpref_to_all_categories(
     segments_cat_dist: dict,
+    price_table_path=DEFAULT_WORKSPACE.price_table,
 ) -> dict[int, dict[str, float]]:
     """
     Map customer preferences to all categories using fuzzy matching.
@@ -679,8 +785,10 @@ def map_cutomerpref_to_all_categories(
     Key formatting changes:
     - Convert all keys to lowercase and remove whitespace
     """
+    from fuzzywuzzy import process
+
     # Read product price table to get all categories
-    price_table = pd.read_csv("./data_source/product_price_table.csv")
+    price_table = pd.read_csv(price_table_path)
 
     # Getting the main keys and their sub categories in a dict
     categories_dict = {}
@@ -760,6 +868,8 @@ def get_itinerary_category(category: str, item_list: list) -> list[Product]:
     """
     Get all the products containing the category.
     """
+    from fuzzywuzzy import process
+
     return [
         x
         for x in item_list
@@ -769,10 +879,12 @@ def get_itinerary_category(category: str, item_list: list) -> list[Product]:
 
 
 def main():
+    setup_logging()
+
     # Building the customer agents
     logger.info("Initializing customer agents...")
     segments_dist, segments_cat_dist, segments_num_dist = getting_segments_dist(
-        "./data_source/Walmart_cust.csv"
+        DEFAULT_WORKSPACE.cust1_source
     )
     first_cust = Cust1(
         unique_id=1,
@@ -784,7 +896,7 @@ def main():
     logger.info(f"Created Cust1 with budget: {first_cust.budget}")
 
     segments_dist2, segments_cat_dist2, segments_num_dist2 = getting_segments_dist(
-        "./data_source/Walmart_commerce.csv"
+        DEFAULT_WORKSPACE.cust2_source
     )
     first_cust2 = Cust2(
         unique_id=1,
@@ -797,7 +909,7 @@ def main():
 
     # Building the product agents
     logger.info("Initializing product agents...")
-    product_dist_path = "./data_source/category_kde_distributions.npz"
+    product_dist_path = DEFAULT_WORKSPACE.product_source
     product_dist_dict = load_distributions_from_file(product_dist_path)
 
     # Create product instances
@@ -0,0 +1,328 @@
+import argparse
+import contextlib
+import datetime as dt
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+from ABM_modeling import get_itinerary_category, getting_segments_dist
+from helper.save_load import load_agents_from_newest, save_agents
+from helper.workspace import Workspace
+from product_price_table import load_distributions_from_file
+from walmart_model import WalmartModel
+
+"""
+Benchmarks for the simulation core (asv style: one JSON result file per commit)
+- Offline: only the data_source files shipped with the repo
+    - Walmart_cust.csv is not bundled => Cust1 is only benchmarked when the file exists,
+      populations are Cust2 otherwise (recorded in the results as "population")
+- Seeded (random + numpy global RNGs are reseeded before each case)
+- Runs in a temporary Workspace (symlinked data_source), never touches the real
+  outputs, checkpoints, id seeds or distribution store
+
+Cases:
+- fit.getting_segments_dist.<file>
+- agent.get_itinerary_category, agent.make_purchase
+- scale=<n>.step (agents/s), .datacollector_collect, .save_results_as_df,
+  .checkpoint_save, .checkpoint_load
+
+Usage (from ./data_pipeline):
+    python method/benchmark_simulation.py --scales 1000 10000 100000
+    python method/benchmark_simulation.py --compare benchmarks/simulation/<base>.json \
+        benchmarks/simulation/<head>.json
+"""
+
+ROOT = Path(__file__).resolve().parent.parent
+DATA_SOURCE = ROOT / "data_source"
+RESULTS_DIR = ROOT / "benchmarks" / "simulation"
+BUNDLED_FILES = [
+    "Walmart_cust.csv",
+    "Walmart_commerce.csv",
+    "Walmart_products.csv",
+    "category_kde_distributions.npz",
+    "category_distributions.npz",
+    "category_mapping.csv",
+    "product_price_table.csv",
+    "product_taxonomy.csv",
+]
+START_DATE = dt.datetime(2024, 1, 1)
+
+
+def seed_everything(seed):
+    random.seed(seed)
+    np.random.seed(seed)
+
+
+@contextlib.contextmanager
+def quiet():
+    """The agents print on every purchase; keep that out of the timings"""
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        yield
+
+
+@contextlib.contextmanager
+def workspace():
+    """Temporary data_pipeline-like Workspace: data_source (symlinks) + method/helper"""
+    with tempfile.TemporaryDirectory(prefix="walmart_bench_") as tmp:
+        tmp = Path(tmp)
+        (tmp / "data_source").mkdir()
+        (tmp / "method" / "helper").mkdir(parents=True)
+        for name in BUNDLED_FILES:
+            if (DATA_SOURCE / name).exists():
+                (tmp / "data_source" / name).symlink_to(DATA_SOURCE / name)
+        yield Workspace(root=tmp)
+
+
+def measure(fn, repeat, setup=None):
+    """
+    Input: fn -> timed call, setup -> untimed call before each repeat
+    Output: {"min", "median", "mean", "repeat"} in seconds
+    """
+    times = []
+    for _ in range(repeat):
+        if setup:
+            setup()
+        start = time.perf_counter()
+        with quiet():
+            fn()
+        times.append(time.perf_counter() - start)
+    return {
+        "min": min(times),
+        "median": statistics.median(times),
+        "mean": statistics.fmean(times),
+        "repeat": repeat,
+    }
+
+
+def has_cust1_data(ws: Workspace):
+    return ws.cust1_source.exists()
+
+
+def build_model(ws: Workspace, n_customers, n_products_per_category, steps=1):
+    """Fresh model with n_customers (half Cust1 when its data is bundled) and products"""
+    n_cust1 = n_customers // 2 if has_cust1_data(ws) else 0
+    model = WalmartModel(
+        start_date=START_DATE,
+        max_steps=steps,
+        n_customers1=n_cust1,
+        n_customers2=n_customers - n_cust1,
+        n_products_per_category=n_products_per_category,
+        mode="test",
+        workspace=ws,
+    )
+    with quiet():
+        if n_cust1:
+            model.add_customers1(n_cust1)
+        model.add_customers2(n_customers - n_cust1)
+        model.add_products(
+            load_distributions_from_file(ws.product_source),
+            n_products_per_category,
+        )
+    return model
+
+
+def bench_fitting(ws: Workspace, results, repeat, seed):
+    files = [ws.cust2_source] + ([ws.cust1_source] if has_cust1_data(ws) else [])
+    for path in files:
+        seed_everything(seed)
+        results[f"fit.getting_segments_dist.{path.name}"] = measure(
+            lambda: getting_segments_dist(path, ws.price_table), repeat
+        )
+
+
+def bench_agent_calls(
+    ws: Workspace, results, repeat, seed, n_products_per_category, calls=100
+):
+    """Per-call cost of the category lookup and of one purchase"""
+    seed_everything(seed)
+    model = build_model(ws, 10, n_products_per_category)
+    products = list(model.products.values())
+    customer = next(iter(model.customers.values()))
+    category = customer.get_category_preference()
+    category_products = get_itinerary_category(category, products) or products
+
+    def lookup():
+        for _ in range(calls):
+            get_itinerary_category(category, products)
+
+    def reset():
+        seed_everything(seed)
+        customer.purchase_history = {}
+        for p in category_products:
+            p.stock = 10**9
+
+    def purchase():
+        for _ in range(calls):
+            customer.make_purchase(
+                category_choice=category,
+                cat_product_list=category_products,
+                current_date="20240101",
+                quantity=1,
+                unit_price_preference=float(category_products[0].unit_price),
+                quit_threshold=0.5,
+            )
+
+    results["agent.get_itinerary_category"] = {
+        **measure(lookup, repeat),
+        "calls": calls,
+        "products": len(products),
+    }
+    results["agent.make_purchase"] = {
+        **measure(purchase, repeat, setup=reset),
+        "calls": calls,
+    }
+
+
+def bench_scale(
+    ws: Workspace, results, n_customers, steps, repeat, seed, n_products_per_category
+):
+    """Step throughput, collection, result export and checkpoint round trip at one scale"""
+    prefix = f"scale={n_customers}"
+    seed_everything(seed)
+    model = build_model(ws, n_customers, n_products_per_category, steps)
+    n_agents = model.schedule.get_agent_count()
+
+    step = measure(model.step, steps)
+    step["agents_per_second"] = n_customers / step["median"]
+    results[f"{prefix}.step"] = step
+
+    results[f"{prefix}.datacollector_collect"] = measure(
+        lambda: model.datacollector.collect(model), repeat
+    )
+    results[f"{prefix}.save_results_as_df"] = measure(model.save_results_as_df, repeat)
+
+    results[f"{prefix}.checkpoint_save"] = {
+        **measure(lambda: save_agents(model, mode="test"), repeat),
+        "agents": n_agents,
+    }
+
+    def load():
+        fresh = WalmartModel(start_date=START_DATE, mode="test", workspace=ws)
+        load_agents_from_newest(fresh, fresh.class_registry, mode="test")
+
+    results[f"{prefix}.checkpoint_load"] = {
+        **measure(load, repeat),
+        "agents": n_agents,
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=ROOT,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def run_benchmarks(args):
+    results = {}
+    with workspace() as ws:
+        population = "cust1+cust2" if has_cust1_data(ws) else "cust2"
+        print(f"Population: {population}")
+
+        print("Benchmarking distribution fitting...")
+        bench_fitting(ws, results, args.repeat, args.seed)
+        print("Benchmarking agent calls...")
+        bench_agent_calls(ws, results, args.repeat, args.seed, args.products)
+        for n in args.scales:
+            print(f"Benchmarking {n} customers...")
+            bench_scale(
+                ws, results, n, args.steps, args.repeat, args.seed, args.products
+            )
+
+    return {
+        "commit": git_commit(),
+        "created_at": dt.datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "seed": args.seed,
+        "population": population,
+        "products_per_category": args.products,
+        "results": results,
+    }
+
+
+def save_results(report, output_dir=RESULTS_DIR):
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    ts = report["created_at"].replace(":", "").replace("-", "")
+    path = output_dir / f"{report['commit']}_{ts}.json"
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    return path
+
+
+def print_report(report):
+    print(f"\ncommit {report['commit']} (seed {report['seed']})")
+    print(f"{'case':<48} {'median':>12} {'min':>12}")
+    print("-" * 74)
+    for name, r in report["results"].items():
+        print(f"{name:<48} {r['median']:>11.4f}s {r['min']:>11.4f}s")
+
+
+def compare(base_path, head_path):
+    """Median ratio head/base per case (> 1 = slower)"""
+    with open(base_path, "r", encoding="utf-8") as f:
+        base = json.load(f)
+    with open(head_path, "r", encoding="utf-8") as f:
+        head = json.load(f)
+
+    print(f"base {base['commit']} -> head {head['commit']}")
+    print(f"{'case':<48} {'base':>11} {'head':>11} {'ratio':>8}")
+    print("-" * 81)
+    for name in sorted(base["results"].keys() | head["results"].keys()):
+        b = base["results"].get(name, {}).get("median")
+        h = head["results"].get(name, {}).get("median")
+        if b is None or h is None:
+            print(
+                f"{name:<48} {'-' if b is None else f'{b:.4f}s':>11} "
+                f"{'-' if h is None else f'{h:.4f}s':>11} {'n/a':>8}"
+            )
+            continue
+        ratio = h / b if b else float("inf")
+        flag = " slower" if ratio > 1.1 else (" faster" if ratio < 0.9 else "")
+        print(f"{name:<48} {b:>10.4f}s {h:>10.4f}s {ratio:>7.2f}x{flag}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the simulation core")
+    parser.add_argument(
+        "--scales", type=int, nargs="+", default=[1_000, 10_000, 100_000]
+    )
+    parser.add_argument("--steps", type=int, default=3, help="Timed steps per scale")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--products", type=int, default=5, help="Per category")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", type=Path, default=RESULTS_DIR)
+    parser.add_argument(
+        "--compare",
+        nargs=2,
+        type=Path,
+        metavar=("BASE", "HEAD"),
+        help="Compare two saved result files instead of running",
+    )
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+        return
+
+    report = run_benchmarks(args)
+    print_report(report)
+    print(f"\nResults saved to {save_results(report, args.output)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,14 +1,15 @@
+from __future__ import annotations
+
 import logging
 import random
 from collections import defaultdict
-from typing import Dict
+from typing import TYPE_CHECKING, Dict
 
-import matplotlib.pyplot as plt
 import numpy as np
 import pandas as pd
-from dateutil.parser import parse
-from scipy.stats import gaussian_kde
-from sklearn.cluster import KMeans
+
+if TYPE_CHECKING:
+    from scipy.stats import gaussian_kde
 
 """
 Goal: Find the distribution of each column in the csv file after clustering with k-means
@@ -23,14 +24,11 @@ Steps:
 
 Used in ABM_modeling.py
 
+Heavy dependencies (dateutil, sklearn, scipy, matplotlib) are imported where they are used:
+only fitting pays for them, importing the module does not
+
 """
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
-    handlers=[logging.FileHandler("data_processing.log"), logging.StreamHandler()],
-)
 logger = logging.getLogger("data_processor")
 logger.propagate = False  # Ensure logs from this file are captured
 
@@ -61,6 +59,8 @@ class DistributionAnalyzer:
 
     def _is_date(self, value: str) -> bool:
         """Check if a string can be parsed as a date."""
+        from dateutil.parser import parse
+
         try:
             parse(value, fuzzy=True)
             return True
@@ -191,6 +191,8 @@ class DistributionAnalyzer:
 
         22/9 Update: Had to lower clusters from 15->5 to optimize memory usage in production.
         """
+        from sklearn.cluster import KMeans
+
         drop_columns = drop_columns + self.id_cols + self.text_cols
         existing_columns = [col for col in drop_columns if col in encoded_df.columns]
         if existing_columns:
@@ -221,6 +223,8 @@ class DistributionAnalyzer:
             Fitted KDE model
         """
 
+        from scipy.stats import gaussian_kde
+
         data = np.array(cluster_df[column].dropna().values)
         kde = gaussian_kde(data)
         self.kde_cluster_cols[cluster_num][column] = kde
@@ -240,6 +244,8 @@ class DistributionAnalyzer:
             kde: Fitted KDE model
             column: Column name for title
         """
+        import matplotlib.pyplot as plt
+
         plt.figure(figsize=(10, 6))
 
         # Create histogram
@@ -0,0 +1,287 @@
+from __future__ import annotations
+
+import datetime as dt
+import hashlib
+import json
+from pathlib import Path
+from typing import Any, Iterable
+
+import numpy as np
+from helper.lazy_kde import LazyKDE
+
+"""
+Columnar agent checkpoint (one .npz per checkpoint, no pickle)
+- One table per agent class: every attribute is a column
+    - int / float / bool -> numpy array
+    - str -> categorical (unique values + int32 codes)
+    - _dict_attrs (segment distributions: product_line, quantity, date, product_category)
+      -> stored once per distinct value (blob table) and referenced by id
+    - other containers (purchase_history, total_sales, pending_restock_orders)
+      -> one JSON text per agent (utf-8 bytes + offsets)
+    - _kde_attrs -> distinct (dataset, factor) pairs stored once, referenced by id,
+      loaded as one LazyKDE per pair (helper/lazy_kde.py, built on first use)
+- Datetimes inside JSON are tagged ({"__datetime__": iso}): only real datetimes are parsed back
+- Loading decodes each column at once, each shared blob / KDE once (the agents share them),
+  then fills the agents' __dict__ without calling __init__
+
+Layout of the npz keys:
+    __manifest__                         JSON: {version, run_id, classes: {cls: {count, fields, kde}}}
+    <cls>/<field>                        numeric column
+    <cls>/<field>/values, /codes         categorical column
+    <cls>/<field>/bytes, /offsets, /ids  JSON texts (+ ids for shared blobs)
+    <cls>/<attr>/kde_ids, /kde_factors, /kde_<i>
+"""
+
+FORMAT_VERSION = 1
+MANIFEST_KEY = "__manifest__"
+DATETIME_TAG = "__datetime__"
+
+
+# ---------- JSON with tagged datetimes ----------
+def _json_default(v):
+    if isinstance(v, (dt.datetime, dt.date, dt.time)):
+        return {DATETIME_TAG: v.isoformat()}
+    if isinstance(v, np.generic):
+        return v.item()
+    if isinstance(v, np.ndarray):
+        return v.tolist()
+    raise TypeError(f"{v} is an unaccounted type, {type(v)}")
+
+
+def _json_hook(d):
+    if len(d) == 1 and DATETIME_TAG in d:
+        return dt.datetime.fromisoformat(d[DATETIME_TAG])
+    return d
+
+
+def dumps(v) -> str:
+    return json.dumps(v, default=_json_default, separators=(",", ":"))
+
+
+def loads(s: str):
+    return json.loads(s, object_hook=_json_hook)
+
+
+# ---------- variable length texts ----------
+def pack_texts(texts: list[str]) -> tuple[np.ndarray, np.ndarray]:
+    """[str,...] -> (utf-8 bytes as uint8, end offsets)"""
+    encoded = [t.encode("utf-8") for t in texts]
+    offsets = np.cumsum([len(b) for b in encoded], dtype=np.int64)
+    data = np.frombuffer(b"".join(encoded), dtype=np.uint8)
+    return data, offsets
+
+
+def unpack_texts(data: np.ndarray, offsets: np.ndarray) -> list[str]:
+    raw = data.tobytes()
+    ends = offsets.tolist()
+    starts = [0] + ends[:-1]
+    return [raw[s:e].decode("utf-8") for s, e in zip(starts, ends)]
+
+
+# ---------- column kinds ----------
+def _column_kind(values: list, shared: bool) -> str:
+    if shared:
+        return "shared"
+    if all(v is None for v in values):
+        return "none"
+    if all(isinstance(v, (bool, np.bool_)) for v in values):
+        return "bool"
+    if all(
+        isinstance(v, (int, np.integer)) and not isinstance(v, bool) for v in values
+    ):
+        return "int"
+    if all(
+        isinstance(v, (int, float, np.number)) and not isinstance(v, bool)
+        for v in values
+    ):
+        return "float"
+    if all(isinstance(v, str) for v in values):
+        return "category"
+    return "json"
+
+
+def _encode_column(arrays: dict, key: str, kind: str, values: list):
+    if kind == "bool":
+        arrays[key] = np.asarray(values, dtype=np.bool_)
+    elif kind == "int":
+        arrays[key] = np.asarray(values, dtype=np.int64)
+    elif kind == "float":
+        arrays[key] = np.asarray(values, dtype=np.float64)
+    elif kind == "category":
+        uniques, codes = np.unique(np.asarray(values, dtype=str), return_inverse=True)
+        arrays[f"{key}/values"] = uniques
+        arrays[f"{key}/codes"] = codes.astype(np.int32)
+    elif kind == "shared":
+        blob_ids = {}
+        ids = []
+        for v in values:
+            text = dumps(v)
+            ids.append(blob_ids.setdefault(text, len(blob_ids)))
+        arrays[f"{key}/bytes"], arrays[f"{key}/offsets"] = pack_texts(list(blob_ids))
+        arrays[f"{key}/ids"] = np.asarray(ids, dtype=np.int32)
+    elif kind == "json":
+        arrays[f"{key}/bytes"], arrays[f"{key}/offsets"] = pack_texts(
+            [dumps(v) for v in values]
+        )
+
+
+def _decode_column(archive, key: str, kind: str, count: int) -> list:
+    if kind == "none":
+        return [None] * count
+    if kind in ("bool", "int", "float"):
+        return archive[key].tolist()
+    if kind == "category":
+        uniques = archive[f"{key}/values"].tolist()
+        return [uniques[c] for c in archive[f"{key}/codes"].tolist()]
+    texts = unpack_texts(archive[f"{key}/bytes"], archive[f"{key}/offsets"])
+    if kind == "shared":
+        blobs = [loads(t) for t in texts]
+        return [blobs[i] for i in archive[f"{key}/ids"].tolist()]
+    return [loads(t) for t in texts]
+
+
+def _encode_kdes(arrays: dict, key: str, kdes: list):
+    """Distinct (dataset, factor) pairs once, one id per agent (-1 = no KDE)"""
+    seen = {}
+    ids, factors = [], []
+    for kde in kdes:
+        if kde is None:
+            ids.append(-1)
+            continue
+        dataset = np.ascontiguousarray(kde.dataset, dtype=np.float64)
+        digest = hashlib.sha1(dataset.tobytes())
+        digest.update(repr((dataset.shape, float(kde.factor))).encode())
+        kde_id = seen.get(digest.digest())
+        if kde_id is None:
+            kde_id = seen[digest.digest()] = len(factors)
+            arrays[f"{key}/kde_{kde_id}"] = dataset
+            factors.append(float(kde.factor))
+        ids.append(kde_id)
+    arrays[f"{key}/kde_ids"] = np.asarray(ids, dtype=np.int32)
+    arrays[f"{key}/kde_factors"] = np.asarray(factors, dtype=np.float64)
+
+
+def _decode_kdes(archive, key: str) -> list:
+    factors = archive[f"{key}/kde_factors"].tolist()
+    kdes = [
+        LazyKDE(archive[f"{key}/kde_{i}"], factor) for i, factor in enumerate(factors)
+    ]
+    return [kdes[i] if i >= 0 else None for i in archive[f"{key}/kde_ids"].tolist()]
+
+
+# ---------- tables ----------
+def encode_table(
+    arrays: dict, prefix: str, records: list[dict], cls, fields=None
+) -> dict:
+    """
+    Add one class table to the npz arrays.
+    Input:
+        - records -> attribute dicts of the agents (agent.__dict__)
+        - cls -> agent class (_EXCLUDE, _dict_attrs and _kde_attrs are read from it)
+        - fields -> only these attributes (default: every attribute but _EXCLUDE)
+    Output: table spec {count, fields: {name: kind}, kde: [attr,...]} for the manifest
+    """
+    kde_attrs = list(getattr(cls, "_kde_attrs", ()))
+    exclude = set(getattr(cls, "_EXCLUDE", ())) | set(kde_attrs)
+    shared = set(getattr(cls, "_dict_attrs", ()))
+    if fields is not None:
+        kde_attrs = [a for a in kde_attrs if a in fields]
+
+    names = []
+    for record in records:
+        for name in record:
+            if name in exclude or name in names:
+                continue
+            if fields is None or name in fields:
+                names.append(name)
+
+    kinds = {}
+    for name in names:
+        values = [record.get(name) for record in records]
+        kinds[name] = _column_kind(values, name in shared)
+        _encode_column(arrays, f"{prefix}/{name}", kinds[name], values)
+
+    for attr in kde_attrs:
+        _encode_kdes(arrays, f"{prefix}/{attr}", [r.get(attr) for r in records])
+
+    return {"count": len(records), "fields": kinds, "kde": kde_attrs}
+
+
+def decode_table(archive, prefix: str, spec: dict) -> tuple[list[str], list[tuple]]:
+    """Output: (attribute names, one tuple of values per agent)"""
+    count = spec["count"]
+    names = list(spec["fields"]) + spec["kde"]
+    columns = [
+        _decode_column(archive, f"{prefix}/{name}", kind, count)
+        for name, kind in spec["fields"].items()
+    ]
+    columns += [_decode_kdes(archive, f"{prefix}/{attr}") for attr in spec["kde"]]
+    if not columns:
+        return names, [()] * count
+    return names, list(zip(*columns))
+
+
+def write_npz(path: Path, arrays: dict, manifest: dict) -> Path:
+    arrays[MANIFEST_KEY] = np.frombuffer(
+        json.dumps(manifest).encode("utf-8"), dtype=np.uint8
+    )
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "wb") as f:
+        np.savez_compressed(f, **arrays)
+    return path
+
+
+def read_manifest(archive) -> dict:
+    return json.loads(archive[MANIFEST_KEY].tobytes())
+
+
+def group_by_class(agents: Iterable[Any]) -> dict[str, list]:
+    by_class: dict[str, list] = {}
+    for agent in agents:
+        by_class.setdefault(agent.__class__.__name__, []).append(agent)
+    return by_class
+
+
+def get_class(class_registry: dict, cls_name: str):
+    cls = class_registry.get(cls_name)
+    if cls is None:
+        raise KeyError(
+            f"Class {cls_name} is missing. Did you pass in the class_registry?"
+        )
+    return cls
+
+
+# ---------- save / load ----------
+def save_agents_columnar(path: Path, agents: Iterable[Any], run_id) -> Path:
+    """
+    Write every agent into one compressed .npz (one table per class).
+    Output: path of the written file
+    """
+    arrays: dict[str, np.ndarray] = {}
+    manifest = {"version": FORMAT_VERSION, "run_id": run_id, "classes": {}}
+    for cls_name, members in group_by_class(agents).items():
+        manifest["classes"][cls_name] = encode_table(
+            arrays, cls_name, [a.__dict__ for a in members], type(members[0])
+        )
+    return write_npz(path, arrays, manifest)
+
+
+def load_agents_columnar(path: Path, class_registry: dict) -> list:
+    """
+    Rebuild the agents of a columnar checkpoint (same attributes as Serialization.from_row).
+    Input:
+        - class_registry -> {"Cust1": Cust1, ...}
+    Output: list of agents (class order of the file)
+    """
+    agents = []
+    with np.load(path, allow_pickle=False) as archive:
+        for cls_name, spec in read_manifest(archive)["classes"].items():
+            cls = get_class(class_registry, cls_name)
+            names, rows = decode_table(archive, cls_name, spec)
+            new = cls.__new__
+            for row in rows:
+                obj = new(cls)
+                obj.__dict__.update(zip(names, row))
+                agents.append(obj)
+    return agents
@@ -0,0 +1,345 @@
+from __future__ import annotations
+
+import fcntl
+import hashlib
+import json
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Iterable
+
+import numpy as np
+from helper.agent_store import (FORMAT_VERSION, decode_table, dumps,
+                                encode_table, get_class, group_by_class,
+                                read_manifest, write_npz)
+
+"""
+Delta agent checkpoints over a content-addressed store
+- Each agent is split in two records:
+    - static: attributes that do not change during a run (demographics, segment
+      distributions, KDEs, product economics) -> stored once in the store, keyed by the
+      hash of their content
+    - state: the class _state_attrs (budget, purchase_history, stock, sales...)
+      -> written with every checkpoint
+- A checkpoint (run_ts=.../delta_<run_id>.npz) = static hash per agent + the state table
+- Static records only get written when their hash is new (new agents / changed attributes),
+  as one pack per save: save time and disk usage follow the churn, not the population
+- gc() drops the records no retained checkpoint references (packs mostly dead are rewritten)
+- store/store.lock serializes save() / gc() (threads and processes sharing a checkpoint
+  folder, e.g. two backend runs): gc never sees a pack whose checkpoint is not written yet,
+  and it rewrites a compacted pack before deleting the old one
+
+Store layout (next to the run_ts= folders):
+    store/packs/pack_<hash>.npz   columnar static records (helper/agent_store.py tables)
+    store/index.jsonl             {"pack", "class", "hashes": [...]} per pack/class,
+                                  rebuilt from the packs when missing
+    store/store.lock              flock target (exclusive: save / gc, shared: load)
+"""
+
+STORE_DIR = "store"
+PACK_DIR = "packs"
+INDEX_FILE = "index.jsonl"
+LOCK_FILE = "store.lock"
+DELTA_PATTERN = "delta_*.npz"
+COMPACT_BELOW = 0.5  # rewrite a pack when less than half of its records are live
+
+
+class RecordHasher:
+    """
+    Content hash of the static part of an agent.
+    Distribution dicts and KDEs are shared by many agents: their hash is cached per object.
+    """
+
+    def __init__(self):
+        self._cache = {}  # id(obj) -> (obj, hash), obj kept alive so ids are not reused
+
+    def _object_hash(self, value, kde=False):
+        cached = self._cache.get(id(value))
+        if cached is not None and cached[0] is value:
+            return cached[1]
+        if kde:
+            dataset = np.ascontiguousarray(value.dataset, dtype=np.float64)
+            digest = hashlib.blake2b(dataset.tobytes(), digest_size=16)
+            digest.update(repr((dataset.shape, float(value.factor))).encode())
+        else:
+            digest = hashlib.blake2b(dumps(value).encode("utf-8"), digest_size=16)
+        self._cache[id(value)] = (value, digest.hexdigest())
+        return digest.hexdigest()
+
+    def record_hash(self, cls_name, record: dict, fields, shared, kde_attrs) -> str:
+        parts = [cls_name]
+        for name in fields:
+            value = record.get(name)
+            if value is None:
+                parts.append((name, None))
+            elif name in kde_attrs:
+                parts.append((name, self._object_hash(value, kde=True)))
+            elif name in shared or isinstance(value, (dict, list, tuple)):
+                parts.append((name, self._object_hash(value)))
+            else:
+                parts.append((name, value))
+        return hashlib.blake2b(dumps(parts).encode("utf-8"), digest_size=16).hexdigest()
+
+
+def split_fields(cls, record: dict) -> tuple[list[str], list[str]]:
+    """(static attributes, state attributes) of one agent record"""
+    exclude = set(getattr(cls, "_EXCLUDE", ()))
+    state = set(getattr(cls, "_state_attrs", ()))
+    static_fields = [k for k in record if k not in exclude and k not in state]
+    state_fields = [k for k in record if k in state]
+    return static_fields, state_fields
+
+
+def _spec_class(cls_name, spec):
+    """Stand-in class carrying the column layout of a pack table (for compaction)"""
+    shared = [name for name, kind in spec["fields"].items() if kind == "shared"]
+    return type(cls_name, (), {"_kde_attrs": spec["kde"], "_dict_attrs": shared})
+
+
+class DeltaStore:
+    def __init__(self, root: Path):
+        """root: checkpoint folder holding the run_ts= folders"""
+        self.root = Path(root)
+        self.store = self.root / STORE_DIR
+        self.packs = self.store / PACK_DIR
+        self.index_path = self.store / INDEX_FILE
+
+    @contextmanager
+    def lock(self, shared: bool = False):
+        """flock on store/store.lock (exclusive: writers, shared: readers)"""
+        self.store.mkdir(parents=True, exist_ok=True)
+        with open(self.store / LOCK_FILE, "a") as f:
+            fcntl.flock(f, fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    # ---------- index ----------
+    def load_index(self) -> dict[str, tuple[str, str, int]]:
+        """{static hash: (pack file name, class, row)}"""
+        if not self.index_path.exists():
+            self.rebuild_index()
+        index = {}
+        with open(self.index_path, "r", encoding="utf-8") as f:
+            for line in f:
+                entry = json.loads(line)
+                for row, h in enumerate(entry["hashes"]):
+                    index[h] = (entry["pack"], entry["class"], row)
+        return index
+
+    def _index_lines(self, pack_name, hashes_by_class):
+        return [
+            json.dumps({"pack": pack_name, "class": cls_name, "hashes": hashes})
+            for cls_name, hashes in hashes_by_class.items()
+        ]
+
+    def rebuild_index(self):
+        lines = []
+        for pack in sorted(self.packs.glob("pack_*.npz")):
+            with np.load(pack, allow_pickle=False) as archive:
+                lines += self._index_lines(pack.name, read_manifest(archive)["hashes"])
+        self.store.mkdir(parents=True, exist_ok=True)
+        self.index_path.write_text("".join(line + "\n" for line in lines))
+
+    # ---------- packs ----------
+    def write_pack(self, records_by_class: dict) -> str | None:
+        """
+        records_by_class: {cls_name: (cls, [(hash, record, static_fields),...])}
+        Output: pack file name (None when nothing is new)
+        """
+        if not records_by_class:
+            return None
+        arrays = {}
+        manifest = {"version": FORMAT_VERSION, "classes": {}, "hashes": {}}
+        for cls_name, (cls, entries) in records_by_class.items():
+            fields = {f for _, _, static_fields in entries for f in static_fields}
+            manifest["classes"][cls_name] = encode_table(
+                arrays, cls_name, [r for _, r, _ in entries], cls, fields=fields
+            )
+            manifest["hashes"][cls_name] = [h for h, _, _ in entries]
+
+        all_hashes = [h for hashes in manifest["hashes"].values() for h in hashes]
+        pack_name = (
+            "pack_"
+            + hashlib.blake2b("".join(all_hashes).encode(), digest_size=8).hexdigest()
+            + ".npz"
+        )
+        write_npz(self.packs / pack_name, arrays, manifest)
+        with open(self.index_path, "a", encoding="utf-8") as f:
+            for line in self._index_lines(pack_name, manifest["hashes"]):
+                f.write(line + "\n")
+        return pack_name
+
+    def read_static_records(self, hashes: Iterable[str], class_registry) -> dict:
+        """{hash: (names, row)} for the requested hashes, each pack decoded once"""
+        index = self.load_index()
+        by_pack: dict[str, set] = {}
+        for h in hashes:
+            if h not in index:
+                raise FileNotFoundError(f"Static record {h} missing from {self.store}")
+            by_pack.setdefault(index[h][0], set()).add(h)
+
+        records = {}
+        for pack_name, wanted in by_pack.items():
+            with np.load(self.packs / pack_name, allow_pickle=False) as archive:
+                manifest = read_manifest(archive)
+                for cls_name, pack_hashes in manifest["hashes"].items():
+                    if wanted.isdisjoint(pack_hashes):
+                        continue
+                    get_class(class_registry, cls_name)
+                    names, rows = decode_table(
+                        archive, cls_name, manifest["classes"][cls_name]
+                    )
+                    for h, row in zip(pack_hashes, rows):
+                        if h in wanted:
+                            records[h] = (names, row)
+        return records
+
+    # ---------- checkpoints ----------
+    def save(self, folder: Path, agents: Iterable[Any], run_id) -> Path:
+        """
+        Write the new static records (one pack) and the checkpoint of this run.
+        Output: path of delta_<run_id>.npz
+        """
+        hasher = RecordHasher()
+        candidates = []  # (cls_name, cls, hash, record, static_fields)
+        arrays = {}
+        manifest = {
+            "version": FORMAT_VERSION,
+            "run_id": run_id,
+            "kind": "delta",
+            "classes": {},
+        }
+
+        for cls_name, members in group_by_class(agents).items():
+            cls = type(members[0])
+            shared = set(getattr(cls, "_dict_attrs", ()))
+            kde_attrs = set(getattr(cls, "_kde_attrs", ()))
+            hashes, state_fields = [], []
+            for agent in members:
+                record = agent.__dict__
+                static_fields, agent_state = split_fields(cls, record)
+                h = hasher.record_hash(
+                    cls_name, record, static_fields, shared, kde_attrs
+                )
+                hashes.append(h)
+                state_fields += [f for f in agent_state if f not in state_fields]
+                candidates.append((cls_name, cls, h, record, static_fields))
+
+            arrays[f"{cls_name}/__static__"] = np.asarray(hashes, dtype="S32")
+            manifest["classes"][cls_name] = encode_table(
+                arrays,
+                cls_name,
+                [a.__dict__ for a in members],
+                cls,
+                fields=set(state_fields),
+            )
+
+        # Index check, pack and checkpoint under one lock: a gc in between would see the
+        # new pack unreferenced, or drop a record the index said was already stored
+        with self.lock():
+            index = self.load_index()
+            new_records = {}
+            for cls_name, cls, h, record, static_fields in candidates:
+                if h not in index:
+                    index[h] = None  # written once even if several agents share it
+                    new_records.setdefault(cls_name, (cls, []))[1].append(
+                        (h, record, static_fields)
+                    )
+            pack_name = self.write_pack(new_records)
+            written = sum(len(entries) for _, entries in new_records.values())
+            print(
+                f"Delta checkpoint: {written} new static records ({pack_name or '-'})"
+            )
+            return write_npz(
+                Path(folder) / DELTA_PATTERN.replace("*", str(run_id)),
+                arrays,
+                manifest,
+            )
+
+    def load(self, path: Path, class_registry: dict) -> list:
+        """Reassemble the agents of one delta checkpoint (static record + state)"""
+        with np.load(path, allow_pickle=False) as archive:
+            manifest = read_manifest(archive)
+            tables = {}
+            for cls_name, spec in manifest["classes"].items():
+                hashes = archive[f"{cls_name}/__static__"].astype(str).tolist()
+                tables[cls_name] = (hashes, *decode_table(archive, cls_name, spec))
+
+        with self.lock(shared=True):
+            static = self.read_static_records(
+                {h for hashes, _, _ in tables.values() for h in hashes}, class_registry
+            )
+
+        agents = []
+        for cls_name, (hashes, state_names, state_rows) in tables.items():
+            cls = get_class(class_registry, cls_name)
+            new = cls.__new__
+            for h, state_row in zip(hashes, state_rows):
+                static_names, static_row = static[h]
+                obj = new(cls)
+                obj.__dict__.update(zip(static_names, static_row))
+                obj.__dict__.update(zip(state_names, state_row))
+                agents.append(obj)
+        return agents
+
+    # ---------- retention ----------
+    def gc(self, checkpoints: Iterable[Path]) -> dict:
+        """
+        Keep only the static records referenced by the given (retained) checkpoints.
+        Packs without live records are deleted, mostly dead packs are compacted.
+        Packs newer than the newest checkpoint read are skipped: they belong to a save
+        that finished after the caller listed the retained checkpoints.
+        """
+        if not self.packs.exists():
+            return {"deleted": 0, "compacted": 0}
+
+        with self.lock():
+            live, newest = set(), 0
+            for path in checkpoints:
+                newest = max(newest, Path(path).stat().st_mtime_ns)
+                with np.load(path, allow_pickle=False) as archive:
+                    for cls_name in read_manifest(archive)["classes"]:
+                        live.update(
+                            archive[f"{cls_name}/__static__"].astype(str).tolist()
+                        )
+
+            deleted = compacted = 0
+            for pack in sorted(self.packs.glob("pack_*.npz")):
+                if pack.stat().st_mtime_ns > newest:
+                    continue
+                with np.load(pack, allow_pickle=False) as archive:
+                    manifest = read_manifest(archive)
+                    total = sum(len(h) for h in manifest["hashes"].values())
+                    alive = sum(
+                        h in live
+                        for hashes in manifest["hashes"].values()
+                        for h in hashes
+                    )
+                    if alive and alive >= total * COMPACT_BELOW:
+                        continue
+                    kept = {}
+                    if alive:
+                        for cls_name, pack_hashes in manifest["hashes"].items():
+                            spec = manifest["classes"][cls_name]
+                            names, rows = decode_table(archive, cls_name, spec)
+                            entries = [
+                                (h, dict(zip(names, row)), names)
+                                for h, row in zip(pack_hashes, rows)
+                                if h in live
+                            ]
+                            if entries:
+                                kept[cls_name] = (_spec_class(cls_name, spec), entries)
+                # Live records are written to their new pack before the old one goes:
+                # an error here leaves both, never neither
+                if kept:
+                    new_name = self.write_pack(kept)
+                    compacted += 1
+                else:
+                    new_name = None
+                    deleted += 1
+                if new_name != pack.name:
+                    pack.unlink()
+
+            self.rebuild_index()
+        return {"deleted": deleted, "compacted": compacted}
@@ -0,0 +1,261 @@
+from __future__ import annotations
+
+import json
+import os
+from pathlib import Path
+from typing import Callable, Iterable
+
+import numpy as np
+from helper.lazy_kde import LazyKDE
+from helper.workspace import DEFAULT_WORKSPACE
+
+"""
+File-backed store of the fitted distributions, shared by every process
+- Each process used to load category_kde_distributions.npz and refit the segment KDEs on
+  its own (gunicorn workers, simulations, sweep workers): resident memory grew with the
+  process count
+- The first process publishes the fitted arrays once, in one file per source:
+    - segments: segment probabilities, categorical probability vectors (+ their keys),
+      KDE datasets + bandwidth factors
+    - products: price / quantity data + KDE factors or normal loc / scale per category
+- The other processes attach it with a read-only np.memmap: the arrays are views on the
+  page cache (one physical copy for all), the KDEs are LazyKDE over those views
+- A store is refitted when its source files changed (size / mtime)
+- Writes go to a temporary file replaced atomically: readers never see a partial store,
+  processes still attached to a replaced store keep their old mapping
+- The categorical probabilities come back as the same {value: prob} dicts as the fit
+  (small, rebuilt per process)
+
+File layout:
+    MAGIC | header length (uint64 little endian) | JSON header | padding | arrays
+    header["arrays"] = {name: [byte offset, dtype, shape]}, offsets aligned to ALIGN
+"""
+
+MAGIC = b"ABMDIST1"
+ALIGN = 64
+FORMAT_VERSION = 1
+
+
+def source_stamps(paths: Iterable[str]) -> dict:
+    """{path: [size, mtime_ns]} (None for a missing file)"""
+    stamps = {}
+    for path in paths:
+        try:
+            stat = os.stat(path)
+            stamps[str(path)] = [stat.st_size, stat.st_mtime_ns]
+        except FileNotFoundError:
+            stamps[str(path)] = None
+    return stamps
+
+
+class ArrayWriter:
+    """Collects arrays for one store file"""
+
+    def __init__(self):
+        self.arrays: dict[str, np.ndarray] = {}
+
+    def add(self, array) -> str:
+        name = f"a{len(self.arrays)}"
+        self.arrays[name] = np.ascontiguousarray(array)
+        return name
+
+    def write(self, path: Path, header: dict) -> None:
+        layout, offset = {}, 0
+        for name, array in self.arrays.items():
+            offset = -(-offset // ALIGN) * ALIGN
+            layout[name] = [offset, array.dtype.str, list(array.shape)]
+            offset += array.nbytes
+        header = {**header, "format": FORMAT_VERSION, "arrays": layout}
+        header_bytes = json.dumps(header).encode("utf-8")
+        start = -(-(len(MAGIC) + 8 + len(header_bytes)) // ALIGN) * ALIGN
+
+        tmp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        with open(tmp_path, "wb") as f:
+            f.write(MAGIC)
+            f.write(len(header_bytes).to_bytes(8, "little"))
+            f.write(header_bytes)
+            for name, array in self.arrays.items():
+                f.seek(start + layout[name][0])
+                f.write(array.tobytes())
+            f.truncate(start + offset)
+        tmp_path.replace(path)
+
+
+def attach(path: Path) -> tuple[dict, dict[str, np.ndarray]]:
+    """
+    Input: store file
+    Output: (header, {name: read-only view of the mapped file})
+    """
+    with open(path, "rb") as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"{path} is not a distribution store")
+        header_size = int.from_bytes(f.read(8), "little")
+        header = json.loads(f.read(header_size))
+    start = -(-(len(MAGIC) + 8 + header_size) // ALIGN) * ALIGN
+
+    arrays = {}
+    if header["arrays"] and os.path.getsize(path) > start:
+        data = np.memmap(path, dtype=np.uint8, mode="r", offset=start)
+        for name, (offset, dtype, shape) in header["arrays"].items():
+            dtype = np.dtype(dtype)
+            size = int(np.prod(shape, dtype=np.int64)) * dtype.itemsize
+            arrays[name] = data[offset : offset + size].view(dtype).reshape(shape)
+    else:  # only empty arrays
+        for name, (_, dtype, shape) in header["arrays"].items():
+            arrays[name] = np.empty(shape, dtype=dtype)
+    return header, arrays
+
+
+def encode_dist(writer: ArrayWriter, dist) -> dict:
+    """KDE -> dataset + factor, frozen normal -> loc / scale"""
+    if hasattr(dist, "dataset") and hasattr(dist, "factor"):
+        return {
+            "type": "kde",
+            "dataset": writer.add(np.atleast_2d(dist.dataset)),
+            "factor": float(dist.factor),
+        }
+    if hasattr(dist, "kwds") and dist.dist.name == "norm":
+        return {
+            "type": "norm",
+            "loc": float(dist.kwds.get("loc", 0.0)),
+            "scale": float(dist.kwds.get("scale", 1.0)),
+        }
+    raise TypeError(f"Cannot store distribution {type(dist).__name__}")
+
+
+def decode_dist(spec: dict, arrays: dict):
+    if spec["type"] == "kde":
+        return LazyKDE(arrays[spec["dataset"]], spec["factor"])
+    from scipy.stats import norm
+
+    return norm(loc=spec["loc"], scale=spec["scale"])
+
+
+def encode_segments(writer: ArrayWriter, fitted: tuple) -> dict:
+    segments_dist, cat_dist, num_dist = fitted
+    segments = []
+    for segment_id, prob in segments_dist.items():
+        segments.append(
+            {
+                "id": int(segment_id),
+                "p": float(prob),
+                "cat": {
+                    col: {
+                        "keys": list(values.keys()),
+                        "p": writer.add(np.fromiter(values.values(), dtype=np.float64)),
+                    }
+                    for col, values in cat_dist[segment_id].items()
+                },
+                "num": {
+                    col: encode_dist(writer, dist)
+                    for col, dist in num_dist[segment_id].items()
+                },
+            }
+        )
+    return {"segments": segments}
+
+
+def decode_segments(header: dict, arrays: dict) -> tuple:
+    segments_dist, cat_dist, num_dist = {}, {}, {}
+    for segment in header["segments"]:
+        segment_id = segment["id"]
+        segments_dist[segment_id] = segment["p"]
+        cat_dist[segment_id] = {
+            col: dict(zip(spec["keys"], arrays[spec["p"]].tolist()))
+            for col, spec in segment["cat"].items()
+        }
+        num_dist[segment_id] = {
+            col: decode_dist(spec, arrays) for col, spec in segment["num"].items()
+        }
+    return segments_dist, cat_dist, num_dist
+
+
+def encode_products(writer: ArrayWriter, fitted: dict) -> dict:
+    categories = {}
+    for category, dist in fitted.items():
+        categories[category] = {
+            "price_dist_type": dist["price_dist_type"],
+            "quantity_dist_type": dist["quantity_dist_type"],
+            "price_data": writer.add(dist["price_data"]),
+            "quantity_data": writer.add(dist["quantity_data"]),
+            "price_kde": encode_dist(writer, dist["price_kde"]),
+            "quantity_kde": encode_dist(writer, dist["quantity_kde"]),
+        }
+    return {"categories": categories}
+
+
+def decode_products(header: dict, arrays: dict) -> dict:
+    result = {}
+    for category, spec in header["categories"].items():
+        result[category] = {
+            "price_kde": decode_dist(spec["price_kde"], arrays),
+            "quantity_kde": decode_dist(spec["quantity_kde"], arrays),
+            "price_dist_type": spec["price_dist_type"],
+            "quantity_dist_type": spec["quantity_dist_type"],
+            "price_data": arrays[spec["price_data"]],
+            "quantity_data": arrays[spec["quantity_data"]],
+        }
+    return result
+
+
+KINDS = {
+    "segments": (encode_segments, decode_segments),
+    "products": (encode_products, decode_products),
+}
+
+
+class DistributionStore:
+    def __init__(self, folder: str | Path = DEFAULT_WORKSPACE.distribution_store):
+        self.folder = Path(folder)
+
+    def path_for(self, kind: str, source: str) -> Path:
+        return self.folder / f"{kind}__{Path(source).stem}.dist"
+
+    def get(
+        self,
+        kind: str,
+        source: str,
+        fit: Callable,
+        depends: Iterable[str] = (),
+    ):
+        """
+        Attach the store of source, or fit(source) and publish it first.
+        Input:
+            - kind -> "segments" (getting_segments_dist) | "products" (load_distributions_from_file)
+            - depends -> other files the fit reads (part of the freshness check)
+        """
+        encode, decode = KINDS[kind]
+        path = self.path_for(kind, source)
+        stamps = source_stamps([source, *depends])
+
+        if path.exists():
+            try:
+                header, arrays = attach(path)
+                if (
+                    header.get("format") == FORMAT_VERSION
+                    and header.get("sources") == stamps
+                ):
+                    return decode(header, arrays)
+                print(f"Distribution store {path.name} is outdated, refitting...")
+            except (ValueError, OSError, KeyError) as e:
+                print(f"Unreadable distribution store {path.name} ({e}), refitting...")
+
+        fitted = fit(source)
+        writer = ArrayWriter()
+        header = {"kind": kind, "source": str(source), "sources": stamps}
+        header.update(encode(writer, fitted))
+        try:
+            self.folder.mkdir(parents=True, exist_ok=True)
+            writer.write(path, header)
+        except OSError as e:  # read-only deployment: keep the private copy
+            print(f"Could not publish distribution store {path.name}: {e}")
+            return fitted
+        return decode(*attach(path))
+
+    def segments(
+        self, source: str, fit: Callable, depends: Iterable[str] = ()
+    ) -> tuple:
+        return self.get("segments", source, fit, depends=depends)
+
+    def products(self, source: str, fit: Callable) -> dict:
+        return self.get("products", source, fit)
@@ -1,23 +1,23 @@
 import json
-import pathlib
+
+from helper.workspace import DEFAULT_WORKSPACE, Workspace
+
+BASE_IDS = {"Cust1": 0, "Cust2": 5000, "Product": 10000, "Transaction": 100000}
 
 
 class IdRegistry:
-    def __init__(self, mode):
-        path = (
-            "./method/helper/id_seeds_test.json"
-            if mode.lower() == "test"
-            else "./method/helper/id_seeds.json"
-        )
-        self.path = pathlib.Path(path)
+    def __init__(self, mode, offset: int = 0, workspace: Workspace | None = None):
+        """
+        offset -> shifts every id range (parameter sweeps give each scenario its own ids)
+        workspace -> where id_seeds*.json lives (default: method/helper)
+        """
+        self.offset = offset
+        self.path = (workspace or DEFAULT_WORKSPACE).id_seed_file(mode)
         if self.path.exists():
             self._next_values = json.loads(self.path.read_text())
         else:
             self._next_values = {
-                "Cust1": 0,
-                "Cust2": 5000,
-                "Product": 10000,
-                "Transaction": 100000,
+                **{k: v + offset for k, v in BASE_IDS.items()},
                 "total_transaction": 0,
                 "total_customer1": 0,
                 "total_customer2": 0,
@@ -51,7 +51,9 @@ class IdRegistry:
         return self._seeds[entity]
 
     def get_id_range(self):
-        id_range = {"Cust1": [0], "Cust2": [5000], "Product": [10000]}
+        id_range = {
+            k: [BASE_IDS[k] + self.offset] for k in ("Cust1", "Cust2", "Product")
+        }
         for k in id_range.keys():
             lower = id_range[k][0]
             current = self.get_initial_value(k)
@@ -60,6 +62,7 @@ class IdRegistry:
         return id_range
 
     def advance(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
         self.path.write_text(json.dumps(self._next_values, indent=2))
 
     def reload(self):
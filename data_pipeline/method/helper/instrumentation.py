@@ -0,0 +1,155 @@
+import argparse
+import functools
+import json
+import os
+import socket
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+"""
+Pipeline instrumentation (timings, counters, gauges)
+- Null backend by default: no cost, nothing sent
+- METRICS_BACKEND=statsd sends plain UDP statsd packets (DogStatsD tags) to the
+  statsd-exporter already scraped by Prometheus (docker-compose: statsd-exporter:9125)
+    - STATSD_HOST / STATSD_PORT / STATSD_PREFIX (default: localhost / 9125 / walmart)
+    - statsd_mapping.yml turns the timers into Prometheus histograms
+- No third-party dependency, sending never raises (metrics must not break a run)
+
+Usage:
+    from helper.instrumentation import get_metrics, timed
+
+    with timed("simulation.step"):
+        ...
+    get_metrics().incr("load.rows", 1000, tags={"table": "transactions"})
+
+dbt model timings (after dbt build):
+    python helper/instrumentation.py --dbt-run-results target/run_results.json
+"""
+
+
+class NullMetrics:
+    """Default backend: every call is a no-op."""
+
+    def timing(self, name, ms, tags=None):
+        pass
+
+    def incr(self, name, value=1, tags=None):
+        pass
+
+    def gauge(self, name, value, tags=None):
+        pass
+
+
+class StatsdMetrics(NullMetrics):
+    """Fire-and-forget UDP statsd client: <prefix>.<name>:<value>|<type>|#k:v,..."""
+
+    def __init__(self, host="localhost", port=9125, prefix="walmart"):
+        self.address = (host, int(port))
+        self.prefix = prefix
+        self._sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+
+    def _send(self, name, value, metric_type, tags=None):
+        packet = f"{self.prefix}.{name}:{value}|{metric_type}"
+        if tags:
+            packet += "|#" + ",".join(f"{k}:{v}" for k, v in tags.items())
+        try:
+            self._sock.sendto(packet.encode("utf-8"), self.address)
+        except OSError:
+            pass
+
+    def timing(self, name, ms, tags=None):
+        self._send(name, round(ms, 3), "ms", tags)
+
+    def incr(self, name, value=1, tags=None):
+        self._send(name, value, "c", tags)
+
+    def gauge(self, name, value, tags=None):
+        self._send(name, value, "g", tags)
+
+
+_metrics = None
+
+
+def get_metrics():
+    """Process-wide backend, picked from the environment on first use."""
+    global _metrics
+    if _metrics is None:
+        if os.getenv("METRICS_BACKEND", "null").lower() == "statsd":
+            _metrics = StatsdMetrics(
+                host=os.getenv("STATSD_HOST", "localhost"),
+                port=int(os.getenv("STATSD_PORT", 9125)),
+                prefix=os.getenv("STATSD_PREFIX", "walmart"),
+            )
+        else:
+            _metrics = NullMetrics()
+    return _metrics
+
+
+def set_metrics(backend):
+    """Swap the backend (e.g. StatsdMetrics(...) in a script, NullMetrics() to disable)"""
+    global _metrics
+    _metrics = backend
+
+
+@contextmanager
+def timed(name, tags=None):
+    """
+    Time the block and emit <name>.duration (ms).
+    Yields a dict; values put in it (e.g. {"rows": n}) are emitted as <name>.<key> counters
+    and <name>.<key>_per_second gauges.
+    """
+    extra = {}
+    start = time.perf_counter()
+    try:
+        yield extra
+    finally:
+        elapsed = time.perf_counter() - start
+        metrics = get_metrics()
+        metrics.timing(f"{name}.duration", elapsed * 1000, tags)
+        for key, value in extra.items():
+            metrics.incr(f"{name}.{key}", value, tags)
+            if elapsed > 0:
+                metrics.gauge(f"{name}.{key}_per_second", value / elapsed, tags)
+
+
+def timed_function(name):
+    """Decorator version of timed() (no per-call counters)"""
+
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with timed(name):
+                return fn(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def emit_dbt_run_results(run_results_path):
+    """
+    Per-model execution time and status from dbt's target/run_results.json
+    Output: number of results emitted
+    """
+    with open(run_results_path, "r", encoding="utf-8") as f:
+        results = json.load(f).get("results", [])
+
+    metrics = get_metrics()
+    for r in results:
+        node = r.get("unique_id", "unknown")
+        resource_type, _, model = node.partition(".")
+        tags = {"node": model or node, "resource_type": resource_type}
+        metrics.timing("dbt.node.duration", r.get("execution_time", 0) * 1000, tags)
+        metrics.incr("dbt.node.status", 1, {**tags, "status": r.get("status")})
+    return len(results)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Send pipeline metrics to statsd")
+    parser.add_argument("--dbt-run-results", type=Path, required=True)
+    args = parser.parse_args()
+    if args.dbt_run_results.exists():
+        print(f"Emitted {emit_dbt_run_results(args.dbt_run_results)} dbt results")
+    else:
+        print(f"No dbt results at {args.dbt_run_results}")
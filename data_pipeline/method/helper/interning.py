@@ -0,0 +1,47 @@
+from __future__ import annotations
+
+import sys
+from typing import Any, Iterable
+
+"""
+Interning pass for agents rebuilt from a checkpoint
+- Fresh agents share the segment distributions of cat_dist[segment_id]
+  (product_category, product_line, quantity, date): one dict per segment.
+  Rebuilt agents get one copy per agent (jsonl.gz) or per pack (delta store).
+- InternRegistry maps every _dict_attrs value to one shared object per distinct content
+  (key order included: np.random.choice uses it) and interns the string attributes
+  (gender, city, branch, product_category...) with sys.intern
+- The shared dicts are read-only by convention, same as for fresh agents
+"""
+
+
+class InternRegistry:
+    def __init__(self):
+        self._dicts: dict[Any, dict] = {}
+        self.shared = 0  # values replaced by an already registered object
+
+    def intern_dict(self, value: dict) -> dict:
+        try:
+            existing = self._dicts.setdefault(tuple(value.items()), value)
+        except TypeError:  # unhashable nested values, keyed by their text
+            existing = self._dicts.setdefault(repr(value), value)
+        if existing is not value:
+            self.shared += 1
+        return existing
+
+    def intern_agent(self, agent) -> None:
+        state = agent.__dict__
+        for attr in getattr(agent, "_dict_attrs", ()):
+            value = state.get(attr)
+            if isinstance(value, dict):
+                state[attr] = self.intern_dict(value)
+        for attr, value in state.items():
+            if type(value) is str:
+                state[attr] = sys.intern(value)
+
+    def intern_agents(self, agents: Iterable[Any]) -> None:
+        for agent in agents:
+            self.intern_agent(agent)
+
+    def __len__(self):
+        return len(self._dicts)
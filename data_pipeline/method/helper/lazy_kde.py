@@ -0,0 +1,97 @@
+from __future__ import annotations
+
+import hashlib
+import weakref
+from typing import TYPE_CHECKING
+
+import numpy as np
+
+if TYPE_CHECKING:
+    from scipy.stats import gaussian_kde
+
+"""
+Lazy gaussian_kde for resumed agents
+- Loading a checkpoint keeps the raw KDE payload (dataset + bandwidth factor);
+  the gaussian_kde (covariance, Cholesky factor) is only built on first use
+  (resample, evaluate, ...) -> agents not visiting yet cost nothing
+- dataset / factor / d / n are answered from the payload, so saving a resumed agent
+  does not materialize it either
+- share=True: identical payloads get the same LazyKDE object (built once for every
+  agent of a segment). Sampling uses the global numpy RNG, so sharing is safe
+- scipy is only imported by the first materialize()
+"""
+
+_SHARED: weakref.WeakValueDictionary = weakref.WeakValueDictionary()
+
+
+class LazyKDE:
+    __slots__ = ("_dataset", "factor", "_kde", "__weakref__")
+
+    def __init__(self, dataset, factor: float):
+        self._dataset = np.atleast_2d(np.asarray(dataset, dtype=np.float64))
+        self.factor = float(factor)
+        self._kde = None
+
+    @property
+    def dataset(self) -> np.ndarray:
+        return self._dataset
+
+    @property
+    def d(self) -> int:
+        return self._dataset.shape[0]
+
+    @property
+    def n(self) -> int:
+        return self._dataset.shape[1]
+
+    @property
+    def materialized(self) -> bool:
+        return self._kde is not None
+
+    def materialize(self) -> gaussian_kde:
+        if self._kde is None:
+            from scipy.stats import gaussian_kde
+
+            self._kde = gaussian_kde(self._dataset, bw_method=self.factor)
+        return self._kde
+
+    def resample(self, size=None, seed=None):
+        return self.materialize().resample(size, seed=seed)
+
+    def evaluate(self, points):
+        return self.materialize().evaluate(points)
+
+    __call__ = evaluate
+
+    def __getattr__(self, name):
+        # any other gaussian_kde attribute / method
+        if name.startswith("__"):
+            raise AttributeError(name)
+        return getattr(self.materialize(), name)
+
+    def __reduce__(self):
+        return (LazyKDE, (self._dataset, self.factor))
+
+    def __repr__(self):
+        state = "built" if self._kde is not None else "lazy"
+        return f"LazyKDE(d={self.d}, n={self.n}, factor={self.factor:.4g}, {state})"
+
+
+def lazy_kde(dataset, factor: float, share: bool = True) -> LazyKDE:
+    """
+    Input:
+        - dataset -> KDE points (gaussian_kde.dataset layout, list or array)
+        - factor -> bandwidth factor (gaussian_kde.factor)
+        - share -> reuse the LazyKDE of an identical payload still alive
+    """
+    kde = LazyKDE(dataset, factor)
+    if not share:
+        return kde
+
+    digest = hashlib.blake2b(kde.dataset.tobytes(), digest_size=16)
+    digest.update(repr((kde.dataset.shape, kde.factor)).encode())
+    key = digest.digest()
+    shared = _SHARED.get(key)
+    if shared is None:
+        _SHARED[key] = shared = kde
+    return shared
@@ -0,0 +1,32 @@
+import logging
+from pathlib import Path
+
+from helper.workspace import DEFAULT_WORKSPACE
+
+"""
+Logging configuration for the command line entry points
+- Used to run at import time in ABM_modeling.py / data_processor.py (basicConfig with a
+  FileHandler): importing the model opened log files in whatever folder the process
+  started in, gunicorn workers and management commands included
+- Entry points (run_simulation, sweep, ABM_modeling / walmart_model main) call
+  setup_logging() once; library imports configure nothing (Django keeps its own LOGGING)
+"""
+
+LOG_FILE = DEFAULT_WORKSPACE.logs / "ABM_modeling.log"
+LOG_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+
+
+def setup_logging(log_file: str | Path | None = LOG_FILE, level=logging.INFO):
+    """
+    Input:
+        - log_file -> file handler path (None: console only), folder created if missing
+        - level -> root level
+    No-op when the root logger already has handlers (second call, Django, pytest...)
+    """
+    if logging.getLogger().handlers:
+        return
+    handlers = [logging.StreamHandler()]
+    if log_file is not None:
+        Path(log_file).parent.mkdir(parents=True, exist_ok=True)
+        handlers.append(logging.FileHandler(log_file))
+    logging.basicConfig(level=level, format=LOG_FORMAT, handlers=handlers)
@@ -0,0 +1,180 @@
+import json
+import math
+from pathlib import Path
+from typing import Any, Mapping, Sequence
+
+"""
+Precomputed metrics summary for the simulation preview endpoint
+- Built once when a run finishes (write_results_csv) from the metrics dataframe
+- Saved next to the metrics CSV as id=<run_id>_metrics_summary.json
+- Records use the same keys as WalmartModel.get_current_step_metrics_for_graphs()
+- Optional downsampling for long histories (LTTB or min/max buckets, DOWNSAMPLE_METHODS)
+
+Why JSON?
+- The API can serve it without pandas
+- Small enough for 10k+ step histories (one flat record per step)
+"""
+
+SUMMARY_SUFFIX = "_metrics_summary.json"
+
+# CSV column -> (record key, caster, default)
+METRIC_COLUMNS = {
+    "Current Date": ("current_date", str, ""),
+    "Avg_Purchases_Cust1": ("cust1_avg_purchase", float, 0.0),
+    "Avg_Purchases_Cust2": ("cust2_avg_purchase", float, 0.0),
+    "Total_Daily_Purchase": ("total_daily_purchases", lambda v: int(float(v)), 0),
+    "Total_cust1": ("total_cust1", lambda v: int(float(v)), 0),
+    "Total_cust2": ("total_cust2", lambda v: int(float(v)), 0),
+    "Total_products": ("total_products", lambda v: int(float(v)), 0),
+    "Stockout": ("stockout_rate", float, 0.0),
+}
+
+
+def summary_path_for(metrics_csv: Path) -> Path:
+    """id=123_metrics.csv -> id=123_metrics_summary.json"""
+    return metrics_csv.with_name(
+        metrics_csv.name.replace("_metrics.csv", SUMMARY_SUFFIX)
+    )
+
+
+def build_metrics_summary(columns: Mapping[str, Sequence[Any]]) -> dict[str, Any]:
+    """
+    Input:
+        - columns -> metrics dataframe or {csv_column: [values,...]} (csv.DictReader output transposed)
+    Output: {"metrics": [{step, current_date, ...},...], "total_steps": int, "latest_simulated_date": str | None}
+    """
+    n_rows = max((len(columns[c]) for c in columns.keys()), default=0)
+
+    casted = {}
+    for col, (key, cast, default) in METRIC_COLUMNS.items():
+        values = list(columns[col]) if col in columns else [default] * n_rows
+        casted[key] = [
+            (
+                default
+                if v is None or v == "" or (isinstance(v, float) and math.isnan(v))
+                else cast(v)
+            )
+            for v in values
+        ]
+
+    metrics = [
+        {"step": i + 1, **{key: casted[key][i] for key in casted}}
+        for i in range(n_rows)
+    ]
+
+    latest_simulated_date = next(
+        (m["current_date"] for m in reversed(metrics) if m["current_date"]), None
+    )
+
+    return {
+        "metrics": metrics,
+        "total_steps": len(metrics),
+        "latest_simulated_date": latest_simulated_date,
+    }
+
+
+def write_metrics_summary(
+    columns: Mapping[str, Sequence[Any]], metrics_csv: Path
+) -> Path:
+    """
+    Build and save the summary next to the metrics CSV.
+    Written to a temp file first so readers never see a half-written summary.
+    """
+    summary = build_metrics_summary(columns)
+    summary["metrics_file"] = metrics_csv.name
+
+    out_path = summary_path_for(metrics_csv)
+    tmp_path = out_path.with_suffix(".json.tmp")
+    tmp_path.write_text(json.dumps(summary, separators=(",", ":")), encoding="utf-8")
+    tmp_path.replace(out_path)
+    return out_path
+
+
+def load_metrics_summary(summary_file: Path) -> dict[str, Any]:
+    with open(summary_file, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def downsample_lttb(
+    records: list[dict], max_points: int, y_key: str = "total_daily_purchases"
+) -> list[dict]:
+    """
+    Largest-Triangle-Three-Buckets: keeps the visual shape of y_key with max_points records.
+    Always keeps the first and last record. x is the record position (one record per step).
+    """
+    n = len(records)
+    if max_points >= n or max_points < 3:
+        return records
+
+    sampled = [records[0]]
+    bucket_size = (n - 2) / (max_points - 2)
+    a = 0  # index of the last selected point
+
+    for i in range(max_points - 2):
+        # Average point of the next bucket
+        next_start = int((i + 1) * bucket_size) + 1
+        next_end = min(int((i + 2) * bucket_size) + 1, n)
+        next_len = max(next_end - next_start, 1)
+        avg_x = sum(range(next_start, next_start + next_len)) / next_len
+        avg_y = (
+            sum(
+                float(records[j][y_key])
+                for j in range(next_start, min(next_start + next_len, n))
+            )
+            / next_len
+        )
+
+        # Pick the point in the current bucket with the largest triangle
+        start = int(i * bucket_size) + 1
+        end = int((i + 1) * bucket_size) + 1
+        ax, ay = a, float(records[a][y_key])
+        best_area, best_idx = -1.0, start
+        for j in range(start, end):
+            area = abs(
+                (ax - avg_x) * (float(records[j][y_key]) - ay) - (ax - j) * (avg_y - ay)
+            )
+            if area > best_area:
+                best_area, best_idx = area, j
+
+        sampled.append(records[best_idx])
+        a = best_idx
+
+    sampled.append(records[-1])
+    return sampled
+
+
+def downsample_minmax(
+    records: list[dict], max_points: int, y_key: str = "total_daily_purchases"
+) -> list[dict]:
+    """
+    Keep the min and max record of y_key in each bucket (2 points per bucket, in step order).
+    """
+    n = len(records)
+    if max_points >= n or max_points < 2:
+        return records
+
+    n_buckets = max_points // 2
+    bucket_size = n / n_buckets
+    sampled = []
+    for b in range(n_buckets):
+        bucket = records[int(b * bucket_size) : int((b + 1) * bucket_size)]
+        if not bucket:
+            continue
+        lo = min(bucket, key=lambda r: float(r[y_key]))
+        hi = max(bucket, key=lambda r: float(r[y_key]))
+        sampled.extend(
+            sorted({id(lo): lo, id(hi): hi}.values(), key=lambda r: r["step"])
+        )
+    return sampled
+
+
+DOWNSAMPLE_METHODS = {"lttb": downsample_lttb, "minmax": downsample_minmax}
+
+
+def downsample(
+    records: list[dict], max_points: int, method: str = "lttb"
+) -> list[dict]:
+    """method: key of DOWNSAMPLE_METHODS (ValueError otherwise)"""
+    if method not in DOWNSAMPLE_METHODS:
+        raise ValueError(f"Unknown downsample method: {method}")
+    return DOWNSAMPLE_METHODS[method](records, max_points)
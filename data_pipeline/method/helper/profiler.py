@@ -0,0 +1,159 @@
+import cProfile
+import io
+import json
+import pstats
+import time
+from collections import defaultdict
+from contextlib import contextmanager, nullcontext
+from pathlib import Path
+
+"""
+Simulation profiler (run_simulation.py --profile)
+- Per step wall time of each phase of WalmartModel.step:
+    - category_lookup -> get_category_preference + get_itinerary_category
+    - customer_step -> Cust1/Cust2.step (purchase)
+    - product_step -> Product.step (restock, daily counters)
+    - data_collection -> DataCollector.collect + step metrics
+- Phases outside the steps (load_agents, save_results_as_df, write_results_csv, save_agents)
+  are recorded once in "run_phases"
+- --profile-stacks also runs cProfile over the whole run
+    - id=<run_id>_profile.prof: open with snakeviz / flameprof (flamegraph) or pstats
+    - top functions (cumulative time) are added to the JSON
+
+Output (next to the run outputs): id=<run_id>_profile.json
+Default is NullProfiler: phase() returns a shared no-op context, nothing recorded
+"""
+
+PROFILE_SUFFIX = "_profile"
+STEP_PHASES = {"category_lookup", "customer_step", "product_step", "data_collection"}
+TOP_FUNCTIONS = 30
+
+_NULL_CONTEXT = nullcontext()
+
+
+class NullProfiler:
+    """Profiling off: same interface, no bookkeeping."""
+
+    enabled = False
+
+    def phase(self, name):
+        return _NULL_CONTEXT
+
+    def end_step(self, step):
+        pass
+
+    def start(self):
+        pass
+
+    def stop(self):
+        pass
+
+
+class PhaseProfiler(NullProfiler):
+    enabled = True
+
+    def __init__(self, stacks: bool = False):
+        self.steps = []
+        self.run_phases = defaultdict(float)
+        self._current = defaultdict(float)
+        self._cprofile = cProfile.Profile() if stacks else None
+        self._started = None
+        self.total_seconds = 0.0
+
+    @contextmanager
+    def phase(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            if name in STEP_PHASES:
+                self._current[name] += elapsed
+            else:
+                self.run_phases[name] += elapsed
+
+    def end_step(self, step):
+        """Close the phases of one model step."""
+        self.steps.append({"step": step, **self._current})
+        self._current = defaultdict(float)
+
+    def start(self):
+        self._started = time.perf_counter()
+        if self._cprofile:
+            self._cprofile.enable()
+
+    def stop(self):
+        if self._cprofile:
+            self._cprofile.disable()
+        if self._started is not None:
+            self.total_seconds += time.perf_counter() - self._started
+            self._started = None
+
+    def step_totals(self):
+        """Seconds per step phase summed over every step"""
+        totals = defaultdict(float)
+        for step in self.steps:
+            for name, seconds in step.items():
+                if name != "step":
+                    totals[name] += seconds
+        return dict(totals)
+
+    def top_functions(self, limit=TOP_FUNCTIONS):
+        """[{function, calls, total_s, cumulative_s}] sorted by cumulative time"""
+        if not self._cprofile:
+            return []
+        stats = pstats.Stats(self._cprofile, stream=io.StringIO())
+        rows = []
+        for (file, line, func), (_, calls, total, cumulative, _) in stats.stats.items():
+            rows.append(
+                {
+                    "function": f"{Path(file).name}:{line}({func})",
+                    "calls": calls,
+                    "total_s": round(total, 6),
+                    "cumulative_s": round(cumulative, 6),
+                }
+            )
+        rows.sort(key=lambda r: r["cumulative_s"], reverse=True)
+        return rows[:limit]
+
+    def summary(self):
+        step_totals = self.step_totals()
+        return {
+            "total_seconds": round(self.total_seconds, 6),
+            "steps": len(self.steps),
+            "step_phases": {k: round(v, 6) for k, v in step_totals.items()},
+            "run_phases": {k: round(v, 6) for k, v in self.run_phases.items()},
+            "per_step": [
+                {k: (round(v, 6) if k != "step" else v) for k, v in s.items()}
+                for s in self.steps
+            ],
+            "top_functions": self.top_functions(),
+        }
+
+    def print_report(self):
+        """Phase breakdown table (share of the profiled wall time)"""
+        total = self.total_seconds or 1e-9
+        rows = [("step." + k, v) for k, v in self.step_totals().items()]
+        rows += list(self.run_phases.items())
+        print("\nProfile (wall time per phase):")
+        for name, seconds in sorted(rows, key=lambda r: r[1], reverse=True):
+            print(f"  {name:<28} {seconds:>10.3f}s {seconds / total * 100:>6.1f}%")
+        print(f"  {'total':<28} {self.total_seconds:>10.3f}s")
+
+    def write(self, folder: Path, run_id) -> list[Path]:
+        """
+        Save the JSON report (and the cProfile stats) next to the run outputs.
+        Output: written paths
+        """
+        folder = Path(folder)
+        folder.mkdir(parents=True, exist_ok=True)
+        json_path = folder / f"id={run_id}{PROFILE_SUFFIX}.json"
+        with open(json_path, "w", encoding="utf-8") as f:
+            json.dump(self.summary(), f, indent=2)
+        paths = [json_path]
+
+        if self._cprofile:
+            prof_path = folder / f"id={run_id}{PROFILE_SUFFIX}.prof"
+            self._cprofile.dump_stats(prof_path)
+            paths.append(prof_path)
+        return paths
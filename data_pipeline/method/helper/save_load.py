@@ -6,50 +6,36 @@ import gzip
 import json
 import shutil
 from pathlib import Path
-from typing import Any, Iterable
 
+from helper.agent_store import load_agents_columnar
 from helper.datetime_conversion import dt_to_str, str_to_dt
+from helper.delta_store import DELTA_PATTERN, DeltaStore
+from helper.instrumentation import get_metrics, timed_function
+from helper.interning import InternRegistry
+from helper.serialization import loads_row
+from helper.workspace import DEFAULT_WORKSPACE, Workspace
 
 """
-Save and load agents for simulation in JSON format
+Save and load agents for simulation
 - Save by timestamp and keep 5 newest files
 - Load the file with the newest timestamp
 
-Why JSON?
-- Easy to dump dictionary data
-- Little compatibility issues
-- Can convert to Parquet in the future
+Format: delta checkpoints (helper/delta_store.py)
+- run_ts=.../delta_<run_id>.npz -> static record hash + state columns of every agent
+- <root>/store -> static records (content-addressed, written once), shared by the checkpoints
+- Old checkpoints whose static records are not referenced anymore are dropped after retention
+- Older checkpoints still load: full columnar agent_*.npz (helper/agent_store.py) and
+  gzip JSON lines agent_*.jsonl.gz (Serialization.to_row)
+- Checkpoint folder: workspace.checkpoint_dir(mode) (helper/workspace.py), the model's
+  workspace unless one is given
 """
 
 KEEP_newest = 5  # how many checkpoint files to retain
-PATTERN = "agent_*.jsonl.gz"  # assumes “agents_YYYYMMDD_HHMMSS.parquet”
+PATTERN = "agent_*.npz"
+LEGACY_PATTERN = "agent_*.jsonl.gz"
+CHECKPOINT_PATTERNS = (DELTA_PATTERN, PATTERN, LEGACY_PATTERN)  # newest format first
 METADATA_PATTERN = "metadata.json"
 
-test_file = "./data_source/agm_agent_save_test"
-prod_file = "./data_source/agm_agent_save"
-
-
-def save_agent(root: Path, agents: Iterable[Any], run_id: str) -> Path:
-    """
-    Saving the agent states into the folder
-    """
-    print("Saving agents.......")
-    agent_file_path = root / f"agent_{run_id}.jsonl.gz"
-    agent_file_path.parent.mkdir(parents=True, exist_ok=True)
-
-    # Checking if there is saved files already
-    with gzip.open(agent_file_path, "wt", encoding="utf-8", compresslevel=5) as f:
-        for agent in agents:
-            row = agent.to_row()
-            if not isinstance(row, dict):
-                raise TypeError("agent.to_row() must return a dict")
-            json.dumps(
-                row
-            )  # will raise if not serializable            f.write(json.dumps(row, separators=(",", ":")) + "\n")
-            f.write(json.dumps(row, separators=(",", ":")) + "\n")
-
-    return agent_file_path
-
 
 def save_metadata(
     root: Path, run_id: str, finished_sim_date: dt.datetime, date_simulated: int
@@ -72,29 +58,31 @@ def save_metadata(
     return meta_file_path
 
 
+@timed_function("checkpoint.save_agents")
 def save_agents(
     model,
     keep_last: int = KEEP_newest,
     mode: str = "test",
+    workspace: Workspace | None = None,
 ):
     """ "
     Dump all agents to Parquet and enforce a file-retention policy.
     Returns the path of the newly written checkpoint.
     Input:
         - model -> simulation model instance
-        - root -> file_path to save the agent state
+        - workspace -> checkpoint location (default: model.workspace)
     """
 
-    if mode.lower() == "test":
-        root = Path(test_file)
-    else:
-        root = Path(prod_file)
+    workspace = workspace or getattr(model, "workspace", DEFAULT_WORKSPACE)
+    root = workspace.checkpoint_dir(mode)
 
     run_id = model.run_id
     ts = dt_to_str(dt.datetime.now(dt.timezone.utc))
     file_path = root / f"run_ts={ts}"
 
-    saved_agent_path = save_agent(
+    store = DeltaStore(root)
+    print("Saving agents.......")
+    saved_agent_path = store.save(
         file_path, agents=model.schedule.agents, run_id=run_id
     )
     metadata_path = save_metadata(
@@ -105,6 +93,8 @@ def save_agents(
     )
 
     print("Saving successful!")
+    get_metrics().incr("checkpoint.saved_agents", len(model.schedule.agents))
+    get_metrics().gauge("checkpoint.size_bytes", Path(saved_agent_path).stat().st_size)
 
     # Clean up old files (leave newest N)
     files = sorted(
@@ -115,14 +105,23 @@ def save_agents(
     for old in files[keep_last:]:
         shutil.rmtree(old, ignore_errors=True)
 
+    # Drop the static records only the removed checkpoints used
+    if files[keep_last:]:
+        removed = store.gc(
+            p for folder in files[:keep_last] for p in folder.glob(DELTA_PATTERN)
+        )
+        print(f"Agent store cleaned: {removed}")
+
     # Checking if there are <= 5 folders and there are 2 files in each folder
-    existing_folders = [f for f in root.iterdir() if f.is_dir()]
+    existing_folders = [f for f in root.glob("run_ts=*") if f.is_dir()]
     assert len(existing_folders) <= 5, print(
         f"There are more than 5 checkpoint folders at {len(existing_folders)} folders"
     )
 
     for folder in existing_folders:
-        agent_check = next(folder.glob(PATTERN), None)
+        agent_check = next(
+            (p for pattern in CHECKPOINT_PATTERNS for p in folder.glob(pattern)), None
+        )
         assert agent_check is not None, print(
             f"Agent checkpoint not found in {str(folder)}"
         )
@@ -134,19 +133,28 @@ def save_agents(
     return (saved_agent_path, metadata_path)
 
 
-def load_agents_from_newest(model, model_agent_classes, mode="test"):
+@timed_function("checkpoint.load_agents_from_newest")
+def load_agents_from_newest(
+    model,
+    model_agent_classes,
+    mode="test",
+    share_kdes=True,
+    workspace: Workspace | None = None,
+):
     """
-    Find the newest agents_*.jsonl.gz, rebuild every agent, and register them with model.schedule.
+    Find the newest checkpoint (delta_*.npz, or older agent_*.npz / agent_*.jsonl.gz),
+    rebuild every agent, and register them with model.register_agent.
+    Segment distributions and strings are interned (helper/interning.py).
+    KDEs are loaded lazily (built on first use). share_kdes: agents of a jsonl.gz
+    checkpoint with the same KDE payload share it (npz checkpoints always store them once).
     Start from the metadata date.
+    workspace -> checkpoint location (default: model.workspace)
     Returns the path that was loaded, or None.
     """
-    if mode.lower() == "test":
-        root = test_file
-    else:
-        root = prod_file
+    workspace = workspace or getattr(model, "workspace", DEFAULT_WORKSPACE)
 
     agent_ids = []
-    folder_path = Path(root)
+    folder_path = workspace.checkpoint_dir(mode)
 
     # Checking if folder is empty or not exists
     if not folder_path.exists():
@@ -177,27 +185,48 @@ def load_agents_from_newest(model, model_agent_classes, mode="test"):
         model.current_date = str_to_dt(newest_sim_date)
 
     print("Loading Agents...")
-    newest_agent_file = PATTERN.replace("*", str(newest_runid))
-    agent_folder_path = next(newest_run_folder.glob(newest_agent_file), None)
+    for pattern in CHECKPOINT_PATTERNS:
+        newest_agent_file = pattern.replace("*", str(newest_runid))
+        agent_folder_path = next(newest_run_folder.glob(newest_agent_file), None)
+        if agent_folder_path is not None:
+            break
     print(f"Loading {newest_agent_file} with {newest_metadata}...")
     if agent_folder_path is None:
         raise FileNotFoundError(
             f"No agent file found in {str(newest_run_folder)} with {newest_runid} id"
         )
 
-    with gzip.open(agent_folder_path, "rt", encoding="utf-8") as f:
-        for line in f:
-            rec = json.loads(line)
-            agent_type_str = rec.pop("type")
-            cls = model_agent_classes.get(agent_type_str)
-
-            if cls is None:
-                print("Class object is missing. Did you pass in the class_registry?")
+    if agent_folder_path.match(DELTA_PATTERN):
+        agents = DeltaStore(folder_path).load(agent_folder_path, model_agent_classes)
+    elif agent_folder_path.suffix == ".npz":
+        agents = load_agents_columnar(agent_folder_path, model_agent_classes)
+    else:
+        agents = []
+        with gzip.open(agent_folder_path, "rt", encoding="utf-8") as f:
+            for line in f:
+                rec = loads_row(line)
+                agent_type_str = rec.pop("type")
+                cls = model_agent_classes.get(agent_type_str)
+
+                if cls is None:
+                    print(
+                        "Class object is missing. Did you pass in the class_registry?"
+                    )
+
+                agents.append(cls.from_row(rec, share_kdes=share_kdes))
+
+    # One shared object per distinct segment distribution / string, as for fresh agents
+    registry = InternRegistry()
+    registry.intern_agents(agents)
+    print(
+        f"Interned {len(registry)} distributions ({registry.shared} duplicates shared)"
+    )
 
-            ag = cls.from_row(rec)
-            agent_ids.append(getattr(ag, "unique_id", None))
-            model.schedule.add(ag)
+    for ag in agents:
+        agent_ids.append(getattr(ag, "unique_id", None))
+        model.register_agent(ag)
 
     print("Agents loaded successfully!")
+    get_metrics().incr("checkpoint.loaded_agents", len(agent_ids))
 
     return newest_agent_file, agent_ids, newest_metadata
@@ -2,14 +2,30 @@
 from __future__ import annotations
 
 import datetime as dt
+import json
 from collections.abc import Mapping
-from typing import Any, ClassVar, Dict, List
+from typing import Any, Callable, ClassVar, Dict, List, NamedTuple
 
 import numpy as np
-from scipy.stats import gaussian_kde
+from helper.lazy_kde import lazy_kde
+
+try:
+    import orjson
+except ImportError:  # optional, stdlib json otherwise
+    orjson = None
 
 """
 Converting the classes into dictionaries
+- Each agent class declares the codec of its attributes in _field_types
+  (merged along the class hierarchy, compiled once per class):
+    - raw -> already JSON-native (numbers, str, None, dicts/lists of those), no conversion
+    - datetime -> ISO string
+    - tuple_lists -> {key: [(...), ...]} (purchase_history), tuples restored on load
+    - dated_tuples -> [(datetime, ...), ...] (pending_restock_orders)
+- Only declared datetime fields are parsed back. Undeclared attributes keep the generic
+  _coerce / uncoerce path (which tries every string as a datetime)
+- dumps_row / loads_row use orjson when it is installed
+- KDEs come back as LazyKDE (helper/lazy_kde.py): built on first use, identical payloads shared
 """
 
 
@@ -20,6 +36,10 @@ class Serialization:
 
     _kde_attrs: ClassVar[List[str]] = []  # override in subclass
     _dict_attrs: ClassVar[List[str]] = []
+    # attributes changing during a run (delta checkpoints write them every time)
+    _state_attrs: ClassVar[List[str]] = []
+    # attribute -> codec name (FIELD_CODECS), extended by the subclasses
+    _field_types: ClassVar[Dict[str, str]] = {"unique_id": "raw", "pos": "raw"}
 
     # any attribute you do *not* want to save verbatim
     _EXCLUDE = {"model"}
@@ -71,12 +91,16 @@ class Serialization:
         Converting an agent class into dictionary for parquet/json files
         """
         row: dict[str, Any] = {"type": self.__class__.__name__}
+        codec = compiled_codec(type(self))
+        encoders = codec.encoders
+        coerce = self._coerce
 
         # regular attributes
         for k, v in self.__dict__.items():
-            if k in self._EXCLUDE or k in self._kde_attrs:
+            if k in codec.skip:
                 continue
-            row[k] = self._coerce(v=v)
+            encode = encoders.get(k)
+            row[k] = coerce(v) if encode is None else encode(v)
 
         # flatten KDEs
         for attr in self._kde_attrs:
@@ -89,26 +113,27 @@ class Serialization:
         return row
 
     @classmethod
-    def from_row(cls, row: Dict[str, Any]) -> "Serialization":
+    def from_row(cls, row: Dict[str, Any], share_kdes: bool = True) -> "Serialization":
         """
         Loading the row into its respective classes using only plain dicts.
+        The agent is rebuilt without __init__ (its attributes come from the row).
+        Input:
+            - share_kdes -> agents with the same KDE payload share one LazyKDE
         """
         META = {"type"}
+        codec = compiled_codec(cls)
+        decoders = codec.decoders
+        uncoerce = cls.uncoerce
+
+        base: Dict[str, Any] = {}
+        for k, v in row.items():
+            if k in META or k.endswith("_data") or k.endswith("_bw"):
+                continue
+            decode = decoders.get(k)
+            base[k] = uncoerce(v) if decode is None else decode(v)
 
-        base: Dict[str, Any] = {
-            k: cls.uncoerce(v)
-            for k, v in row.items()
-            if not (k.endswith("_data") or k.endswith("_bw") or k in META)
-        }
-
-        # Construct the object
-        try:
-            obj = cls(**base)
-        except TypeError:
-            # fallback: recreate the agent instance
-            obj = cls.__new__(cls)
-            for k, v in base.items():
-                setattr(obj, k, v)
+        obj = cls.__new__(cls)
+        obj.__dict__.update(base)
 
         # Ensure dict-attributes are plain dicts
         for attr in getattr(cls, "_dict_attrs", []):
@@ -125,13 +150,89 @@ class Serialization:
                 # unexpected type — coerce to empty dict
                 setattr(obj, attr, {})
 
-        # Rebuild KDE attributes
+        # KDE attributes: raw payload, sampler built on first use
         for attr in getattr(cls, "_kde_attrs", []):
             data_key = f"{attr}_data"
             bw_key = f"{attr}_bw"
             if data_key in row and bw_key in row:
-                data = np.asarray(row[data_key], dtype=np.float64)
-                bw = row[bw_key]
-                setattr(obj, attr, gaussian_kde(data, bw_method=bw))
+                setattr(
+                    obj, attr, lazy_kde(row[data_key], row[bw_key], share=share_kdes)
+                )
 
         return obj
+
+
+# ---------- field codecs ----------
+def _identity(v):
+    return v
+
+
+def _encode_datetime(v):
+    return None if v is None else v.isoformat()
+
+
+def _decode_datetime(v):
+    return None if v is None else dt.datetime.fromisoformat(v)
+
+
+def _decode_tuple_lists(v):
+    return {k: [tuple(x) for x in items] for k, items in v.items()}
+
+
+def _encode_dated_tuples(v):
+    return [[d.isoformat(), *rest] for d, *rest in v]
+
+
+def _decode_dated_tuples(v):
+    return [(dt.datetime.fromisoformat(d), *rest) for d, *rest in v]
+
+
+FIELD_CODECS: Dict[str, tuple[Callable, Callable]] = {
+    "raw": (_identity, _identity),
+    "datetime": (_encode_datetime, _decode_datetime),
+    "tuple_lists": (_identity, _decode_tuple_lists),
+    "dated_tuples": (_encode_dated_tuples, _decode_dated_tuples),
+}
+
+
+class Codec(NamedTuple):
+    skip: frozenset  # never written as regular attributes (_EXCLUDE + KDEs)
+    encoders: Dict[str, Callable]
+    decoders: Dict[str, Callable]
+
+
+_CODECS: Dict[type, Codec] = {}
+
+
+def compiled_codec(cls) -> Codec:
+    """Encoders / decoders of the declared fields of cls (built on first use)"""
+    codec = _CODECS.get(cls)
+    if codec is None:
+        field_types: Dict[str, str] = {}
+        for klass in reversed(cls.__mro__):
+            field_types.update(vars(klass).get("_field_types", {}))
+        unknown = set(field_types.values()) - FIELD_CODECS.keys()
+        if unknown:
+            raise ValueError(f"{cls.__name__}: unknown field types {unknown}")
+
+        codec = _CODECS[cls] = Codec(
+            skip=frozenset(cls._EXCLUDE) | frozenset(cls._kde_attrs),
+            encoders={k: FIELD_CODECS[t][0] for k, t in field_types.items()},
+            decoders={k: FIELD_CODECS[t][1] for k, t in field_types.items()},
+        )
+    return codec
+
+
+# ---------- rows <-> JSON lines ----------
+def dumps_row(row: dict) -> str:
+    if orjson is not None:
+        return orjson.dumps(
+            row, option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+        ).decode("utf-8")
+    return json.dumps(row, separators=(",", ":"))
+
+
+def loads_row(line: str | bytes) -> dict:
+    if orjson is not None:
+        return orjson.loads(line)
+    return json.loads(line)
@@ -0,0 +1,51 @@
+import datetime as dt
+from collections import defaultdict
+
+"""
+Event-driven customer visits (WalmartModel(visit_scheduling="event"))
+- Each customer's next visit day is drawn ahead of time by the customer itself
+  (days_until_visit):
+    - Cust1 -> geometric gap with the daily chance of its step() coin flip
+    - Cust2 -> one draw per day: 0.8 on its most common days of the month, 0.3 otherwise
+- Customers wait in per-day buckets; a day only processes the customers due that day
+  (Customer.shop), who are then scheduled again
+- Removed / rescheduled customers are dropped lazily when their old bucket comes up
+- Not saved with the checkpoints: the draws are memoryless, resumed customers are
+  scheduled again when they are registered
+"""
+
+
+class VisitScheduler:
+    def __init__(self):
+        self._buckets = defaultdict(list)  # {date ordinal: [unique_id,...]}
+        self._next_visit = {}  # {unique_id: date ordinal}
+
+    def schedule(self, agent, after: dt.datetime) -> None:
+        """Draw the next visit of agent, strictly after the given day"""
+        days = agent.days_until_visit(after)
+        if days is None:
+            self._next_visit.pop(agent.unique_id, None)
+            return
+        day = after.toordinal() + days
+        self._next_visit[agent.unique_id] = day
+        self._buckets[day].append(agent.unique_id)
+
+    def unschedule(self, unique_id) -> None:
+        self._next_visit.pop(unique_id, None)
+
+    def due(self, date: dt.datetime) -> list:
+        """unique_ids visiting on date (removed from the schedule)"""
+        day = date.toordinal()
+        due = []
+        for unique_id in self._buckets.pop(day, []):
+            if self._next_visit.get(unique_id) == day:
+                del self._next_visit[unique_id]
+                due.append(unique_id)
+        return due
+
+    def next_visit(self, unique_id) -> dt.date | None:
+        day = self._next_visit.get(unique_id)
+        return None if day is None else dt.date.fromordinal(day)
+
+    def __len__(self):
+        return len(self._next_visit)
@@ -0,0 +1,92 @@
+from __future__ import annotations
+
+from dataclasses import dataclass, replace
+from pathlib import Path
+
+"""
+Absolute paths of a simulation (replaces os.chdir(ROOT) + "./data_source/..." paths)
+- The modules used to chdir to data_pipeline at import and open relative paths: the working
+  directory is process-wide, so two simulations could not run in one process (threads in the
+  backend, sweeps) without racing on it
+- A Workspace is passed to WalmartModel, which hands it to IdRegistry, the distribution
+  store and the save/load helpers; nothing depends on the working directory anymore
+- Fields:
+    - root -> data_pipeline folder (logs)
+    - data_source -> input files (Walmart_*.csv, category_*.npz, product_price_table.csv)
+      and the shared distribution store
+    - outputs -> CSV outputs (agm_output*) and agent checkpoints (agm_agent_save*)
+    - id_seeds -> folder of id_seeds*.json
+  data_source / outputs / id_seeds default to the data_pipeline layout
+- with_outputs(folder): same inputs, isolated outputs + id seeds (sweep scenarios, benchmarks)
+"""
+
+ROOT = Path(__file__).resolve().parent.parent.parent  # data_pipeline
+
+
+@dataclass(frozen=True)
+class Workspace:
+    root: Path = ROOT
+    data_source: Path | None = None
+    outputs: Path | None = None
+    id_seeds: Path | None = None
+
+    def __post_init__(self):
+        root = Path(self.root).resolve()
+        data_source = Path(self.data_source or root / "data_source").resolve()
+        defaults = {
+            "root": root,
+            "data_source": data_source,
+            "outputs": Path(self.outputs or data_source).resolve(),
+            "id_seeds": Path(self.id_seeds or root / "method" / "helper").resolve(),
+        }
+        for name, value in defaults.items():
+            object.__setattr__(self, name, value)
+
+    # Inputs
+    @property
+    def cust1_source(self) -> Path:
+        return self.data_source / "Walmart_cust.csv"
+
+    @property
+    def cust2_source(self) -> Path:
+        return self.data_source / "Walmart_commerce.csv"
+
+    @property
+    def product_source(self) -> Path:
+        return self.data_source / "category_kde_distributions.npz"
+
+    @property
+    def price_table(self) -> Path:
+        return self.data_source / "product_price_table.csv"
+
+    @property
+    def distribution_store(self) -> Path:
+        return self.data_source / "distribution_store"
+
+    # Outputs
+    @property
+    def logs(self) -> Path:
+        return self.root / "logs"
+
+    def output_dir(self, mode: str) -> Path:
+        """CSV outputs (write_results_csv)"""
+        name = "agm_output_test" if mode.lower() == "test" else "agm_output"
+        return self.outputs / name
+
+    def checkpoint_dir(self, mode: str) -> Path:
+        """Agent checkpoints (helper/save_load.py)"""
+        name = "agm_agent_save_test" if mode.lower() == "test" else "agm_agent_save"
+        return self.outputs / name
+
+    def id_seed_file(self, mode: str) -> Path:
+        """IdRegistry counters"""
+        name = "id_seeds_test.json" if mode.lower() == "test" else "id_seeds.json"
+        return self.id_seeds / name
+
+    def with_outputs(self, folder: str | Path) -> Workspace:
+        """Same inputs, outputs and id seeds under folder"""
+        folder = Path(folder)
+        return replace(self, outputs=folder, id_seeds=folder)
+
+
+DEFAULT_WORKSPACE = Workspace()
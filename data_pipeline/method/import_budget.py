@@ -0,0 +1,136 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+"""
+Import-time budget check (gunicorn worker boot, CLI startup)
+- Each module is imported in a fresh interpreter with python -X importtime; the cumulative
+  time of the module (best of --repeat runs) has to stay under its budget
+- Heavy dependencies only used for fitting / plotting / fuzzy matching must not be loaded
+  by a plain import (the forbidden list): machine independent, the timings are not
+  (--scale multiplies every budget on slow machines)
+- api.views is imported after django.setup() (the time of the setup itself is not counted)
+
+Usage (from ./data_pipeline):
+    python method/import_budget.py
+    python method/import_budget.py --repeat 5 --scale 2
+Exit code 1 when a check fails
+"""
+
+ROOT = Path(__file__).resolve().parent.parent
+METHOD_DIR = ROOT / "method"
+BACKEND_DIR = ROOT.parent / "backend"
+FITTING_ONLY = ["sklearn", "matplotlib", "fuzzywuzzy", "scipy.stats"]
+
+# (module, budget in seconds, forbidden modules, working directory, setup code)
+CHECKS = [
+    ("helper.save_load", 1.0, FITTING_ONLY + ["pandas", "mesa"], METHOD_DIR, ""),
+    ("data_processor", 3.5, FITTING_ONLY, METHOD_DIR, ""),
+    ("product_price_table", 3.5, FITTING_ONLY, METHOD_DIR, ""),
+    ("ABM_modeling", 5.0, FITTING_ONLY, METHOD_DIR, ""),
+    ("walmart_model", 5.0, FITTING_ONLY, METHOD_DIR, ""),
+    (
+        "api.views",
+        3.0,
+        FITTING_ONLY + ["walmart_model", "mesa", "pandas"],
+        BACKEND_DIR,
+        "import django\ndjango.setup()\n",
+    ),
+]
+
+
+def measure_import(module, forbidden, cwd, setup="") -> tuple[float, list[str]]:
+    """
+    Output: (cumulative import time of module in seconds, forbidden modules it loaded)
+    """
+    code = (
+        "import json, sys\n"
+        + setup
+        + f"import {module}\n"
+        + f"print(json.dumps([m for m in {forbidden!r} if m in sys.modules]))\n"
+    )
+    env = {
+        **os.environ,
+        "PYTHONPATH": os.pathsep.join([str(cwd), str(METHOD_DIR)]),
+        "DJANGO_SETTINGS_MODULE": "rest_api.settings",
+    }
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=cwd,
+        env=env,
+        capture_output=True,
+        text=True,
+    )
+    if proc.returncode != 0:
+        error = proc.stderr.strip().splitlines()[-1] if proc.stderr.strip() else ""
+        raise RuntimeError(error)
+
+    cumulative = None
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        _, cumul, name = line[len("import time:") :].split("|")
+        if name.strip() == module:
+            cumulative = int(cumul) / 1e6
+    if cumulative is None:  # already imported by the setup code
+        cumulative = 0.0
+    return cumulative, json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def run_checks(repeat: int = 3, scale: float = 1.0, only: list[str] | None = None):
+    """
+    Output: [{"module", "seconds", "budget", "loaded", "status"}]
+    """
+    results = []
+    for module, budget, forbidden, cwd, setup in CHECKS:
+        if only and module not in only:
+            continue
+        row = {"module": module, "budget": budget * scale}
+        try:
+            runs = [measure_import(module, forbidden, cwd, setup) for _ in range(repeat)]
+        except RuntimeError as e:
+            row.update({"seconds": None, "loaded": [], "status": f"error ({e})"})
+            results.append(row)
+            continue
+        row["seconds"] = min(seconds for seconds, _ in runs)
+        row["loaded"] = sorted({m for _, loaded in runs for m in loaded})
+        if row["loaded"]:
+            row["status"] = "FAIL heavy imports"
+        elif row["seconds"] > row["budget"]:
+            row["status"] = "FAIL over budget"
+        else:
+            row["status"] = "ok"
+        results.append(row)
+    return results
+
+
+def print_results(results):
+    print(f"{'module':<22} {'import':>9} {'budget':>8}  status")
+    for row in results:
+        seconds = f"{row['seconds']:.3f}s" if row["seconds"] is not None else "-"
+        loaded = f" {', '.join(row['loaded'])}" if row["loaded"] else ""
+        print(
+            f"{row['module']:<22} {seconds:>9} {row['budget']:>7.2f}s  {row['status']}{loaded}"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check module import times")
+    parser.add_argument("--repeat", type=int, default=3, help="Best of n imports")
+    parser.add_argument(
+        "--scale", type=float, default=1.0, help="Budget multiplier (slow machines)"
+    )
+    parser.add_argument("--only", nargs="+", help="Modules to check")
+    args = parser.parse_args()
+
+    results = run_checks(args.repeat, args.scale, args.only)
+    print_results(results)
+    if any(row["status"] != "ok" for row in results):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -3,8 +3,6 @@ from pathlib import Path
 
 import numpy as np
 import pandas as pd
-from fuzzywuzzy import process
-from scipy.stats import gaussian_kde, norm
 
 """
 This code creates a product price table by:
@@ -40,6 +38,9 @@ Solutions
 - Create random quantity between 1 and 100 for products data (Remove too many categories)
 - Getting the average quantity, quantity std from the average of the category (Done)
 - Use fuzzy matching to map raw categories to product_taxonomy (Done)
+
+fuzzywuzzy and scipy are imported inside the functions using them (cheap module import for
+walmart_model / the backend)
 """
 
 
@@ -114,6 +115,8 @@ def get_category_id(x, category_to_id):
     """
     Use fuzzy string matching to map product lines to category IDs
     """
+    from fuzzywuzzy import process
+
     if not x:
         return None
     match = process.extractOne(x, category_to_id.keys())
@@ -300,6 +303,8 @@ def load_distributions_from_file(npz_path: str | Path) -> dict:
             "quantity_data": np.ndarray
         }
     """
+    from scipy.stats import gaussian_kde, norm
+
     npz_file = Path(npz_path)
     if not npz_file.exists():
         raise FileNotFoundError(f"No file found at {npz_file}")
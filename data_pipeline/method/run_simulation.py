@@ -1,17 +1,22 @@
 import argparse
 import datetime as dt
-import os
-from pathlib import Path
 
 import numpy as np
 from helper.datetime_conversion import str_to_dt
+from helper.logging_setup import setup_logging
+from helper.profiler import NullProfiler, PhaseProfiler
 from helper.save_load import load_agents_from_newest, save_agents
+from helper.workspace import DEFAULT_WORKSPACE, Workspace
 from walmart_model import WalmartModel
 
 """
 Run the simulation
 - Input: days, number of customers, number of products
 - Output: csv files in data_source/agm_output
+- --visit-scheduling: event (default, only the customers visiting each day shop)
+  or daily (every customer steps every day)
+- --profile: per-phase time of every step + load/output phases
+  (id=<run_id>_profile.json next to the outputs, --profile-stacks adds a cProfile .prof)
 
 Edge cases considerations:
 - Run daily
@@ -23,11 +28,6 @@ old_settings = np.seterr(divide="ignore", invalid="ignore")
 # np.seterr(**old_settings) -- to restore original warnings
 
 
-# Always execute at data_pipeline directory
-ROOT = Path(__file__).resolve().parent.parent
-os.chdir(ROOT)
-
-
 def valid_yyyymmdd(date_str):
     """
     Setting the datetime type for user input
@@ -48,6 +48,10 @@ def run_simulation(
     start_date: str = "Empty",
     products_num: int = 10,
     mode: str = "prod",
+    profile: bool = False,
+    profile_stacks: bool = False,
+    visit_scheduling: str = "event",
+    workspace: Workspace | None = None,
 ):
     """
     Input:
@@ -56,24 +60,28 @@ def run_simulation(
         - cust1_2_ratio -> fraction of cust1 vs cust2
         - start_date -> date in YYYYMMDD format
         - products_num -> number of product per categories (default 12 categories)
+        - profile -> record the time per phase (helper/profiler.py)
+        - profile_stacks -> also capture cProfile call stacks (implies profile)
+        - visit_scheduling -> "event" or "daily" (WalmartModel)
+        - workspace -> paths of the run (default: the data_pipeline folders)
     """
 
     print("Initializing Walmart simulation...")
     start = dt.datetime.now()
 
+    workspace = workspace or DEFAULT_WORKSPACE
     run_mode = mode.lower()
     if run_mode == "test":
         print("---- Test Mode ----")
-        transaction_folder = Path("./data_source/agm_output_test")
     elif run_mode == "prod":
         print("---- Production Mode ----")
-        transaction_folder = Path("./data_source/agm_output")
     else:
         return "Invalid mode"
+    transaction_folder = workspace.output_dir(run_mode)
 
     # Setting the start date: if first run, now or start_date input | second+ run, latest simulated date
     if not transaction_folder.exists() or not any(transaction_folder.iterdir()):
-        Path.mkdir(transaction_folder, parents=True, exist_ok=True)
+        transaction_folder.mkdir(parents=True, exist_ok=True)
         if start_date != "Empty":
             print(f"Starting from {start_date}")
             latest_date = str_to_dt(start_date)
@@ -96,12 +104,22 @@ def run_simulation(
         n_customers2=cust2_n,
         n_products_per_category=int(products_num),
         mode=run_mode,
+        visit_scheduling=visit_scheduling,
+        workspace=workspace,
     )
-    #
-    # Loading past agent state
-    loaded_file, loaded_id_dict, metadata = load_agents_from_newest(
-        model, model.class_registry, mode=run_mode
+    profiler = (
+        PhaseProfiler(stacks=profile_stacks)
+        if profile or profile_stacks
+        else NullProfiler()
     )
+    model.profiler = profiler
+    profiler.start()
+
+    # Loading past agent state
+    with profiler.phase("load_agents"):
+        loaded_file, loaded_id_dict, metadata = load_agents_from_newest(
+            model, model.class_registry, mode=run_mode
+        )
     if loaded_file and loaded_id_dict and metadata:
         print(f"Agents loaded {len(loaded_id_dict)} with max id: {max(loaded_id_dict)}")
         print(f"Metadata: {metadata}")
@@ -110,7 +128,8 @@ def run_simulation(
 
     # Run the simulation
     print("Running simulation...")
-    model.initialize_extra_agents()
+    with profiler.phase("initialize_extra_agents"):
+        model.initialize_extra_agents()
     model.run_model()
 
     # Print summary
@@ -144,16 +163,25 @@ def run_simulation(
     )
 
     # Saving the agent state and result
-    df_result_dict = model.save_results_as_df()
-    final_paths, run_id = model.write_results_csv(df_result_dict)
+    with profiler.phase("save_results_as_df"):
+        df_result_dict = model.save_results_as_df()
+    with profiler.phase("write_results_csv"):
+        final_paths, run_id = model.write_results_csv(df_result_dict)
     for f in final_paths:
         assert f.exists(), print(f"Cannot find file {f}")
 
-    saved_file, metadata = save_agents(model=model, keep_last=5, mode=run_mode)
+    with profiler.phase("save_agents"):
+        saved_file, metadata = save_agents(model=model, keep_last=5, mode=run_mode)
     assert saved_file.exists() & metadata.exists(), print(
         "Can't find recently saved file"
     )
 
+    profiler.stop()
+    if profiler.enabled:
+        profiler.print_report()
+        for path in profiler.write(final_paths[0].parent, run_id):
+            print(f"Profile saved to {path}")
+
     return run_id, duration_units
 
 
@@ -168,8 +196,25 @@ def main():
     parser.add_argument("customer_ratio", type=float)
     parser.add_argument("product_num", type=int)
     parser.add_argument("run_mode", type=str)
+    parser.add_argument(
+        "--visit-scheduling",
+        choices=["event", "daily"],
+        default="event",
+        help="event: only customers visiting that day shop | daily: every customer steps",
+    )
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        help="Time each simulation phase and save id=<run_id>_profile.json with the outputs",
+    )
+    parser.add_argument(
+        "--profile-stacks",
+        action="store_true",
+        help="Also capture cProfile call stacks (id=<run_id>_profile.prof)",
+    )
 
     args = parser.parse_args()
+    setup_logging()
     run_simulation(
         start_date=args.start_date,
         days=args.days,
@@ -177,6 +222,9 @@ def main():
         cust1_2_ratio=args.customer_ratio,
         products_num=args.product_num,
         mode=args.run_mode,
+        profile=args.profile,
+        profile_stacks=args.profile_stacks,
+        visit_scheduling=args.visit_scheduling,
     )
 
 
@@ -0,0 +1,233 @@
+import argparse
+import contextlib
+import datetime as dt
+import itertools
+import json
+import multiprocessing as mp
+import os
+import random
+import time
+import traceback
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from helper.datetime_conversion import str_to_dt
+from helper.logging_setup import setup_logging
+from helper.workspace import DEFAULT_WORKSPACE, Workspace
+from walmart_model import (WalmartModel, product_distributions,
+                           segment_distributions)
+
+"""
+Parameter sweep: many WalmartModel scenarios over a process pool
+- Grid: every combination of the given values (JSON file and/or -p name=v1,v2,...)
+  Parameters (default): days (7), total_customers (1000), cust1_ratio (0.5),
+  products_per_category (5), cust1_visit_prob (0.10), visit_scheduling (event), seed
+- The distributions are fitted once in the parent; the fork workers inherit them
+  copy-on-write (walmart_model.segment_distributions / product_distributions)
+- Each scenario is isolated:
+    - its own folder <output>/scenario=<i>/ (Workspace.with_outputs: outputs, id seeds,
+      sim.log with the simulation prints), inputs read from the shared data_source
+    - its own id range (IdRegistry offset = i * ID_STRIDE), inside the warehouse INTEGER
+      ids: at most MAX_SCENARIOS scenarios per sweep
+    - fresh agents (no checkpoint load / save)
+- summary.csv: one row per scenario (parameters + totals from the model metrics)
+
+Usage:
+    python method/sweep.py -p total_customers=1000,5000 -p cust1_ratio=0,0.5 --workers 4
+    python method/sweep.py --grid sweep_grid.json --start-date 20240101
+"""
+
+DEFAULTS = {
+    "days": 7,
+    "total_customers": 1000,
+    "cust1_ratio": 0.5,
+    "products_per_category": 5,
+    "cust1_visit_prob": 0.10,
+    "visit_scheduling": "event",
+    "seed": None,  # None -> base seed + scenario index
+}
+ID_STRIDE = 10**8
+MAX_ID = 2**31 - 1  # Postgres INTEGER (customer / product / transaction ids)
+MAX_SCENARIOS = (MAX_ID + 1) // ID_STRIDE
+SWEEP_FOLDER = DEFAULT_WORKSPACE.data_source / "agm_sweeps"
+
+
+def parse_value(text: str):
+    """'10' -> 10, '0.5' -> 0.5, 'event' -> 'event'"""
+    try:
+        return json.loads(text)
+    except json.JSONDecodeError:
+        return text
+
+
+def build_grid(grid_file: Path | None, params: list[str]) -> list[dict]:
+    """Every combination of the grid values, completed with DEFAULTS"""
+    grid = {}
+    if grid_file:
+        with open(grid_file, "r", encoding="utf-8") as f:
+            grid.update(json.load(f))
+    for param in params:
+        name, _, values = param.partition("=")
+        grid[name.strip()] = [parse_value(v) for v in values.split(",")]
+
+    unknown = set(grid) - set(DEFAULTS)
+    if unknown:
+        raise ValueError(f"Unknown sweep parameters: {sorted(unknown)}")
+
+    names = list(grid)
+    return [
+        {**DEFAULTS, **dict(zip(names, values))}
+        for values in itertools.product(*(grid[n] for n in names))
+    ]
+
+
+def preload_distributions(need_cust1: bool, workspace: Workspace = DEFAULT_WORKSPACE):
+    """Fit / load every distribution in the parent, before the workers fork"""
+    segment_distributions(workspace.cust2_source, workspace)
+    if need_cust1:
+        segment_distributions(workspace.cust1_source, workspace)
+    product_distributions(workspace)
+
+
+def run_scenario(task: tuple) -> dict:
+    """
+    Input: (index, scenario parameters, sweep folder, start date, base seed)
+    Output: summary row
+    """
+    index, scenario, sweep_folder, start_date, base_seed = task
+    folder = Path(sweep_folder) / f"scenario={index}"
+    folder.mkdir(parents=True, exist_ok=True)
+    seed = scenario["seed"] if scenario["seed"] is not None else base_seed + index
+    random.seed(seed)
+    np.random.seed(seed)
+
+    row = {"scenario": index, **scenario, "seed": seed, "folder": str(folder)}
+    start = time.perf_counter()
+    try:
+        with (
+            open(folder / "sim.log", "w", encoding="utf-8") as log,
+            contextlib.redirect_stdout(log),
+        ):
+            cust1_n = int(scenario["total_customers"] * scenario["cust1_ratio"])
+            model = WalmartModel(
+                start_date=start_date,
+                max_steps=int(scenario["days"]),
+                n_customers1=cust1_n,
+                n_customers2=int(scenario["total_customers"]) - cust1_n,
+                n_products_per_category=int(scenario["products_per_category"]),
+                mode="test",
+                visit_scheduling=scenario["visit_scheduling"],
+                cust1_visit_prob=float(scenario["cust1_visit_prob"]),
+                id_offset=index * ID_STRIDE,
+                workspace=DEFAULT_WORKSPACE.with_outputs(folder),
+            )
+            model.initialize_extra_agents()
+            model.run_model()
+            results = model.save_results_as_df()
+            model.write_results_csv(results)
+
+        metrics = results["metrics"]
+        row.update(
+            {
+                "status": "ok",
+                "run_id": model.run_id,
+                "transactions": len(results["transactions"]),
+                "total_cust1_sales": float(metrics["Total_Cust1_Sales"].sum()),
+                "total_cust2_sales": float(metrics["Total_Cust2_Sales"].sum()),
+                "avg_daily_purchase": float(metrics["Total_Daily_Purchase"].mean()),
+                "avg_stockout": float(metrics["Stockout"].mean()),
+                "total_products": int(metrics["Total_products"].iloc[-1]),
+            }
+        )
+    except Exception as e:
+        row.update({"status": "failed", "error": f"{type(e).__name__}: {e}"})
+        (folder / "error.log").write_text(traceback.format_exc())
+    row["seconds"] = round(time.perf_counter() - start, 3)
+    return row
+
+
+def run_sweep(
+    scenarios: list[dict],
+    start_date: dt.datetime,
+    workers: int | None = None,
+    output: Path | None = None,
+    base_seed: int = 42,
+) -> Path:
+    """
+    Run every scenario (fork pool) and write summary.csv.
+    Output: path of the summary
+    """
+    if len(scenarios) > MAX_SCENARIOS:
+        raise ValueError(
+            f"{len(scenarios)} scenarios: the id ranges of a sweep fit {MAX_SCENARIOS} "
+            f"scenarios ({ID_STRIDE} ids each, up to {MAX_ID}), use a smaller grid"
+        )
+
+    sweep_folder = (
+        Path(output)
+        if output
+        else SWEEP_FOLDER / dt.datetime.now().strftime("sweep=%Y%m%d_%H%M%S")
+    )
+    sweep_folder = sweep_folder.resolve()
+    sweep_folder.mkdir(parents=True, exist_ok=True)
+    with open(sweep_folder / "scenarios.json", "w", encoding="utf-8") as f:
+        json.dump(scenarios, f, indent=2)
+
+    print(f"Fitting distributions once for {len(scenarios)} scenarios...")
+    preload_distributions(any(s["cust1_ratio"] > 0 for s in scenarios))
+
+    tasks = [
+        (i, scenario, str(sweep_folder), start_date, base_seed)
+        for i, scenario in enumerate(scenarios)
+    ]
+    workers = min(workers or os.cpu_count() or 1, len(tasks))
+    print(f"Running on {workers} workers...")
+    rows = []
+    with mp.get_context("fork").Pool(processes=workers) as pool:
+        for row in pool.imap_unordered(run_scenario, tasks):
+            print(
+                f"Scenario {row['scenario']}: {row['status']} in {row['seconds']}s"
+                + (f" ({row['error']})" if row["status"] != "ok" else "")
+            )
+            rows.append(row)
+
+    summary_path = sweep_folder / "summary.csv"
+    pd.DataFrame(sorted(rows, key=lambda r: r["scenario"])).to_csv(
+        summary_path, index=False
+    )
+    return summary_path
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Run a grid of simulation scenarios in parallel"
+    )
+    parser.add_argument("--grid", type=Path, help="JSON file {parameter: [values]}")
+    parser.add_argument(
+        "-p",
+        "--param",
+        action="append",
+        default=[],
+        help="name=v1,v2,... (repeatable), e.g. -p total_customers=1000,5000",
+    )
+    parser.add_argument("--start-date", type=str, default="20240101")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--seed", type=int, default=42, help="Base seed")
+    parser.add_argument("--output", type=Path, default=None)
+    args = parser.parse_args()
+    setup_logging()
+
+    scenarios = build_grid(args.grid, args.param)
+    summary = run_sweep(
+        scenarios,
+        start_date=str_to_dt(args.start_date),
+        workers=args.workers,
+        output=args.output,
+        base_seed=args.seed,
+    )
+    print(f"\nSummary saved to {summary}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,12 @@
+import sys
+from pathlib import Path
+
+"""
+Tests for the simulation modules (python -m pytest data_pipeline/method/tests)
+- The modules import each other from ./data_pipeline/method (helper.*, walmart_model...),
+  like the entry points run from that folder
+"""
+
+METHOD_DIR = Path(__file__).resolve().parent.parent
+if str(METHOD_DIR) not in sys.path:
+    sys.path.insert(0, str(METHOD_DIR))
@@ -0,0 +1,138 @@
+import os
+
+import pytest
+from helper.delta_store import DeltaStore
+
+
+class Shopper:
+    _state_attrs = ("budget", "basket")
+    _dict_attrs = ("segment_dist",)
+
+    def __init__(self, unique_id, segment, budget):
+        self.unique_id = unique_id
+        self.segment = segment
+        self.segment_dist = {"low": 0.2, "high": 0.8}
+        self.budget = budget
+        self.basket = [unique_id, unique_id * 2]
+
+
+class Store:
+    _state_attrs = ("stock",)
+
+    def __init__(self, unique_id, stock):
+        self.unique_id = unique_id
+        self.city = "Austin"
+        self.stock = stock
+
+
+REGISTRY = {"Shopper": Shopper, "Store": Store}
+
+
+def make_agents(segment="a", budget=100.0):
+    shoppers = [Shopper(i, f"{segment}{i % 3}", budget + i) for i in range(1, 11)]
+    return shoppers + [Store(100, 42)]
+
+
+def checkpoint(store, root, name, agents):
+    return store.save(root / f"run_ts={name}", agents, run_id=name)
+
+
+def packs(store):
+    return sorted(p.name for p in store.packs.glob("pack_*.npz"))
+
+
+def assert_same_agents(loaded, agents):
+    assert [type(a) for a in loaded] == [type(a) for a in agents]
+    assert [a.__dict__ for a in loaded] == [a.__dict__ for a in agents]
+
+
+def backdate(paths, seconds=10):
+    for path in paths:
+        st = path.stat()
+        os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns - seconds * 10**9))
+
+
+def test_save_gc_load_round_trip(tmp_path):
+    store = DeltaStore(tmp_path)
+    first = make_agents()
+    first_path = checkpoint(store, tmp_path, "1", first)
+    assert len(packs(store)) == 1
+
+    # Only the state changed: no new static record, no new pack
+    same_static = make_agents(budget=5.0)
+    second_path = checkpoint(store, tmp_path, "2", same_static)
+    assert len(packs(store)) == 1
+
+    # Every shopper's static part changed: the first pack is only used by the first
+    # checkpoint (and the store), so it survives as long as that checkpoint is kept
+    changed = make_agents(segment="b")
+    third_path = checkpoint(store, tmp_path, "3", changed)
+    assert len(packs(store)) == 2
+    assert store.gc([first_path, second_path, third_path]) == {
+        "deleted": 0,
+        "compacted": 0,
+    }
+
+    assert_same_agents(store.load(first_path, REGISTRY), first)
+    assert_same_agents(store.load(second_path, REGISTRY), same_static)
+
+    # Retention dropped the first two: only the Store record of the first pack is live
+    assert store.gc([third_path]) == {"deleted": 0, "compacted": 1}
+    assert len(packs(store)) == 2
+    assert_same_agents(store.load(third_path, REGISTRY), changed)
+
+    # Nothing references the compacted pack anymore after a full churn
+    fourth = [Shopper(i, "c", 1.0) for i in range(1, 4)]
+    fourth_path = checkpoint(store, tmp_path, "4", fourth)
+    assert store.gc([fourth_path]) == {"deleted": 2, "compacted": 0}
+    assert len(packs(store)) == 1
+    assert_same_agents(store.load(fourth_path, REGISTRY), fourth)
+
+
+def test_load_missing_class_raises(tmp_path):
+    store = DeltaStore(tmp_path)
+    path = checkpoint(store, tmp_path, "1", make_agents())
+
+    with pytest.raises(KeyError, match="Store"):
+        store.load(path, {"Shopper": Shopper})
+
+
+def test_gc_with_stale_retained_list_keeps_newer_packs(tmp_path):
+    store = DeltaStore(tmp_path)
+    old_agents = make_agents()
+    old_path = checkpoint(store, tmp_path, "1", old_agents)
+    backdate([old_path, *store.packs.glob("pack_*.npz")])
+    retained = [old_path]  # listed by save_agents before the next save finished
+
+    new_agents = make_agents(segment="b")
+    new_path = checkpoint(store, tmp_path, "2", new_agents)
+    assert len(packs(store)) == 2
+
+    # The new checkpoint is not in the list, but its pack is newer than it: skipped
+    assert store.gc(retained) == {"deleted": 0, "compacted": 0}
+    assert len(packs(store)) == 2
+    assert_same_agents(store.load(new_path, REGISTRY), new_agents)
+    assert_same_agents(store.load(old_path, REGISTRY), old_agents)
+
+
+def test_failed_compaction_keeps_the_old_pack(tmp_path, monkeypatch):
+    store = DeltaStore(tmp_path)
+    checkpoint(store, tmp_path, "1", make_agents())
+    new_agents = make_agents(segment="b")
+    kept_path = checkpoint(store, tmp_path, "2", new_agents)
+    before = packs(store)
+
+    def write_pack(self, records_by_class):
+        raise OSError("No space left on device")
+
+    with monkeypatch.context() as m:
+        m.setattr(DeltaStore, "write_pack", write_pack)
+        with pytest.raises(OSError):
+            store.gc([kept_path])
+
+    # The Store record still lives in the pack gc was compacting
+    assert packs(store) == before
+    assert_same_agents(store.load(kept_path, REGISTRY), new_agents)
+
+    assert store.gc([kept_path]) == {"deleted": 0, "compacted": 1}
+    assert_same_agents(store.load(kept_path, REGISTRY), new_agents)
@@ -0,0 +1,60 @@
+import random
+
+import pytest
+from helper.metrics_summary import (downsample, downsample_lttb,
+                                    downsample_minmax)
+
+
+def make_records(n, seed=0):
+    rng = random.Random(seed)
+    return [
+        {"step": i + 1, "total_daily_purchases": rng.randint(0, 500)} for i in range(n)
+    ]
+
+
+@pytest.mark.parametrize("n, max_points", [(1000, 100), (101, 10), (50, 3), (7, 6)])
+def test_lttb_length_endpoints_and_order(n, max_points):
+    records = make_records(n)
+    sampled = downsample_lttb(records, max_points)
+
+    assert len(sampled) == max_points
+    assert sampled[0] is records[0]
+    assert sampled[-1] is records[-1]
+    steps = [r["step"] for r in sampled]
+    assert steps == sorted(set(steps))  # strictly increasing, no duplicates
+
+
+def test_lttb_keeps_spikes():
+    records = make_records(1000)
+    for r in records:
+        r["total_daily_purchases"] = 10
+    records[437]["total_daily_purchases"] = 10_000
+
+    assert records[437] in downsample_lttb(records, 50)
+
+
+@pytest.mark.parametrize("max_points", [1000, 2000, 2])
+def test_lttb_returns_input_when_nothing_to_drop(max_points):
+    records = make_records(1000)
+    assert downsample_lttb(records, max_points) is records
+
+
+def test_minmax_keeps_bucket_extremes_in_order():
+    records = make_records(1000)
+    sampled = downsample_minmax(records, 100)
+
+    assert len(sampled) <= 100
+    steps = [r["step"] for r in sampled]
+    assert steps == sorted(steps)
+    overall = max(records, key=lambda r: r["total_daily_purchases"])
+    assert overall["total_daily_purchases"] == max(
+        r["total_daily_purchases"] for r in sampled
+    )
+
+
+def test_downsample_dispatch():
+    records = make_records(500)
+    assert downsample(records, 40, "lttb") == downsample_lttb(records, 40)
+    assert downsample(records, 40, "minmax") == downsample_minmax(records, 40)
+    with pytest.raises(ValueError):
+        downsample(records, 40, "mean")
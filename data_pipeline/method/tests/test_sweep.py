@@ -0,0 +1,26 @@
+import pytest
+import sweep
+from sweep import ID_STRIDE, MAX_ID, MAX_SCENARIOS, build_grid, run_sweep
+
+
+def test_grid_combines_values_with_defaults():
+    scenarios = build_grid(None, ["total_customers=100,200", "cust1_ratio=0,0.5"])
+
+    assert len(scenarios) == 4
+    assert {s["total_customers"] for s in scenarios} == {100, 200}
+    assert all(s["days"] == sweep.DEFAULTS["days"] for s in scenarios)
+
+
+def test_every_scenario_id_range_fits_an_integer_column():
+    assert MAX_SCENARIOS * ID_STRIDE - 1 <= MAX_ID
+    assert (MAX_SCENARIOS + 1) * ID_STRIDE - 1 > MAX_ID
+
+
+def test_run_sweep_rejects_grids_past_the_id_space(tmp_path):
+    scenarios = build_grid(
+        None, [f"seed={','.join(map(str, range(MAX_SCENARIOS + 1)))}"]
+    )
+
+    with pytest.raises(ValueError, match="scenarios"):
+        run_sweep(scenarios, start_date=None, output=tmp_path / "sweep")
+    assert not (tmp_path / "sweep").exists()
@@ -0,0 +1,85 @@
+import datetime as dt
+import random
+
+import ABM_modeling
+import numpy as np
+import pytest
+from ABM_modeling import Cust1, Cust2
+from helper.visit_scheduler import VisitScheduler
+
+START = dt.datetime(2025, 1, 10)
+
+
+class Customer:
+    def __init__(self, unique_id, *gaps):
+        self.unique_id = unique_id
+        self.gaps = list(gaps)
+
+    def days_until_visit(self, date):
+        return self.gaps.pop(0)
+
+
+def day(offset):
+    return START + dt.timedelta(days=offset)
+
+
+def test_due_returns_only_customers_due_that_day():
+    visits = VisitScheduler()
+    for agent in (Customer(1, 1), Customer(2, 3), Customer(3, 1)):
+        visits.schedule(agent, START)
+
+    assert visits.due(day(1)) == [1, 3]
+    assert visits.due(day(1)) == []
+    assert visits.due(day(2)) == []
+    assert visits.next_visit(2) == day(3).date()
+    assert visits.due(day(3)) == [2]
+    assert len(visits) == 0
+
+
+def test_due_drops_rescheduled_and_unscheduled_customers():
+    visits = VisitScheduler()
+    rescheduled = Customer(1, 1, 4)
+    removed = Customer(2, 1)
+    never_again = Customer(3, 1, None)
+    for agent in (rescheduled, removed, never_again, Customer(4, 1)):
+        visits.schedule(agent, START)
+
+    visits.schedule(rescheduled, START)
+    visits.unschedule(removed.unique_id)
+    visits.schedule(never_again, START)
+
+    assert visits.due(day(1)) == [4]
+    assert visits.next_visit(removed.unique_id) is None
+    assert visits.next_visit(never_again.unique_id) is None
+    assert visits.due(day(4)) == [1]
+    assert len(visits) == 0
+
+
+@pytest.mark.parametrize("visit_prob", [0.05, 0.3, 0.9])
+def test_cust1_geometric_gap_matches_visit_probability(visit_prob):
+    customer = Cust1.__new__(Cust1)
+    customer.visit_prob = visit_prob
+    p = customer.visit_probability()
+
+    # The coin flip of Cust1.step()
+    rng = random.Random(0)
+    flips = [not rng.randint(0, 100) > visit_prob * 100 for _ in range(50_000)]
+    assert np.mean(flips) == pytest.approx(p, abs=0.01)
+
+    np.random.seed(0)
+    gaps = np.array([customer.days_until_visit(START) for _ in range(50_000)])
+    assert gaps.min() >= 1
+    assert np.mean(gaps == 1) == pytest.approx(p, abs=0.01)
+    assert gaps.mean() == pytest.approx(1 / p, rel=0.05)
+
+
+def test_cust2_visits_on_its_most_common_days(monkeypatch):
+    customer = Cust2.__new__(Cust2)
+    customer.date = {"15": 12, "20": 3}
+    # Between the two chances: visits on a common day only
+    monkeypatch.setattr(ABM_modeling.random, "random", lambda: 0.5)
+
+    assert customer.visit_probability(day(5)) == 0.8
+    assert customer.visit_probability(day(1)) == 0.3
+    assert customer.days_until_visit(START) == 5
+    assert customer.days_until_visit(day(5)) == 5
@@ -1,7 +1,7 @@
 import datetime as dt
-import os
 import uuid
 from collections import defaultdict
+from functools import partial
 from pathlib import Path
 
 import numpy as np
@@ -11,8 +11,15 @@ from ABM_modeling import Product as ABMProduct
 from ABM_modeling import (get_itinerary_category, getting_segments_dist,
                           sample_from_distribution)
 from helper.datetime_conversion import dt_to_str, str_to_dt
+from helper.distribution_store import DistributionStore
 from helper.id_tracker import IdRegistry
+from helper.instrumentation import get_metrics, timed, timed_function
+from helper.logging_setup import setup_logging
+from helper.metrics_summary import SUMMARY_SUFFIX, write_metrics_summary
+from helper.profiler import NullProfiler
 from helper.save_load import load_agents_from_newest, save_agents
+from helper.visit_scheduler import VisitScheduler
+from helper.workspace import DEFAULT_WORKSPACE, Workspace
 from mesa import Model
 from mesa.datacollection import DataCollector
 from mesa.space import MultiGrid
@@ -28,12 +35,18 @@ Steps for WalmartModel:
     - Add additional customers based on diff from parameters
     - Add additional products based on diff from parameters
 - Step => run a day at a time
+    - visit_scheduling="event" (default): only the customers visiting that day shop
+      (helper/visit_scheduler.py draws each customer's next visit day ahead of time)
+    - visit_scheduling="daily": every customer steps and flips its visit coin each day
 - Run model => run model until completion
 - Export transactions, customers and products to data_source/agm_output (CSV for now, Parquet later)
 
 Call order:
 - load all agent checkpoint from latest simulation -> add additional agents -> run the model -> save agent state -> save csv output
 
+Paths: WalmartModel(workspace=...) (helper/workspace.py) -> absolute inputs, outputs, checkpoints
+and id seeds, independent of the working directory (several models can run in one process)
+
 Agent types (includes kde parameters for reconstruction):
 - Customer 1 
 - Customer 2
@@ -52,9 +65,35 @@ To-do:
 - Should add rollback to previous simulation stage -> remove newest saved files and reversed id-tracking
 """
 
-# Always execute this file at data_pipeline directory
-ROOT = Path(__file__).resolve().parent.parent
-os.chdir(ROOT)
+# Fitted distributions per source file, shared by every model of the process
+# (sweep.py loads them before forking: the workers inherit them copy-on-write).
+# The arrays live in the workspace's distribution store: fitted once, then memory-mapped
+# read-only by every process (gunicorn workers, simulations) -> one physical copy
+_DISTRIBUTIONS = {}
+
+
+def segment_distributions(
+    path: Path, workspace: Workspace = DEFAULT_WORKSPACE
+) -> tuple:
+    """getting_segments_dist(path), attached from the distribution store"""
+    key = str(path)
+    if key not in _DISTRIBUTIONS:
+        _DISTRIBUTIONS[key] = DistributionStore(workspace.distribution_store).segments(
+            path,
+            partial(getting_segments_dist, price_table_path=workspace.price_table),
+            depends=[workspace.price_table],
+        )
+    return _DISTRIBUTIONS[key]
+
+
+def product_distributions(workspace: Workspace = DEFAULT_WORKSPACE) -> dict:
+    """load_distributions_from_file(workspace.product_source), from the distribution store"""
+    key = str(workspace.product_source)
+    if key not in _DISTRIBUTIONS:
+        _DISTRIBUTIONS[key] = DistributionStore(workspace.distribution_store).products(
+            workspace.product_source, load_distributions_from_file
+        )
+    return _DISTRIBUTIONS[key]
 
 
 class WalmartModel(Model):
@@ -72,7 +111,15 @@ class WalmartModel(Model):
         n_customers2: int = 100,
         n_products_per_category: int = 5,
         mode: str = "test",
+        visit_scheduling: str = "event",
+        cust1_visit_prob: float = 0.10,
+        id_offset: int = 0,
+        workspace: Workspace | None = None,
     ):
+        if visit_scheduling not in ("event", "daily"):
+            raise ValueError(
+                f"visit_scheduling must be 'event' or 'daily', not {visit_scheduling!r}"
+            )
         self.schedule = RandomActivation(self)
         self.max_steps = max_steps
         self.current_date = (
@@ -82,15 +129,35 @@ class WalmartModel(Model):
         self.n_cust1 = n_customers1
         self.n_cust2 = n_customers2
         self.n_prod_per_cat = n_products_per_category
+        self.cust1_visit_prob = cust1_visit_prob
         self.mode = mode
         self.run_id = uuid.uuid4().int % (10**8)
 
+        # Absolute paths of the inputs / outputs / checkpoints / id seeds of this run
+        self.workspace = workspace or DEFAULT_WORKSPACE
+
         # Id counter
-        self.id_reg = IdRegistry(mode=self.mode)
+        self.id_reg = IdRegistry(
+            mode=self.mode, offset=id_offset, workspace=self.workspace
+        )
+
+        # Per-phase step timings (run_simulation.py --profile swaps in a PhaseProfiler)
+        self.profiler = NullProfiler()
 
         # class registry for loading
         self.class_registry = {"Cust1": Cust1, "Cust2": Cust2, "Product": ABMProduct}
 
+        # Agents per class ({class_name: {unique_id: agent}}) kept by register_agent,
+        # customers (Cust1 + Cust2) in scheduling order
+        self.registries = {name: {} for name in self.class_registry}
+        self.customers = {}
+        self.products = self.registries["Product"]
+        self._category_index = {}  # {category: [products]}, reset when products change
+
+        # Next visit day of each customer (visit_scheduling="event")
+        self.visit_scheduling = visit_scheduling
+        self.visits = VisitScheduler()
+
         """
         Initialize data collectors: 
         - average of purchases value -- line graph
@@ -103,94 +170,79 @@ class WalmartModel(Model):
             model_reporters={
                 "Current Date": lambda m: dt_to_str(m.current_date),
                 "Total_Cummulative_Sales": lambda m: sum(
-                    sum(agent.total_sales.values())
-                    for agent in m.schedule.agents
-                    if isinstance(agent, ABMProduct)
+                    sum(agent.total_sales.values()) for agent in m.products.values()
                 ),
                 "Total_Cust1_Sales": lambda m: sum(
                     agent.get_total_purchases_by_date(dt_to_str(m.current_date))[0]
-                    for agent in m.schedule.agents
-                    if isinstance(agent, Cust1)
-                ),
-                "Avg_Purchases_Cust1": lambda m: np.average(
-                    [
-                        (
-                            agent.get_total_purchases_by_date(
-                                dt_to_str(m.current_date)
-                            )[0]
-                            / agent.get_total_purchases_by_date(
-                                dt_to_str(m.current_date)
-                            )[1]
-                            if isinstance(agent, Cust1)
-                            and agent.get_total_purchases_by_date(
-                                dt_to_str(m.current_date)
-                            )[1]
-                            > 0
-                            else 0
-                        )
-                        for agent in m.schedule.agents
-                    ]
+                    for agent in m.registries["Cust1"].values()
                 ),
+                "Avg_Purchases_Cust1": lambda m: m.average_purchase("Cust1"),
                 "Total_Cust2_Sales": lambda m: sum(
                     agent.get_total_purchases_by_date(dt_to_str(m.current_date))[0]
-                    for agent in m.schedule.agents
-                    if isinstance(agent, Cust2)
-                ),
-                "Avg_Purchases_Cust2": lambda m: np.average(
-                    [
-                        (
-                            agent.get_total_purchases_by_date(
-                                dt_to_str(m.current_date)
-                            )[0]
-                            / agent.get_total_purchases_by_date(
-                                dt_to_str(m.current_date)
-                            )[1]
-                            if isinstance(agent, Cust2)
-                            and agent.get_total_purchases_by_date(
-                                dt_to_str(m.current_date)
-                            )[1]
-                            > 0
-                            else 0
-                        )
-                        for agent in m.schedule.agents
-                    ]
+                    for agent in m.registries["Cust2"].values()
                 ),
+                "Avg_Purchases_Cust2": lambda m: m.average_purchase("Cust2"),
                 "Total_Daily_Purchase": lambda m: sum(
-                    [
-                        v
-                        for agent in m.schedule.agents
-                        if isinstance(agent, ABMProduct)
-                        for k, v in agent.total_sales.items()
-                        if k == dt_to_str(m.current_date)
-                    ]
-                ),
-                "Total_cust1": lambda m: len(
-                    [a for a in m.schedule.agents if isinstance(a, Cust1)]
-                ),
-                "Total_cust2": lambda m: len(
-                    [a for a in m.schedule.agents if isinstance(a, Cust2)]
-                ),
-                "Total_products": lambda m: len(
-                    [a for a in m.schedule.agents if isinstance(a, ABMProduct)]
+                    agent.total_sales.get(dt_to_str(m.current_date), 0)
+                    for agent in m.products.values()
                 ),
-                "Stockout": lambda m: len(
-                    [
-                        p
-                        for p in m.schedule.agents
-                        if isinstance(p, ABMProduct) and p.stock == 0
-                    ]
+                "Total_cust1": lambda m: len(m.registries["Cust1"]),
+                "Total_cust2": lambda m: len(m.registries["Cust2"]),
+                "Total_products": lambda m: len(m.products),
+                "Stockout": lambda m: sum(
+                    1 for p in m.products.values() if p.stock == 0
                 ),
             }
         )
 
         self.running = True
 
+    def register_agent(self, agent):
+        """Add an agent to the schedule and to the registry of its class."""
+        self.schedule.add(agent)
+        self.registries[type(agent).__name__][agent.unique_id] = agent
+        if isinstance(agent, (Cust1, Cust2)):
+            self.customers[agent.unique_id] = agent
+            if self.visit_scheduling == "event":
+                self.visits.schedule(agent, self.current_date)
+        else:
+            self._category_index.clear()
+
+    def remove_agent(self, agent):
+        self.schedule.remove(agent)
+        del self.registries[type(agent).__name__][agent.unique_id]
+        if self.customers.pop(agent.unique_id, None) is None:
+            self._category_index.clear()
+        self.visits.unschedule(agent.unique_id)
+
+    def products_in_category(self, category: str) -> list:
+        """get_itinerary_category over the products, cached per category"""
+        matches = self._category_index.get(category)
+        if matches is None:
+            matches = self._category_index[category] = get_itinerary_category(
+                category, list(self.products.values())
+            )
+        return matches
+
+    def average_purchase(self, class_name: str) -> float:
+        """
+        Mean purchase value of the day per agent of class_name (0 without purchase),
+        averaged over the whole population like the original reporter did
+        """
+        date_str = dt_to_str(self.current_date)
+        values = []
+        for agent in self.registries[class_name].values():
+            total, count = agent.get_total_purchases_by_date(date_str)
+            values.append(total / count if count > 0 else 0)
+        others = self.schedule.get_agent_count() - len(values)
+        return np.average(values + [0] * others)
+
     def add_customers1(self, n_customers1):
         """Initialize 100 customers (50 Cust1 and 50 Cust2)."""
 
         # Initialize Cust1 customers
-        segments_dist, segments_cat_dist, segments_num_dist = getting_segments_dist(
-            "./data_source/Walmart_cust.csv"
+        segments_dist, segments_cat_dist, segments_num_dist = segment_distributions(
+            self.workspace.cust1_source, self.workspace
         )
 
         id_list = []
@@ -203,10 +255,10 @@ class WalmartModel(Model):
                 cat_dist=segments_cat_dist,
                 num_dist=segments_num_dist,
                 model=self,
-                visit_prob=0.10,
+                visit_prob=self.cust1_visit_prob,
             )
 
-            self.schedule.add(cust1)
+            self.register_agent(cust1)
 
         try:
             print(f"First Cust1: {self.schedule._agents[id_list[0]]}")
@@ -220,8 +272,8 @@ class WalmartModel(Model):
 
     def add_customers2(self, n_customers2):
         # Initialize Cust2 customers
-        segments_dist2, segments_cat_dist2, segments_num_dist2 = getting_segments_dist(
-            "./data_source/Walmart_commerce.csv"
+        segments_dist2, segments_cat_dist2, segments_num_dist2 = segment_distributions(
+            self.workspace.cust2_source, self.workspace
         )
 
         id_list = []
@@ -236,7 +288,7 @@ class WalmartModel(Model):
                 model=self,
             )
 
-            self.schedule.add(cust2)
+            self.register_agent(cust2)
 
         try:
             print(f"First Cust2: {self.schedule._agents[id_list[0]]}")
@@ -276,7 +328,7 @@ class WalmartModel(Model):
                     model=self,
                 )
 
-                self.schedule.add(product)
+                self.register_agent(product)
 
         try:
             print(f"First product: {self.schedule._agents[id_list[0]]}")
@@ -304,7 +356,7 @@ class WalmartModel(Model):
         loaded_counts = {}
         mismatches = []
 
-        for clss_name, clss_obj in self.class_registry.items():
+        for clss_name, registry in self.registries.items():
             if clss_name not in id_range:
                 mismatches.append(f"{clss_name}: missing id range")
                 continue
@@ -316,14 +368,10 @@ class WalmartModel(Model):
 
             # actual agents loaded with IDs inside the inclusive range
             if upper >= lower:
-                actual = sum(
-                    1
-                    for p in self.schedule.agents
-                    if isinstance(p, clss_obj) and lower <= p.unique_id <= upper
-                )
+                actual = sum(1 for uid in registry if lower <= uid <= upper)
             else:
                 # No IDs assigned yet => expect 0, actual must be 0
-                actual = sum(1 for p in self.schedule.agents if isinstance(p, clss_obj))
+                actual = len(registry)
 
             loaded_counts[clss_name] = actual
 
@@ -368,9 +416,7 @@ class WalmartModel(Model):
             print("No new Cust2 agent added")
 
         # Initialize product agents (split equally among all categories) - seems like retail have equal amount of everything
-        product_dist_dict = load_distributions_from_file(
-            "./data_source/category_kde_distributions.npz"
-        )
+        product_dist_dict = product_distributions(self.workspace)
         total_categories = len(product_dist_dict.keys())
         total_products = total_categories * self.n_prod_per_cat
         diff_prod = int(total_products) - int(loaded["Product"])
@@ -402,41 +448,65 @@ class WalmartModel(Model):
 
     def step(self):
         """Advance the model by one day."""
-        self.current_date += dt.timedelta(days=1)
-        current_date_str = dt_to_str(self.current_date)
-
-        # Get all products
-        products = [
-            agent for agent in self.schedule.agents if isinstance(agent, ABMProduct)
-        ]
-
-        # Get all purchases from customer agents
-        total_purchases = defaultdict(int)
-        for agent in self.schedule.agents:
-            if isinstance(agent, (Cust1, Cust2)):
-                choosen_category = agent.get_category_preference()
-                category_products = get_itinerary_category(choosen_category, products)
-                product_id, unit_price, quantity = agent.step(
-                    choice=choosen_category,
-                    product_list=category_products,
-                    current_date=current_date_str,
-                )
+        # Metrics: simulation.step.duration, .agents and .purchases (+ _per_second)
+        prof = self.profiler
+        with timed("simulation.step") as stats:
+            stats["agents"] = stats["purchases"] = 0
+            self.current_date += dt.timedelta(days=1)
+            current_date_str = dt_to_str(self.current_date)
+
+            # Get all purchases from customer agents
+            # event: customers due today shop | daily: every customer flips its visit coin
+            if self.visit_scheduling == "event":
+                visitors = [
+                    self.customers[uid]
+                    for uid in self.visits.due(self.current_date)
+                    if uid in self.customers
+                ]
+            else:
+                visitors = list(self.customers.values())
+
+            total_purchases = defaultdict(int)
+            for agent in visitors:
+                with prof.phase("category_lookup"):
+                    choosen_category = agent.get_category_preference()
+                    category_products = self.products_in_category(choosen_category)
+                with prof.phase("customer_step"):
+                    if self.visit_scheduling == "event":
+                        product_id, unit_price, quantity = agent.shop(
+                            choice=choosen_category,
+                            product_list=category_products,
+                            current_date=current_date_str,
+                        )
+                        self.visits.schedule(agent, self.current_date)
+                    else:
+                        product_id, unit_price, quantity = agent.step(
+                            choice=choosen_category,
+                            product_list=category_products,
+                            current_date=current_date_str,
+                        )
+                stats["agents"] += 1
                 if product_id is not None and quantity is not None:
                     # print(f"Product {product_id} purchased with quantity {quantity}")
                     total_purchases[product_id] += int(quantity)
-
-        # Step though all product agents
-        for product in products:
-            # Update product state for the current day
-            product.step(self.current_date)
-
-        # Update scheduler step count
-        self.schedule.steps += 1
-        self.datacollector.collect(self)
-        if self.schedule.steps >= self.max_steps:
-            self.running = False
-
-        metrics_dict = self.get_current_step_metrics_for_graphs()
+                    stats["purchases"] += 1
+
+            # Step though all product agents
+            with prof.phase("product_step"):
+                for product in list(self.products.values()):
+                    # Update product state for the current day
+                    product.step(self.current_date)
+
+            # Update scheduler step count
+            self.schedule.steps += 1
+            with prof.phase("data_collection"):
+                self.datacollector.collect(self)
+            if self.schedule.steps >= self.max_steps:
+                self.running = False
+
+        with prof.phase("data_collection"):
+            metrics_dict = self.get_current_step_metrics_for_graphs()
+        prof.end_step(self.schedule.steps)
         print(f"\nDay {self.schedule.steps} Summary:")
         print(f"Daily Sales: {metrics_dict["total_daily_purchases"]}")
         print(f"Stockout rate: {metrics_dict["stockout_rate"]}")
@@ -448,6 +518,7 @@ class WalmartModel(Model):
         while self.running:
             self.step()
 
+    @timed_function("simulation.save_results_as_df")
     def save_results_as_df(self) -> dict:
         """
         Save generated transactions, customer and product for partitioned parquet writes.
@@ -461,70 +532,69 @@ class WalmartModel(Model):
         products = []
         run_id = self.run_id
 
-        for agent in self.schedule.agents:
-            if isinstance(agent, (Cust1, Cust2)):
-                for category, purchases in agent.purchase_history.items():
-                    for purchase in purchases:
-                        transaction_id = self.id_reg.next("Transaction")
-                        all_transactions.append(
-                            {
-                                "transaction_id": transaction_id,
-                                "unique_id": agent.unique_id,
-                                "product_id": purchase[0],
-                                "unit_price": purchase[1],
-                                "quantity": purchase[2],
-                                "date_purchased": purchase[3],
-                                "category": category,
-                                "cust_type": (
-                                    "Cust1" if isinstance(agent, Cust1) else "Cust2"
-                                ),
-                                "run_id": run_id,
-                            }
-                        )
-
-                if isinstance(agent, Cust1):
-                    cust1_demographics.append(
+        for agent in self.customers.values():
+            for category, purchases in agent.purchase_history.items():
+                for purchase in purchases:
+                    transaction_id = self.id_reg.next("Transaction")
+                    all_transactions.append(
                         {
+                            "transaction_id": transaction_id,
                             "unique_id": agent.unique_id,
-                            "segment_id": agent.segment_id,
-                            "age": agent.age,
-                            "gender": agent.gender,
-                            "city_category": agent.city_category,
-                            "stay_in_current_city_years": agent.stay_in_current_city_years,
-                            "marital_status": agent.marital_status,
-                            "visit_prob": agent.visit_prob,
+                            "product_id": purchase[0],
+                            "unit_price": purchase[1],
+                            "quantity": purchase[2],
+                            "date_purchased": purchase[3],
+                            "category": category,
+                            "cust_type": (
+                                "Cust1" if isinstance(agent, Cust1) else "Cust2"
+                            ),
                             "run_id": run_id,
                         }
                     )
 
-                elif isinstance(agent, Cust2):
-                    cust2_demographics.append(
-                        {
-                            "unique_id": agent.unique_id,
-                            "segment_id": agent.segment_id,
-                            "branch": agent.branch,
-                            "city": agent.city,
-                            "customer_type": agent.customer_type,
-                            "gender": agent.gender,
-                            "payment_method": agent.payment_method,
-                            "run_id": run_id,
-                        }
-                    )
+        for agent in self.registries["Cust1"].values():
+            cust1_demographics.append(
+                {
+                    "unique_id": agent.unique_id,
+                    "segment_id": agent.segment_id,
+                    "age": agent.age,
+                    "gender": agent.gender,
+                    "city_category": agent.city_category,
+                    "stay_in_current_city_years": agent.stay_in_current_city_years,
+                    "marital_status": agent.marital_status,
+                    "visit_prob": agent.visit_prob,
+                    "run_id": run_id,
+                }
+            )
 
-            elif isinstance(agent, ABMProduct):
-                products.append(
-                    {
-                        "product_id": agent.unique_id,
-                        "category": agent.product_category,
-                        "unit_price": agent.unit_price,
-                        "lead_days": agent.lead_days,
-                        "ordering_cost": agent.ordering_cost,
-                        "EOQ": agent.EOQ,
-                        "stock": agent.stock,
-                        "holding_cost_per_unit": agent.holding_cost_per_unit,
-                        "run_id": run_id,
-                    }
-                )
+        for agent in self.registries["Cust2"].values():
+            cust2_demographics.append(
+                {
+                    "unique_id": agent.unique_id,
+                    "segment_id": agent.segment_id,
+                    "branch": agent.branch,
+                    "city": agent.city,
+                    "customer_type": agent.customer_type,
+                    "gender": agent.gender,
+                    "payment_method": agent.payment_method,
+                    "run_id": run_id,
+                }
+            )
+
+        for agent in self.products.values():
+            products.append(
+                {
+                    "product_id": agent.unique_id,
+                    "category": agent.product_category,
+                    "unit_price": agent.unit_price,
+                    "lead_days": agent.lead_days,
+                    "ordering_cost": agent.ordering_cost,
+                    "EOQ": agent.EOQ,
+                    "stock": agent.stock,
+                    "holding_cost_per_unit": agent.holding_cost_per_unit,
+                    "run_id": run_id,
+                }
+            )
 
         # Updating for transactions id
         self.id_reg.advance()
@@ -544,9 +614,12 @@ class WalmartModel(Model):
             "products": df_product,
             "metrics": df_metrics,
         }
+        for name, df in final_results_dict.items():
+            get_metrics().incr("simulation.result_rows", len(df), tags={"table": name})
 
         return final_results_dict
 
+    @timed_function("simulation.write_results_csv")
     def write_results_csv(self, df_dict: dict[str, pd.DataFrame]):
         """
         Input:
@@ -556,24 +629,20 @@ class WalmartModel(Model):
         - CSV => Best when small, intended for excel analysis and loaded into Postgres
         """
 
+        root = self.workspace.output_dir(self.mode)
         if self.mode == "test":
-            path = "./data_source/agm_output_test"
             print("saving in test folder")
         else:
-            path = "./data_source/agm_output"
             print("saving in production folder")
 
         run_ts = dt.datetime.now().strftime("%Y%m%d")
-        root = Path(path)
         root.mkdir(parents=True, exist_ok=True)
         final_paths = []
 
         for name, df in df_dict.items():
             # /agm_output_test/run_time=2025-06-18/id=123213_transactions.csv
             saved_file_path = next(root.glob(f"run_time={run_ts}/*{name}.csv"), None)
-            new_file_path = (
-                Path(path) / f"run_time={run_ts}/id={self.run_id}_{name}.csv"
-            )
+            new_file_path = root / f"run_time={run_ts}/id={self.run_id}_{name}.csv"
 
             if saved_file_path:
                 print(f"Appending to {saved_file_path}")
@@ -585,14 +654,27 @@ class WalmartModel(Model):
             elif not saved_file_path:
                 print(f"Saving new file to {new_file_path}")
                 new_file_path.parent.mkdir(parents=True, exist_ok=True)
-                df.to_csv(path_or_buf=new_file_path, mode="w", index=False)
-
+                new_df = df
+                new_df.to_csv(path_or_buf=new_file_path, mode="w", index=False)
+
+            # Ready-to-serve summary for /api/simulate/preview/ (replaces the old run's one)
+            if name == "metrics":
+                for old_summary in new_file_path.parent.glob(f"*{SUMMARY_SUFFIX}"):
+                    old_summary.unlink()
+                write_metrics_summary(new_df, new_file_path)
+
+            get_metrics().incr(
+                "simulation.written_bytes",
+                new_file_path.stat().st_size,
+                tags={"table": name},
+            )
             final_paths.append(new_file_path)
 
         return final_paths, self.run_id
 
 
 def main():
+    setup_logging()
     model = WalmartModel(
         start_date=dt.datetime(2024, 1, 1),
         max_steps=10,
@@ -2,7 +2,7 @@
  * - Django runs at http://localhost:8000 with routes under /api/
  * - Endpoints:
  *    /api/simulate/  (POST)
- *    /api/transactions/?since=<ISO>&limit=<int>  (GET)
+ *    /api/transactions/?since=<ISO>&limit=<int>&cursor=<X-Next-Cursor>  (GET)
  *    /api/cust1/     (GET)
  *    /api/cust2/     (GET)
  *    /api/products/  (GET)
@@ -110,8 +110,8 @@ export type RunSimulationParams = {
 const normalizeDateForAPI = (d: string) => d.replaceAll("-", ""); // DRF accepts both; we send digits.
 
 export const simulationAPI = {
-  /** GET /api/transactions/?since=&limit= */
-  getTransactions: (opts?: { since?: string; limit?: number }) =>
+  /** GET /api/transactions/?since=&limit=&cursor= (next cursor is in the X-Next-Cursor header) */
+  getTransactions: (opts?: { since?: string; limit?: number; cursor?: string }) =>
     apiRequest(`/transactions/${toQuery(opts)}`),
 
   /** POST /api/simulate/ */